@@ -0,0 +1,30 @@
+"""add security counters
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Hourly rollup of the Redis login/security counters
+    op.create_table(
+        'security_counters',
+        sa.Column('bucket_start', sa.DateTime(), nullable=False),
+        sa.Column('metric', sa.String(length=128), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('bucket_start', 'metric')
+    )
+
+
+def downgrade():
+    op.drop_table('security_counters')
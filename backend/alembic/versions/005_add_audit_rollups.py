@@ -0,0 +1,41 @@
+"""add audit rollups
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Hourly counts per (action, organization, status), maintained by app.jobs.audit_rollup
+    op.create_table(
+        'audit_rollups',
+        sa.Column('bucket_start', sa.DateTime(), nullable=False),
+        sa.Column('action', postgresql.ENUM(name='auditaction', create_type=False), nullable=False),
+        sa.Column('organization_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('status', sa.String(length=32), nullable=False, server_default=''),
+        sa.Column('count', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('bucket_start', 'action', 'organization_id', 'status')
+    )
+    
+    op.create_table(
+        'rollup_watermarks',
+        sa.Column('name', sa.String(length=64), nullable=False),
+        sa.Column('processed_until', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('rollup_watermarks')
+    op.drop_table('audit_rollups')
@@ -0,0 +1,107 @@
+"""partition audit_logs by month
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-19 13:00:00.000000
+
+Rebuilds audit_logs as a table range partitioned by month on timestamp.
+Existing rows are copied into monthly partitions, so the upgrade takes time
+proportional to the table size and should run in a maintenance window.
+Further partitions are created by `python -m app.db.partitions`; rows of
+months without one go to the audit_logs_default partition instead of
+failing the insert.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+COLUMNS = (
+    "id, timestamp, action, user_id, user_email, organization_id, target_id, "
+    "target_type, ip_address, user_agent, details, status, error_message"
+)
+
+INDEXED_COLUMNS = ('timestamp', 'action', 'user_id', 'organization_id')
+
+
+def _create_audit_logs(*constraints, **table_kwargs):
+    op.create_table(
+        'audit_logs',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('timestamp', sa.DateTime(), nullable=False),
+        sa.Column('action', postgresql.ENUM(name='auditaction', create_type=False), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('user_email', sa.String(), nullable=True),
+        sa.Column('organization_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('target_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('target_type', sa.String(), nullable=True),
+        sa.Column('ip_address', sa.String(), nullable=True),
+        sa.Column('user_agent', sa.String(), nullable=True),
+        sa.Column('details', sa.JSON(), nullable=True),
+        sa.Column('status', sa.String(), nullable=True),
+        sa.Column('error_message', sa.Text(), nullable=True),
+        *constraints,
+        **table_kwargs
+    )
+    for column in INDEXED_COLUMNS:
+        op.create_index(f'ix_audit_logs_{column}', 'audit_logs', [column])
+
+
+def _move_aside():
+    # Free the table, constraint and index names for the new table
+    op.execute("ALTER TABLE audit_logs RENAME TO audit_logs_old")
+    op.execute("ALTER TABLE audit_logs_old RENAME CONSTRAINT audit_logs_pkey TO audit_logs_old_pkey")
+    for column in INDEXED_COLUMNS:
+        op.execute(f"DROP INDEX IF EXISTS ix_audit_logs_{column}")
+
+
+def upgrade():
+    _move_aside()
+    
+    _create_audit_logs(
+        sa.PrimaryKeyConstraint('id', 'timestamp'),
+        postgresql_partition_by='RANGE (timestamp)'
+    )
+    
+    # One partition per month from the oldest row through three months ahead
+    op.execute("""
+        DO $$
+        DECLARE
+            cur_month date;
+            last_month date;
+        BEGIN
+            SELECT date_trunc('month', coalesce(min(timestamp), now()))::date,
+                   (date_trunc('month', greatest(coalesce(max(timestamp), now()), now())) + interval '3 months')::date
+            INTO cur_month, last_month
+            FROM audit_logs_old;
+            
+            WHILE cur_month <= last_month LOOP
+                EXECUTE format(
+                    'CREATE TABLE IF NOT EXISTS %I PARTITION OF audit_logs FOR VALUES FROM (%L) TO (%L)',
+                    'audit_logs_y' || to_char(cur_month, 'YYYY') || 'm' || to_char(cur_month, 'MM'),
+                    cur_month,
+                    (cur_month + interval '1 month')::date
+                );
+                cur_month := (cur_month + interval '1 month')::date;
+            END LOOP;
+        END $$;
+    """)
+    op.execute("CREATE TABLE audit_logs_default PARTITION OF audit_logs DEFAULT")
+    
+    op.execute(f"INSERT INTO audit_logs ({COLUMNS}) SELECT {COLUMNS} FROM audit_logs_old")
+    op.drop_table('audit_logs_old')
+
+
+def downgrade():
+    _move_aside()
+    
+    _create_audit_logs(sa.PrimaryKeyConstraint('id'))
+    
+    op.execute(f"INSERT INTO audit_logs ({COLUMNS}) SELECT {COLUMNS} FROM audit_logs_old")
+    # Dropping the partitioned parent drops its partitions as well
+    op.drop_table('audit_logs_old')
@@ -0,0 +1,46 @@
+"""audit log keyset indexes
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+# Composite indexes matching ORDER BY timestamp DESC, id DESC behind each equality filter
+KEYSET_INDEXES = {
+    'ix_audit_logs_timestamp_id': [],
+    'ix_audit_logs_organization_id_timestamp': ['organization_id'],
+    'ix_audit_logs_action_timestamp': ['action'],
+    'ix_audit_logs_user_id_timestamp': ['user_id'],
+}
+
+SINGLE_COLUMN_INDEXES = ('timestamp', 'action', 'user_id', 'organization_id')
+
+
+def upgrade():
+    for name, prefix in KEYSET_INDEXES.items():
+        op.create_index(
+            name,
+            'audit_logs',
+            prefix + [sa.text('timestamp DESC'), sa.text('id DESC')]
+        )
+    
+    # Each single-column index is covered by the composite that leads with it
+    for column in SINGLE_COLUMN_INDEXES:
+        op.drop_index(f'ix_audit_logs_{column}', table_name='audit_logs')
+
+
+def downgrade():
+    for column in SINGLE_COLUMN_INDEXES:
+        op.create_index(f'ix_audit_logs_{column}', 'audit_logs', [column])
+    
+    for name in KEYSET_INDEXES:
+        op.drop_index(name, table_name='audit_logs')
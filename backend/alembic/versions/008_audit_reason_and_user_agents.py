@@ -0,0 +1,112 @@
+"""audit reason column and interned user agents
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-19 17:00:00.000000
+
+Moves details['reason'] of login audit rows into an indexed enum column,
+replaces the user_agent string with a reference into user_agents and strips
+data already stored in columns (email, organization name, client IP, the
+organization allow-list) from the details of login rows.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+REASONS = (
+    'INVALID_CREDENTIALS',
+    'USER_INACTIVE',
+    'ORGANIZATION_INACTIVE',
+    'LICENSE_EXPIRED',
+    'IP_NOT_WHITELISTED',
+)
+
+
+def upgrade():
+    auditreason = postgresql.ENUM(*REASONS, name='auditreason')
+    auditreason.create(op.get_bind(), checkfirst=True)
+    
+    op.create_table(
+        'user_agents',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('value_hash', sa.String(length=32), nullable=False),
+        sa.Column('value', sa.Text(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('value_hash')
+    )
+    
+    op.add_column('audit_logs', sa.Column('reason', auditreason, nullable=True))
+    op.add_column('audit_logs', sa.Column('user_agent_id', sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        'audit_logs_user_agent_id_fkey', 'audit_logs', 'user_agents', ['user_agent_id'], ['id']
+    )
+    
+    # Intern every distinct agent once
+    op.execute("""
+        INSERT INTO user_agents (value_hash, value)
+        SELECT md5(left(user_agent, 1024)), left(user_agent, 1024)
+        FROM audit_logs
+        WHERE user_agent IS NOT NULL AND user_agent <> ''
+        GROUP BY left(user_agent, 1024)
+        ON CONFLICT (value_hash) DO NOTHING
+    """)
+    
+    # Backfill in one pass over the table
+    op.execute(f"""
+        UPDATE audit_logs SET
+            user_agent_id = (
+                SELECT id FROM user_agents
+                WHERE value_hash = md5(left(audit_logs.user_agent, 1024))
+            ),
+            reason = CASE
+                WHEN upper(details->>'reason') IN ({", ".join(f"'{r}'" for r in REASONS)})
+                THEN upper(details->>'reason')::auditreason
+            END,
+            details = CASE
+                WHEN action IN ('LOGIN', 'LOGIN_FAILED') AND details IS NOT NULL
+                THEN nullif(
+                    details::jsonb - 'reason' - 'email' - 'organization' - 'ip' - 'allowed_ips',
+                    '{{}}'::jsonb
+                )::json
+                ELSE details
+            END
+        WHERE user_agent IS NOT NULL OR details IS NOT NULL
+    """)
+    
+    op.drop_column('audit_logs', 'user_agent')
+    
+    op.create_index(
+        'ix_audit_logs_reason_timestamp',
+        'audit_logs',
+        ['reason', sa.text('timestamp DESC')],
+        postgresql_where=sa.text('reason IS NOT NULL')
+    )
+
+
+def downgrade():
+    op.add_column('audit_logs', sa.Column('user_agent', sa.String(), nullable=True))
+    op.execute("""
+        UPDATE audit_logs SET user_agent = user_agents.value
+        FROM user_agents
+        WHERE user_agents.id = audit_logs.user_agent_id
+    """)
+    
+    # Stripped details keys cannot be restored; the reason goes back into details
+    op.execute("""
+        UPDATE audit_logs
+        SET details = (coalesce(details::jsonb, '{}'::jsonb) || jsonb_build_object('reason', lower(reason::text)))::json
+        WHERE reason IS NOT NULL
+    """)
+    
+    op.drop_index('ix_audit_logs_reason_timestamp', table_name='audit_logs')
+    op.drop_constraint('audit_logs_user_agent_id_fkey', 'audit_logs', type_='foreignkey')
+    op.drop_column('audit_logs', 'user_agent_id')
+    op.drop_column('audit_logs', 'reason')
+    op.drop_table('user_agents')
+    postgresql.ENUM(name='auditreason').drop(op.get_bind(), checkfirst=True)
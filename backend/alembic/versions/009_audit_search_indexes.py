@@ -0,0 +1,75 @@
+"""audit search indexes
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+TRIGRAM_INDEXES = {
+    'ix_audit_logs_user_email_trgm': ('audit_logs', 'user_email'),
+    'ix_audit_logs_error_message_trgm': ('audit_logs', 'error_message'),
+    'ix_user_agents_value_trgm': ('user_agents', 'value'),
+}
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    
+    # Stored addresses come from request headers; anything that is not an IP becomes NULL
+    op.execute("""
+        CREATE FUNCTION try_inet(value text) RETURNS inet AS $$
+        BEGIN
+            RETURN value::inet;
+        EXCEPTION WHEN others THEN
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql IMMUTABLE
+    """)
+    op.execute("ALTER TABLE audit_logs ALTER COLUMN ip_address TYPE inet USING try_inet(ip_address)")
+    op.execute("DROP FUNCTION try_inet(text)")
+    
+    op.execute("CREATE INDEX ix_audit_logs_user_email_prefix ON audit_logs (lower(user_email) text_pattern_ops)")
+    op.create_index(
+        'ix_audit_logs_ip_address',
+        'audit_logs',
+        ['ip_address'],
+        postgresql_using='gist',
+        postgresql_ops={'ip_address': 'inet_ops'}
+    )
+    for name, (table, column) in TRIGRAM_INDEXES.items():
+        op.create_index(
+            name,
+            table,
+            [column],
+            postgresql_using='gin',
+            postgresql_ops={column: 'gin_trgm_ops'}
+        )
+    op.create_index(
+        'ix_audit_logs_user_agent_id_timestamp',
+        'audit_logs',
+        ['user_agent_id', sa.text('timestamp DESC')]
+    )
+
+
+def downgrade():
+    op.drop_index('ix_audit_logs_user_agent_id_timestamp', table_name='audit_logs')
+    for name, (table, _) in TRIGRAM_INDEXES.items():
+        op.drop_index(name, table_name=table)
+    op.drop_index('ix_audit_logs_ip_address', table_name='audit_logs')
+    op.drop_index('ix_audit_logs_user_email_prefix', table_name='audit_logs')
+    
+    op.alter_column(
+        'audit_logs',
+        'ip_address',
+        type_=sa.String(),
+        postgresql_using='host(ip_address)'
+    )
@@ -1,15 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.orm import Session, contains_eager
+from sqlalchemy import func, select, update, delete, insert
 from typing import List
 from uuid import UUID
-from app.db.database import get_db
+from datetime import datetime, timedelta
+from app.db.database import get_db, get_redis
 from app.models.user import User, UserRole
-from app.models.organization import Organization
+from app.models.organization import Organization, LicenseType
+from app.models.audit_log import AuditLog, AuditAction
 from app.schemas.user import UserCreate, UserResponse, UserUpdate, UserWithOrganization
-from app.schemas.organization import OrganizationResponse, OrganizationUpdate, OrganizationCreate
+from app.schemas.organization import (
+    OrganizationResponse,
+    OrganizationUpdate,
+    OrganizationCreate,
+    BulkLicenseUpdate,
+    BulkLicenseItem,
+    BulkLicenseResult,
+)
 from app.core.security import get_password_hash, verify_token
 from app.core.rbac import get_user_permissions
+from app.core.middleware import get_client_ip, normalize_ip
+from app.core.cache import purge_organization_sessions, invalidate_license_cache
+from app.core.user_agents import intern_user_agent
+from app.core.export import export_response, stream_rows, EXPORT_FORMAT_PATTERN
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from redis.exceptions import RedisError
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 security = HTTPBearer()
@@ -105,7 +123,8 @@ async def list_users(
 ):
     """List all users (Admin only) - excludes system admins from organization lists"""
     
-    query = db.query(User).join(Organization)
+    # Load each user's organization from the join instead of one query per user
+    query = db.query(User).join(Organization).options(contains_eager(User.organization))
     
     # Exclude ADMIN role users (system admins) from organization user lists
     query = query.filter(User.role != UserRole.ADMIN)
@@ -136,6 +155,44 @@ async def list_users(
     return result
 
 
+@router.get("/users/export")
+async def export_users(
+    organization_id: UUID = None,
+    format: str = Query("ndjson", pattern=EXPORT_FORMAT_PATTERN),
+    gzip: bool = False,
+    current_admin: User = Depends(get_current_admin)
+):
+    """Stream the /users listing as NDJSON or CSV (Admin only)"""
+    
+    columns = [
+        User.id,
+        User.email,
+        User.full_name,
+        User.role,
+        User.organization_id,
+        Organization.name.label("organization_name"),
+        User.is_active,
+        User.created_at,
+        User.last_login,
+    ]
+    
+    statement = select(*columns).join(Organization, Organization.id == User.organization_id)
+    
+    # Exclude ADMIN role users (system admins) like the listing does
+    statement = statement.where(User.role != UserRole.ADMIN)
+    
+    if organization_id:
+        statement = statement.where(User.organization_id == organization_id)
+    
+    return export_response(
+        [column.key for column in columns],
+        stream_rows(statement.order_by(User.created_at, User.id)),
+        format,
+        gzip,
+        "users"
+    )
+
+
 @router.patch("/users/{user_id}", response_model=UserResponse)
 async def update_user(
     user_id: UUID,
@@ -248,12 +305,17 @@ async def list_organizations(
     
     organizations = db.query(Organization).all()
     
+    # Active user counts for all organizations in one grouped query
+    user_counts = dict(
+        db.query(User.organization_id, func.count())
+        .filter(User.is_active == True)
+        .group_by(User.organization_id)
+        .all()
+    )
+    
     result = []
     for org in organizations:
-        user_count = db.query(User).filter(
-            User.organization_id == org.id,
-            User.is_active == True
-        ).count()
+        user_count = user_counts.get(org.id, 0)
         
         result.append(OrganizationResponse(
             id=org.id,
@@ -271,6 +333,136 @@ async def list_organizations(
     return result
 
 
+@router.post("/organizations/license/bulk", response_model=BulkLicenseResult)
+async def bulk_update_licenses(
+    bulk_data: BulkLicenseUpdate,
+    request: Request,
+    current_admin: User = Depends(get_current_admin),
+    db: Session = Depends(get_db),
+    redis=Depends(get_redis)
+):
+    """
+    Extend, set or change licenses for a filtered set of organizations (Admin only)
+
+    The matching organizations are locked and their current licenses read,
+    then updated with one UPDATE ... RETURNING; the LICENSE_EXTENDED audit
+    rows (with the requested change and the previous license) are written in
+    one batch insert and the license cache of every affected organization is
+    dropped at once.
+    """
+
+    if bulk_data.extend_days is not None and bulk_data.set_expires_at is not None:
+        raise HTTPException(status_code=400, detail="Use either extend_days or set_expires_at, not both")
+
+    if bulk_data.extend_days is None and bulk_data.set_expires_at is None and bulk_data.new_license_type is None:
+        raise HTTPException(status_code=400, detail="No license change requested")
+
+    # Build filters
+    filters = []
+    if bulk_data.organization_ids:
+        filters.append(Organization.id.in_(bulk_data.organization_ids))
+
+    if bulk_data.license_type is not None:
+        try:
+            filters.append(Organization.license_type == LicenseType(bulk_data.license_type))
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid license type: {bulk_data.license_type}")
+
+    if bulk_data.expires_before is not None:
+        filters.append(Organization.license_expires_at < bulk_data.expires_before)
+
+    if bulk_data.is_active is not None:
+        filters.append(Organization.is_active == bulk_data.is_active)
+
+    # Refuse to touch every organization by accident
+    if not filters:
+        raise HTTPException(status_code=400, detail="At least one organization filter is required")
+
+    # Build changes
+    values = {"updated_at": datetime.utcnow()}
+    if bulk_data.extend_days is not None:
+        values["license_expires_at"] = Organization.license_expires_at + timedelta(days=bulk_data.extend_days)
+
+    if bulk_data.set_expires_at is not None:
+        values["license_expires_at"] = bulk_data.set_expires_at
+
+    if bulk_data.new_license_type is not None:
+        try:
+            values["license_type"] = LicenseType(bulk_data.new_license_type)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid license type: {bulk_data.new_license_type}")
+
+    # Interned on its own connection, so before this transaction takes any locks
+    client_ip = normalize_ip(get_client_ip(request))
+    user_agent_id = intern_user_agent(request.headers.get("User-Agent"))
+
+    # Previous licenses for the audit trail; the row locks keep them current until the UPDATE
+    previous = {
+        row.id: row
+        for row in db.execute(
+            select(Organization.id, Organization.license_type, Organization.license_expires_at)
+            .where(*filters)
+            .with_for_update()
+        )
+    }
+
+    updated = db.execute(
+        update(Organization)
+        .where(Organization.id.in_(previous))
+        .values(**values)
+        .returning(
+            Organization.id,
+            Organization.name,
+            Organization.license_type,
+            Organization.license_expires_at
+        )
+        .execution_options(synchronize_session=False)
+    ).all()
+
+    if updated:
+        db.execute(insert(AuditLog), [
+            {
+                "action": AuditAction.LICENSE_EXTENDED,
+                "user_id": current_admin.id,
+                "user_email": current_admin.email,
+                "organization_id": row.id,
+                "target_id": row.id,
+                "target_type": "license",
+                "ip_address": client_ip,
+                "user_agent_id": user_agent_id,
+                "status": "success",
+                "details": {
+                    "bulk": True,
+                    "extend_days": bulk_data.extend_days,
+                    "set_expires_at": bulk_data.set_expires_at.isoformat() if bulk_data.set_expires_at else None,
+                    "new_license_type": bulk_data.new_license_type,
+                    "previous_license_type": previous[row.id].license_type.value,
+                    "previous_license_expires_at": previous[row.id].license_expires_at.isoformat(),
+                    "license_type": row.license_type.value,
+                    "license_expires_at": row.license_expires_at.isoformat()
+                }
+            }
+            for row in updated
+        ])
+
+    db.commit()
+
+    invalidate_license_cache(redis, [row.id for row in updated])
+
+    return BulkLicenseResult(
+        updated_count=len(updated),
+        organizations=[
+            BulkLicenseItem(
+                id=row.id,
+                name=row.name,
+                license_type=row.license_type.value,
+                license_expires_at=row.license_expires_at
+            )
+            for row in updated
+        ]
+    )
+
+
 @router.patch("/organizations/{org_id}", response_model=OrganizationResponse)
 async def update_organization(
     org_id: UUID,
@@ -326,3 +518,107 @@ async def update_organization(
         created_at=org.created_at,
         user_count=user_count
     )
+
+
+@router.delete("/organizations/{org_id}")
+async def delete_organization(
+    org_id: UUID,
+    request: Request,
+    archive: bool = False,
+    current_admin: User = Depends(get_current_admin),
+    db: Session = Depends(get_db),
+    redis=Depends(get_redis)
+):
+    """
+    Delete or archive an organization and its users (Admin only)
+
+    Users are removed (or deactivated when ``archive`` is set) with set-based
+    statements instead of the ORM cascade, so the cost does not depend on
+    loading every user into the session. Refresh tokens and the license cache
+    of the organization are purged from Redis once the transaction commits.
+    """
+
+    org = db.query(Organization).filter(Organization.id == org_id).first()
+    if not org:
+        raise HTTPException(status_code=404, detail="Organization not found")
+
+    # Prevent removing the organization you are signed in through
+    if org.id == current_admin.organization_id:
+        raise HTTPException(status_code=400, detail="Cannot delete your own organization")
+
+    org_name = org.name
+    now = datetime.utcnow()
+    # Interned on its own connection, so before this transaction takes write locks
+    client_ip = normalize_ip(get_client_ip(request))
+    user_agent_id = intern_user_agent(request.headers.get("User-Agent"))
+
+    if archive:
+        user_ids = db.execute(
+            update(User)
+            .where(User.organization_id == org_id)
+            .values(is_active=False, updated_at=now)
+            .returning(User.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+
+        org.is_active = False
+    else:
+        # Users elsewhere may reference members of this organization as creator
+        db.execute(
+            update(User)
+            .where(
+                User.organization_id != org_id,
+                User.created_by.in_(select(User.id).where(User.organization_id == org_id))
+            )
+            .values(created_by=None)
+            .execution_options(synchronize_session=False)
+        )
+
+        user_ids = db.execute(
+            delete(User)
+            .where(User.organization_id == org_id)
+            .returning(User.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+
+        db.expunge(org)
+        db.execute(
+            delete(Organization)
+            .where(Organization.id == org_id)
+            .execution_options(synchronize_session=False)
+        )
+
+    audit_log = AuditLog(
+        # Archiving keeps the organization, so it is recorded as an update
+        action=AuditAction.ORG_UPDATED if archive else AuditAction.ORG_DELETED,
+        user_id=current_admin.id,
+        user_email=current_admin.email,
+        organization_id=org_id,
+        target_id=org_id,
+        target_type="organization",
+        ip_address=client_ip,
+        user_agent_id=user_agent_id,
+        status="success",
+        details={
+            "organization": org_name,
+            "mode": "archive" if archive else "delete",
+            "users_affected": len(user_ids)
+        }
+    )
+    db.add(audit_log)
+    db.commit()
+
+    # The database change is committed; a Redis outage must not turn it into an error
+    try:
+        keys_purged = purge_organization_sessions(redis, org_id, user_ids)
+    except RedisError as e:
+        logger.warning(f"⚠️ Could not purge sessions of organization {org_id}, refresh tokens stay valid until they expire: {e}")
+        keys_purged = None
+
+    return {
+        "message": f"Organization {'archived' if archive else 'deleted'} successfully",
+        "organization_id": str(org_id),
+        "mode": "archive" if archive else "delete",
+        "users_affected": len(user_ids),
+        "keys_purged": keys_purged
+    }
@@ -1,17 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from typing import List, Optional
+from sqlalchemy import cast, desc, false, func, or_, select, tuple_
+from sqlalchemy.dialects.postgresql import INET
+from typing import Iterator, List, Optional
 from datetime import datetime, timedelta
 from app.db.database import get_db
-from app.models.audit_log import AuditLog, AuditAction
+from app.models.audit_log import AuditLog, AuditAction, AuditReason
 from app.models.user import User
+from app.models.user_agent import UserAgent
 from app.api.admin import get_current_admin
+from app.core.audit_rollups import count_audit_events
+from app.core.pagination import encode_cursor, decode_cursor
+from app.core.filters import LIKE_ESCAPE, like_pattern
+from app.core.user_agents import intern_user_agent
+from app.core.middleware import normalize_ip
+from app.core.export import export_response, stream_rows, EXPORT_FORMAT_PATTERN
+from app.core.audit_archive import AUDIT_LOG_COLUMNS, archived_before, iter_archived_rows
 from pydantic import BaseModel
+from collections import Counter
+from itertools import chain, islice
 from uuid import UUID
+import ipaddress
 
 router = APIRouter(prefix="/admin/audit", tags=["Audit"])
 
+USER_ACTIONS = [AuditAction.USER_CREATED, AuditAction.USER_UPDATED, AuditAction.USER_DELETED]
+ORG_ACTIONS = [AuditAction.ORG_CREATED, AuditAction.ORG_UPDATED, AuditAction.ORG_DELETED]
+
 
 class AuditLogResponse(BaseModel):
     id: str
@@ -21,7 +36,9 @@ class AuditLogResponse(BaseModel):
     organization_id: Optional[str]
     target_type: Optional[str]
     ip_address: Optional[str]
+    user_agent: Optional[str] = None
     status: Optional[str]
+    reason: Optional[str] = None
     details: Optional[dict]
     error_message: Optional[str]
 
@@ -38,6 +55,7 @@ async def create_audit_log(
     user_agent: Optional[str] = None,
     details: Optional[dict] = None,
     status: str = "success",
+    reason: Optional[AuditReason] = None,
     error_message: Optional[str] = None
 ):
     """Helper function to create audit log entries"""
@@ -48,10 +66,11 @@ async def create_audit_log(
         organization_id=organization_id,
         target_id=target_id,
         target_type=target_type,
-        ip_address=ip_address,
-        user_agent=user_agent,
+        ip_address=normalize_ip(ip_address),
+        user_agent_id=intern_user_agent(user_agent),
         details=details,
         status=status,
+        reason=reason,
         error_message=error_message
     )
     db.add(log)
@@ -59,54 +78,279 @@ async def create_audit_log(
     return log
 
 
-@router.get("/logs", response_model=List[AuditLogResponse])
-async def get_audit_logs(
+class AuditLogFilters:
+    """Filters shared by the audit log endpoints, for SQL and for archived rows"""
+    
+    def __init__(self, start_date: datetime, archive_boundary: Optional[datetime] = None):
+        self.start_date = start_date
+        self.conditions = [AuditLog.timestamp >= start_date]
+        # Rows below the boundary are served from the archive only, even while an
+        # interrupted or running archiver has not deleted them from audit_logs yet
+        self.archive_boundary = archive_boundary
+        if archive_boundary and archive_boundary > start_date:
+            self.conditions.append(AuditLog.timestamp >= archive_boundary)
+        self.organization_id: Optional[UUID] = None
+        self.actions: Optional[List[AuditAction]] = None
+        self.match_nothing = False
+        # Archived column name -> required JSON value
+        self.equals = {}
+    
+    def add(self, column, value, archived_value=None):
+        self.conditions.append(column == value)
+        self.equals[column.key] = value if archived_value is None else archived_value
+    
+    def matches(self, row: dict) -> bool:
+        """Whether an archived row passes the filters"""
+        return not self.match_nothing and all(row.get(key) == value for key, value in self.equals.items())
+
+
+def audit_log_filters(
     organization_id: Optional[UUID] = None,
     action: Optional[str] = None,
-    days: int = 30,
-    limit: int = 100,
-    current_admin: User = Depends(get_current_admin),
-    db: Session = Depends(get_db)
-):
-    """Get audit logs with filters"""
+    user_id: Optional[UUID] = None,
+    user_email: Optional[str] = None,
+    ip_address: Optional[str] = None,
+    status: Optional[str] = None,
+    target_type: Optional[str] = None,
+    reason: Optional[str] = None,
+    days: int = 30
+) -> AuditLogFilters:
+    """Filter conditions shared by the audit log endpoints"""
     
-    query = db.query(AuditLog)
+    # Filter by date range (lets PostgreSQL skip audit_logs partitions outside it)
+    filters = AuditLogFilters(datetime.utcnow() - timedelta(days=days), archived_before())
     
-    # Filter by organization
     if organization_id:
-        query = query.filter(AuditLog.organization_id == organization_id)
+        filters.organization_id = organization_id
+        filters.add(AuditLog.organization_id, organization_id, str(organization_id))
     
-    # Filter by action
     if action:
         try:
-            action_enum = AuditAction(action.lower())
-            query = query.filter(AuditLog.action == action_enum)
+            audit_action = AuditAction(action.lower())
+            filters.actions = [audit_action]
+            filters.add(AuditLog.action, audit_action, audit_action.value)
         except ValueError:
-            # Invalid action provided, return empty result
-            return []
+            # Invalid action provided, match nothing
+            filters.conditions.append(false())
+            filters.match_nothing = True
     
-    # Filter by date range
-    start_date = datetime.utcnow() - timedelta(days=days)
-    query = query.filter(AuditLog.timestamp >= start_date)
+    if user_id:
+        filters.add(AuditLog.user_id, user_id, str(user_id))
+    
+    if user_email:
+        filters.add(AuditLog.user_email, user_email)
+    
+    if ip_address:
+        normalized_ip = normalize_ip(ip_address)
+        if normalized_ip:
+            filters.add(AuditLog.ip_address, normalized_ip)
+        else:
+            filters.conditions.append(false())
+            filters.match_nothing = True
+    
+    if status:
+        filters.add(AuditLog.status, status)
+    
+    if target_type:
+        filters.add(AuditLog.target_type, target_type)
+    
+    if reason:
+        try:
+            audit_reason = AuditReason(reason.lower())
+            filters.add(AuditLog.reason, audit_reason, audit_reason.value)
+        except ValueError:
+            filters.conditions.append(false())
+            filters.match_nothing = True
+    
+    return filters
+
+
+def _decode_keyset_cursor(cursor: str) -> tuple:
+    """(timestamp, id) position encoded in an X-Next-Cursor header"""
+    try:
+        cursor_timestamp, cursor_id = decode_cursor(cursor)
+        return datetime.fromisoformat(cursor_timestamp), UUID(cursor_id)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _log_response(log: AuditLog, user_agent: Optional[str] = None) -> AuditLogResponse:
+    return AuditLogResponse(
+        id=str(log.id),
+        timestamp=log.timestamp,
+        action=log.action.value,
+        user_email=log.user_email,
+        organization_id=str(log.organization_id) if log.organization_id else None,
+        target_type=log.target_type,
+        ip_address=str(log.ip_address) if log.ip_address else None,
+        user_agent=user_agent,
+        status=log.status,
+        reason=log.reason.value if log.reason else None,
+        details=log.details,
+        error_message=log.error_message
+    )
+
+
+def _archived_logs(filters: AuditLogFilters, after: Optional[tuple] = None) -> Iterator[dict]:
+    """Archived rows matching the filters, newest first, when the window reaches the archive"""
+    boundary = filters.archive_boundary
+    if filters.match_nothing or not boundary or filters.start_date >= boundary:
+        return iter(())
+    
+    rows = iter_archived_rows(
+        filters.start_date,
+        boundary,
+        organization_id=filters.organization_id,
+        actions=filters.actions,
+        before=after
+    )
+    return (row for row in rows if filters.matches(row))
+
+
+@router.get("/logs", response_model=List[AuditLogResponse])
+async def get_audit_logs(
+    response: Response,
+    filters: AuditLogFilters = Depends(audit_log_filters),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    current_admin: User = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    Get audit logs with filters, newest first
+    
+    Pages are keyset paginated on (timestamp, id): pass the X-Next-Cursor
+    header of a response as ``cursor`` to fetch the following page. Windows
+    reaching past the hot table continue into the cold archive.
+    """
+    
+    query = db.query(AuditLog).filter(*filters.conditions)
+    
+    after = None
+    if cursor:
+        after = _decode_keyset_cursor(cursor)
+        query = query.filter(tuple_(AuditLog.timestamp, AuditLog.id) < after)
     
     # Order and limit
-    logs = query.order_by(desc(AuditLog.timestamp)).limit(limit).all()
-    
-    return [
-        AuditLogResponse(
-            id=str(log.id),
-            timestamp=log.timestamp,
-            action=log.action.value,
-            user_email=log.user_email,
-            organization_id=str(log.organization_id) if log.organization_id else None,
-            target_type=log.target_type,
-            ip_address=log.ip_address,
-            status=log.status,
-            details=log.details,
-            error_message=log.error_message
+    logs = query.order_by(desc(AuditLog.timestamp), desc(AuditLog.id)).limit(limit).all()
+    
+    # Archived rows are all older than the hot ones, so they continue the same order
+    archived = list(islice(_archived_logs(filters, after), limit - len(logs))) if len(logs) < limit else []
+    
+    results = [_log_response(log) for log in logs] + [AuditLogResponse(**row) for row in archived]
+    
+    if len(results) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor([results[-1].timestamp.isoformat(), results[-1].id])
+    
+    return results
+
+
+@router.get("/export")
+async def export_audit_logs(
+    filters: AuditLogFilters = Depends(audit_log_filters),
+    format: str = Query("ndjson", pattern=EXPORT_FORMAT_PATTERN),
+    gzip: bool = False,
+    current_admin: User = Depends(get_current_admin)
+):
+    """Stream audit logs matching the /logs filters as NDJSON or CSV, newest first"""
+    
+    statement = (
+        select(*AUDIT_LOG_COLUMNS)
+        .outerjoin(UserAgent, UserAgent.id == AuditLog.user_agent_id)
+        .where(*filters.conditions)
+        .order_by(desc(AuditLog.timestamp), desc(AuditLog.id))
+    )
+    columns = [column.key for column in AUDIT_LOG_COLUMNS]
+    
+    # Archived rows follow the hot ones when the window reaches the archive
+    archived = (
+        [row[column] for column in columns]
+        for row in _archived_logs(filters)
+    )
+    
+    return export_response(
+        columns,
+        chain(stream_rows(statement), archived),
+        format,
+        gzip,
+        "audit_logs"
+    )
+
+
+@router.get("/search", response_model=List[AuditLogResponse])
+async def search_audit_logs(
+    response: Response,
+    email: Optional[str] = Query(None, min_length=1, description="Case-insensitive email prefix"),
+    ip: Optional[str] = Query(None, description="IP address or CIDR range, e.g. 10.0.0.0/8"),
+    user_agent: Optional[str] = Query(None, min_length=3, description="Substring of the User-Agent"),
+    q: Optional[str] = Query(None, min_length=3, description="Substring of the email or error message"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    current_admin: User = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    Search recent audit logs by email prefix, IP range or user agent, newest first
+    
+    Each criterion is backed by its own index: lower(user_email) prefixes,
+    a GiST inet index for CIDR containment and pg_trgm indexes for substring
+    matches. The window defaults to the 30 days before ``end`` (now) and is
+    paginated like /logs through the X-Next-Cursor header.
+    """
+    
+    if not any((email, ip, user_agent, q)):
+        raise HTTPException(status_code=400, detail="Provide at least one of email, ip, user_agent or q")
+    
+    end = end or datetime.utcnow()
+    start = start or end - timedelta(days=30)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    
+    query = (
+        select(AuditLog, UserAgent.value)
+        .outerjoin(UserAgent, UserAgent.id == AuditLog.user_agent_id)
+        .where(AuditLog.timestamp >= start, AuditLog.timestamp < end)
+    )
+    
+    if email:
+        query = query.where(
+            func.lower(AuditLog.user_email).like(like_pattern(email.lower()) + "%", escape=LIKE_ESCAPE)
         )
-        for log in logs
-    ]
+    
+    if ip:
+        try:
+            network = ipaddress.ip_network(ip.strip(), strict=False)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid IP address or range: {ip}")
+        query = query.where(AuditLog.ip_address.op("<<=")(cast(str(network), INET)))
+    
+    if user_agent:
+        # Match the (few) interned agents first, then their audit rows by user_agent_id
+        query = query.where(AuditLog.user_agent_id.in_(
+            select(UserAgent.id).where(UserAgent.value.ilike(f"%{like_pattern(user_agent)}%", escape=LIKE_ESCAPE))
+        ))
+    
+    if q:
+        pattern = f"%{like_pattern(q)}%"
+        query = query.where(or_(
+            AuditLog.user_email.ilike(pattern, escape=LIKE_ESCAPE),
+            AuditLog.error_message.ilike(pattern, escape=LIKE_ESCAPE)
+        ))
+    
+    if cursor:
+        query = query.where(tuple_(AuditLog.timestamp, AuditLog.id) < _decode_keyset_cursor(cursor))
+    
+    rows = db.execute(
+        query.order_by(desc(AuditLog.timestamp), desc(AuditLog.id)).limit(limit)
+    ).all()
+    
+    if len(rows) == limit:
+        last = rows[-1][0]
+        response.headers["X-Next-Cursor"] = encode_cursor([last.timestamp.isoformat(), str(last.id)])
+    
+    return [_log_response(log, agent) for log, agent in rows]
 
 
 @router.get("/stats")
@@ -118,42 +362,61 @@ async def get_audit_stats(
     """Get audit statistics"""
     
     start_date = datetime.utcnow() - timedelta(days=days)
+    counts = count_audit_events(db, start_date, datetime.utcnow())
     
-    # Total actions
-    total_actions = db.query(AuditLog).filter(
-        AuditLog.timestamp >= start_date
-    ).count()
-    
-    # Failed logins
-    failed_logins = db.query(AuditLog).filter(
-        AuditLog.timestamp >= start_date,
-        AuditLog.action == AuditAction.LOGIN_FAILED
-    ).count()
-    
-    # User activities
-    user_activities = db.query(AuditLog).filter(
-        AuditLog.timestamp >= start_date,
-        AuditLog.action.in_([
-            AuditAction.USER_CREATED,
-            AuditAction.USER_UPDATED,
-            AuditAction.USER_DELETED
-        ])
-    ).count()
-    
-    # Org activities
-    org_activities = db.query(AuditLog).filter(
-        AuditLog.timestamp >= start_date,
-        AuditLog.action.in_([
-            AuditAction.ORG_CREATED,
-            AuditAction.ORG_UPDATED,
-            AuditAction.ORG_DELETED
-        ])
-    ).count()
+    by_action = Counter()
+    for (_, action, _), count in counts.items():
+        by_action[action] += count
     
     return {
-        "total_actions": total_actions,
-        "failed_logins": failed_logins,
-        "user_activities": user_activities,
-        "org_activities": org_activities,
+        "total_actions": sum(by_action.values()),
+        "failed_logins": by_action[AuditAction.LOGIN_FAILED],
+        "user_activities": sum(by_action[action] for action in USER_ACTIONS),
+        "org_activities": sum(by_action[action] for action in ORG_ACTIONS),
         "period_days": days
     }
+
+
+@router.get("/timeseries")
+async def get_audit_timeseries(
+    days: int = 30,
+    organization_id: Optional[UUID] = None,
+    action: Optional[str] = None,
+    current_admin: User = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """Get per-day audit activity for charts"""
+    
+    actions = None
+    if action:
+        try:
+            actions = [AuditAction(action.lower())]
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid action: {action}")
+    
+    now = datetime.utcnow()
+    start_date = (now - timedelta(days=days - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    counts = count_audit_events(
+        db, start_date, now, by_day=True, organization_id=organization_id, actions=actions
+    )
+    
+    series = {}
+    for offset in range(days):
+        day = (start_date + timedelta(days=offset)).date()
+        series[day] = {"date": day.isoformat(), "total": 0, "failed": 0, "by_action": {}}
+    
+    for (day, event_action, status), count in counts.items():
+        point = series.get(day)
+        if point is None:
+            continue
+        point["total"] += count
+        if status == "failed":
+            point["failed"] += count
+        point["by_action"][event_action.value] = point["by_action"].get(event_action.value, 0) + count
+    
+    return {
+        "period_days": days,
+        "organization_id": str(organization_id) if organization_id else None,
+        "action": action,
+        "points": list(series.values())
+    }
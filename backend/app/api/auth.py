@@ -1,18 +1,55 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
+from typing import Optional
+from uuid import UUID
 from app.db.database import get_db, get_redis
 from app.models.user import User
 from app.models.organization import Organization
-from app.models.audit_log import AuditLog, AuditAction
+from app.models.audit_log import AuditLog, AuditAction, AuditReason
 from app.schemas.auth import LoginRequest, Token, RefreshTokenRequest, ValidateTokenRequest, ValidateTokenResponse
-from app.core.security import create_access_token, create_refresh_token, verify_password, verify_token
+from app.core.security import create_access_token, create_refresh_token, verify_and_update_password, verify_token
 from app.core.permissions import get_user_permissions
-from app.core.middleware import get_client_ip, check_ip_whitelist
+from app.core.middleware import get_client_ip, check_ip_whitelist, normalize_ip
+from app.core.cache import refresh_token_key, license_cache_key
+from app.core.counters import record_login_outcome
+from app.core.user_agents import intern_user_agent
+from app.core.tracing import span
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 
+def _log_failed_login(
+    db: Session,
+    redis,
+    request: Request,
+    client_ip: str,
+    reason: AuditReason,
+    error_message: str,
+    user_email: Optional[str],
+    user_id: Optional[UUID] = None,
+    organization_id: Optional[UUID] = None
+):
+    """Write the LOGIN_FAILED audit entry and bump the security counters"""
+    audit_log = AuditLog(
+        action=AuditAction.LOGIN_FAILED,
+        user_id=user_id,
+        user_email=user_email,
+        organization_id=organization_id,
+        ip_address=normalize_ip(client_ip),
+        user_agent_id=intern_user_agent(request.headers.get("User-Agent")),
+        status="failed",
+        reason=reason,
+        error_message=error_message
+    )
+    with span("audit.commit", reason=reason.value):
+        db.add(audit_log)
+        db.commit()
+    
+    with span("redis.counters"):
+        record_login_outcome(redis, success=False, reason=reason.value, organization_id=organization_id)
+
+
 @router.post("/login", response_model=Token)
 async def login(
     request: Request,
@@ -26,96 +63,74 @@ async def login(
     client_ip = get_client_ip(request)
     
     # Find user
-    user = db.query(User).filter(User.email == credentials.email).first()
-    if not user or not verify_password(credentials.password, user.password_hash):
-        # Log failed login attempt
-        audit_log = AuditLog(
-            action=AuditAction.LOGIN_FAILED,
-            user_email=credentials.email,
-            organization_id=user.organization_id if user else None,
-            ip_address=client_ip,
-            user_agent=request.headers.get("User-Agent"),
-            status="failed",
+    with span("db.user"):
+        user = db.query(User).filter(User.email == credentials.email).first()
+    password_ok, new_password_hash = False, None
+    with span("verify_password"):
+        if user is not None:
+            password_ok, new_password_hash = verify_and_update_password(credentials.password, user.password_hash)
+    if not password_ok:
+        _log_failed_login(
+            db, redis, request, client_ip,
+            reason=AuditReason.INVALID_CREDENTIALS,
             error_message="Invalid email or password",
-            details={"reason": "invalid_credentials", "email": credentials.email}
+            user_email=credentials.email,
+            organization_id=user.organization_id if user else None
         )
-        db.add(audit_log)
-        db.commit()
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
     if not user.is_active:
-        # Log failed login - inactive user
-        audit_log = AuditLog(
-            action=AuditAction.LOGIN_FAILED,
-            user_id=user.id,
-            user_email=user.email,
-            organization_id=user.organization_id,
-            ip_address=client_ip,
-            user_agent=request.headers.get("User-Agent"),
-            status="failed",
+        _log_failed_login(
+            db, redis, request, client_ip,
+            reason=AuditReason.USER_INACTIVE,
             error_message="User account is disabled",
-            details={"reason": "user_inactive", "email": user.email}
+            user_email=user.email,
+            user_id=user.id,
+            organization_id=user.organization_id
         )
-        db.add(audit_log)
-        db.commit()
         raise HTTPException(status_code=403, detail="User account is disabled")
     
     # Get organization
-    organization = db.query(Organization).filter(Organization.id == user.organization_id).first()
+    with span("db.organization"):
+        organization = db.query(Organization).filter(Organization.id == user.organization_id).first()
     if not organization:
         raise HTTPException(status_code=404, detail="Organization not found")
     
     if not organization.is_active:
-        # Log failed login - inactive organization
-        audit_log = AuditLog(
-            action=AuditAction.LOGIN_FAILED,
-            user_id=user.id,
-            user_email=user.email,
-            organization_id=organization.id,
-            ip_address=client_ip,
-            user_agent=request.headers.get("User-Agent"),
-            status="failed",
+        _log_failed_login(
+            db, redis, request, client_ip,
+            reason=AuditReason.ORGANIZATION_INACTIVE,
             error_message="Organization is disabled",
-            details={"reason": "organization_inactive", "organization": organization.name}
+            user_email=user.email,
+            user_id=user.id,
+            organization_id=organization.id
         )
-        db.add(audit_log)
-        db.commit()
         raise HTTPException(status_code=403, detail="Organization is disabled")
     
     # Check license validity
     if not organization.is_license_valid():
-        # Log failed login - expired license
-        audit_log = AuditLog(
-            action=AuditAction.LOGIN_FAILED,
-            user_id=user.id,
-            user_email=user.email,
-            organization_id=organization.id,
-            ip_address=client_ip,
-            user_agent=request.headers.get("User-Agent"),
-            status="failed",
+        _log_failed_login(
+            db, redis, request, client_ip,
+            reason=AuditReason.LICENSE_EXPIRED,
             error_message="Organization license has expired",
-            details={"reason": "license_expired", "organization": organization.name}
+            user_email=user.email,
+            user_id=user.id,
+            organization_id=organization.id
         )
-        db.add(audit_log)
-        db.commit()
         raise HTTPException(status_code=403, detail="Organization license has expired")
     
     # Check IP whitelist
-    if not check_ip_whitelist(client_ip, organization.allowed_ips):
-        # Log failed login - IP not whitelisted
-        audit_log = AuditLog(
-            action=AuditAction.LOGIN_FAILED,
-            user_id=user.id,
-            user_email=user.email,
-            organization_id=organization.id,
-            ip_address=client_ip,
-            user_agent=request.headers.get("User-Agent"),
-            status="failed",
+    with span("ip_whitelist"):
+        ip_allowed = check_ip_whitelist(client_ip, organization.allowed_ips)
+    if not ip_allowed:
+        _log_failed_login(
+            db, redis, request, client_ip,
+            reason=AuditReason.IP_NOT_WHITELISTED,
             error_message=f"IP address {client_ip} is not whitelisted",
-            details={"reason": "ip_not_whitelisted", "ip": client_ip, "allowed_ips": organization.allowed_ips}
+            user_email=user.email,
+            user_id=user.id,
+            organization_id=organization.id
         )
-        db.add(audit_log)
-        db.commit()
         raise HTTPException(
             status_code=403,
             detail=f"IP address {client_ip} is not whitelisted for this organization"
@@ -127,17 +142,25 @@ async def login(
         user_id=user.id,
         user_email=user.email,
         organization_id=organization.id,
-        ip_address=client_ip,
-        user_agent=request.headers.get("User-Agent"),
+        ip_address=normalize_ip(client_ip),
+        user_agent_id=intern_user_agent(request.headers.get("User-Agent")),
         status="success",
-        details={"organization": organization.name, "role": user.role.value}
+        details={"role": user.role.value}
     )
     db.add(audit_log)
     
     # Update last login
     user.last_login = datetime.utcnow()
     user.last_ip = client_ip
-    db.commit()
+    
+    # Bring hashes of another bcrypt cost to the configured one while the password is at hand
+    if new_password_hash:
+        user.password_hash = new_password_hash
+    with span("audit.commit"):
+        db.commit()
+    
+    with span("redis.counters"):
+        record_login_outcome(redis, success=True, organization_id=organization.id)
     
     # Get permissions
     permissions = get_user_permissions(user.role)
@@ -151,22 +174,24 @@ async def login(
         "permissions": permissions
     }
     
-    access_token = create_access_token(token_data)
-    refresh_token = create_refresh_token({"user_id": str(user.id)})
+    with span("tokens"):
+        access_token = create_access_token(token_data)
+        refresh_token = create_refresh_token({"user_id": str(user.id)})
     
-    # Store refresh token in Redis
-    redis.setex(
-        f"refresh_token:{user.id}",
-        timedelta(days=7),
-        refresh_token
-    )
-    
-    # Cache license info
-    redis.setex(
-        f"license:{organization.id}",
-        timedelta(minutes=30),
-        f"{organization.is_license_valid()}"
-    )
+    with span("redis.setex"):
+        # Store refresh token in Redis
+        redis.setex(
+            refresh_token_key(user.id),
+            timedelta(days=7),
+            refresh_token
+        )
+        
+        # Cache license info
+        redis.setex(
+            license_cache_key(organization.id),
+            timedelta(minutes=30),
+            f"{organization.is_license_valid()}"
+        )
     
     return Token(
         access_token=access_token,
@@ -198,24 +223,28 @@ async def refresh_token(
     """Refresh access token using refresh token"""
     
     # Verify refresh token
-    payload = verify_token(token_request.refresh_token, token_type="refresh")
+    with span("verify_token"):
+        payload = verify_token(token_request.refresh_token, token_type="refresh")
     if not payload:
         raise HTTPException(status_code=401, detail="Invalid refresh token")
     
     user_id = payload.get("user_id")
     
     # Check if refresh token exists in Redis
-    stored_token = redis.get(f"refresh_token:{user_id}")
+    with span("redis.get"):
+        stored_token = redis.get(refresh_token_key(user_id))
     if not stored_token or stored_token != token_request.refresh_token:
         raise HTTPException(status_code=401, detail="Refresh token has been revoked")
     
     # Get user
-    user = db.query(User).filter(User.id == user_id).first()
+    with span("db.user"):
+        user = db.query(User).filter(User.id == user_id).first()
     if not user or not user.is_active:
         raise HTTPException(status_code=401, detail="User not found or inactive")
     
     # Get organization
-    organization = db.query(Organization).filter(Organization.id == user.organization_id).first()
+    with span("db.organization"):
+        organization = db.query(Organization).filter(Organization.id == user.organization_id).first()
     if not organization or not organization.is_active or not organization.is_license_valid():
         raise HTTPException(status_code=403, detail="Organization license invalid")
     
@@ -231,7 +260,8 @@ async def refresh_token(
         "permissions": permissions
     }
     
-    access_token = create_access_token(token_data)
+    with span("tokens"):
+        access_token = create_access_token(token_data)
     
     return Token(
         access_token=access_token,
@@ -262,28 +292,30 @@ async def validate_token_endpoint(
     """Validate user and organization license status"""
     
     # Get user
-    user = db.query(User).filter(User.id == validate_request.user_id).first()
+    with span("db.user"):
+        user = db.query(User).filter(User.id == validate_request.user_id).first()
     if not user or not user.is_active:
         return ValidateTokenResponse(
             valid=False,
             license_status="user_inactive",
             expires_at=None,
-            permissions=[]
+            permissions={}
         )
     
     # Get organization
-    organization = db.query(Organization).filter(Organization.id == validate_request.organization_id).first()
+    with span("db.organization"):
+        organization = db.query(Organization).filter(Organization.id == validate_request.organization_id).first()
     if not organization:
         return ValidateTokenResponse(
             valid=False,
             license_status="organization_not_found",
             expires_at=None,
-            permissions=[]
+            permissions={}
         )
     
     # Check license
     is_valid = organization.is_license_valid()
-    permissions = get_user_permissions(user.role) if is_valid else []
+    permissions = get_user_permissions(user.role) if is_valid else {}
     
     return ValidateTokenResponse(
         valid=is_valid,
@@ -337,5 +369,5 @@ async def logout(
     redis=Depends(get_redis)
 ):
     """Logout - revoke refresh token"""
-    redis.delete(f"refresh_token:{user_id}")
+    redis.delete(refresh_token_key(user_id))
     return {"message": "Logged out successfully"}
@@ -1,47 +1,132 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import inspect, text
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from sqlalchemy import Enum, String, select, tuple_
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any
-from app.db.database import get_db
+from typing import List, Dict, Any, Optional
+from datetime import date, datetime
+from app.db.database import get_db, get_redis
+from app.db.schema_cache import schema_cache, refresh_schema_cache
+from app.config import settings
+from app.core.export import export_response
+from app.core.pagination import encode_cursor, decode_cursor
+from app.core.filters import LIKE_ESCAPE, like_pattern
+from app.db.sql_console import RowBudget, prepare_statement, open_query, explain_query, query_error
+from app.db.table_stats import (
+    COUNT_MODE_PATTERN,
+    count_rows,
+    table_estimates,
+    get_exact_count,
+    get_exact_counts,
+    claim_exact_count,
+    run_exact_count,
+    cancel_exact_count,
+)
 from app.models.user import User, UserRole
 from app.api.admin import get_current_admin
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 router = APIRouter(prefix="/database", tags=["database"])
 
 
 class QueryRequest(BaseModel):
     query: str
+    format: str = Field("json", pattern="^(json|ndjson|csv)$")
+    gzip: bool = False
+    max_rows: Optional[int] = Field(None, ge=1)
+    explain: bool = False
+    explain_analyze: bool = False
 
 
 class QueryResult(BaseModel):
     columns: List[str]
     rows: List[List[Any]]
     row_count: int
+    truncated: bool = False
+
+
+def _require_table(db: Session, table_name: str):
+    if not schema_cache.has_table(db.bind, table_name):
+        raise HTTPException(status_code=404, detail="Table not found")
 
 
 @router.get("/tables")
 async def list_tables(
     current_admin: User = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    redis=Depends(get_redis)
+):
+    """
+    List all tables in the database (Admin only)
+    
+    Row counts are catalog estimates unless a recent exact count finished
+    (see POST /tables/{table_name}/count); ``rows_estimated`` tells which.
+    """
+    tables = table_estimates(db)
+    exact_counts = get_exact_counts(redis, [table["name"] for table in tables])
+    
+    for table in tables:
+        exact = exact_counts.get(table["name"])
+        table["exact_count"] = exact
+        table["rows_estimated"] = not (exact and exact["status"] == "done")
+        if not table["rows_estimated"]:
+            table["rows"] = exact["count"]
+    
+    return tables
+
+
+@router.post("/tables/{table_name}/count", status_code=202)
+async def start_exact_count(
+    table_name: str,
+    background_tasks: BackgroundTasks,
+    current_admin: User = Depends(get_current_admin),
+    db: Session = Depends(get_db),
+    redis=Depends(get_redis)
 ):
-    """List all tables in the database (Admin only)"""
-    inspector = inspect(db.bind)
-    tables = inspector.get_table_names()
+    """Start an exact COUNT(*) of a table in the background (Admin only)"""
+    _require_table(db, table_name)
     
-    table_info = []
-    for table_name in tables:
-        columns = inspector.get_columns(table_name)
-        result = db.execute(text(f"SELECT COUNT(*) FROM {table_name}"))
-        row_count = result.scalar()
-        
-        table_info.append({
-            "name": table_name,
-            "columns": len(columns),
-            "rows": row_count
-        })
+    state = claim_exact_count(redis, table_name)
+    if state is None:
+        # Already pending or running
+        return get_exact_count(redis, table_name)
     
-    return table_info
+    background_tasks.add_task(run_exact_count, redis, table_name, state)
+    return state
+
+
+@router.get("/tables/{table_name}/count")
+async def read_exact_count(
+    table_name: str,
+    current_admin: User = Depends(get_current_admin),
+    redis=Depends(get_redis)
+):
+    """Get the state or cached result of a table's exact count (Admin only)"""
+    state = get_exact_count(redis, table_name)
+    if state is None:
+        raise HTTPException(status_code=404, detail="No exact count requested for this table")
+    return state
+
+
+@router.delete("/tables/{table_name}/count")
+async def stop_exact_count(
+    table_name: str,
+    current_admin: User = Depends(get_current_admin),
+    db: Session = Depends(get_db),
+    redis=Depends(get_redis)
+):
+    """Cancel a running exact count (Admin only)"""
+    if db.bind.dialect.name != "postgresql":
+        raise HTTPException(status_code=400, detail="Cancelling counts requires PostgreSQL")
+    
+    return {"cancelled": cancel_exact_count(db, redis, table_name)}
+
+
+@router.post("/schema/refresh")
+async def refresh_schema(
+    current_admin: User = Depends(get_current_admin)
+):
+    """Drop cached schema metadata on every worker (Admin only)"""
+    return {"message": "Schema cache refreshed", "generation": refresh_schema_cache()}
 
 
 @router.get("/tables/{table_name}/schema")
@@ -51,91 +136,180 @@ async def get_table_schema(
     db: Session = Depends(get_db)
 ):
     """Get schema for a specific table (Admin only)"""
-    inspector = inspect(db.bind)
+    description = schema_cache.describe(db.bind, table_name)
     
-    if table_name not in inspector.get_table_names():
+    if description is None:
         raise HTTPException(status_code=404, detail="Table not found")
     
-    columns = inspector.get_columns(table_name)
-    primary_keys = inspector.get_pk_constraint(table_name)
-    foreign_keys = inspector.get_foreign_keys(table_name)
-    indexes = inspector.get_indexes(table_name)
+    return {"table_name": table_name, **description}
+
+
+# Operators accepted in filter=column:op:value
+FILTER_OPERATORS = {
+    "eq": lambda column, value: column == value,
+    "ne": lambda column, value: column != value,
+    "lt": lambda column, value: column < value,
+    "lte": lambda column, value: column <= value,
+    "gt": lambda column, value: column > value,
+    "gte": lambda column, value: column >= value,
+    "prefix": lambda column, value: column.like(like_pattern(value) + "%", escape=LIKE_ESCAPE),
+}
+NULL_OPERATORS = {
+    "null": lambda column: column.is_(None),
+    "notnull": lambda column: column.isnot(None),
+}
+
+
+def _coerce(column, raw: Any) -> Any:
+    """Convert a filter or cursor value to the Python type of a reflected column"""
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return raw if raw is None else str(raw)
+    
+    if raw is None or isinstance(raw, python_type):
+        return raw
+    if python_type is bool:
+        if str(raw).lower() in ("true", "1"):
+            return True
+        if str(raw).lower() in ("false", "0"):
+            return False
+        raise ValueError(raw)
+    if python_type in (datetime, date):
+        return python_type.fromisoformat(str(raw))
+    if python_type in (dict, list):
+        raise ValueError(raw)
+    return python_type(raw)
+
+
+def _parse_filter(table, spec: str):
+    """Build a condition from ``column:op[:value]``"""
+    column_name, _, rest = spec.partition(":")
+    op, _, raw = rest.partition(":")
+    column = table.c.get(column_name)
     
-    return {
-        "table_name": table_name,
-        "columns": columns,
-        "primary_keys": primary_keys,
-        "foreign_keys": foreign_keys,
-        "indexes": indexes
-    }
+    if column is None:
+        raise HTTPException(status_code=400, detail=f"Unknown filter column: {column_name}")
+    if op in NULL_OPERATORS:
+        return NULL_OPERATORS[op](column)
+    if op not in FILTER_OPERATORS:
+        raise HTTPException(status_code=400, detail=f"Unknown filter operator: {op}")
+    # LIKE only applies to text; enums and other types fail on PostgreSQL
+    if op == "prefix" and (not isinstance(column.type, String) or isinstance(column.type, Enum)):
+        raise HTTPException(status_code=400, detail=f"prefix needs a text column: {column_name}")
+    
+    try:
+        value = raw if op == "prefix" else _coerce(column, raw)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail=f"Invalid value for {column_name}: {raw}")
+    return FILTER_OPERATORS[op](column, value)
 
 
 @router.get("/tables/{table_name}/data")
 async def get_table_data(
     table_name: str,
-    limit: int = 100,
-    offset: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
+    columns: Optional[str] = Query(None, description="Comma-separated columns to return"),
+    filter: List[str] = Query([], description="column:op:value with op in eq, ne, lt, lte, gt, gte, prefix, null, notnull"),
+    count: str = Query("estimate", pattern=COUNT_MODE_PATTERN),
     current_admin: User = Depends(get_current_admin),
     db: Session = Depends(get_db)
 ):
     """Get data from a specific table with pagination (Admin only)"""
-    inspector = inspect(db.bind)
+    table = schema_cache.table(db.bind, table_name)
     
-    if table_name not in inspector.get_table_names():
+    if table is None:
         raise HTTPException(status_code=404, detail="Table not found")
     
-    # Get column names
-    columns = [col['name'] for col in inspector.get_columns(table_name)]
+    # Column projection
+    if columns:
+        names = [name.strip() for name in columns.split(",") if name.strip()]
+        unknown = [name for name in names if name not in table.c]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown columns: {', '.join(unknown)}")
+    else:
+        names = [column.name for column in table.c]
+    
+    conditions = [_parse_filter(table, spec) for spec in filter]
+    key = list(table.primary_key.columns)
+    
+    # Key columns are fetched (and stripped again) so the cursor can be built
+    selected = [table.c[name] for name in names] + [column for column in key if column.name not in names]
+    query = select(*selected).where(*conditions)
+    total_count = count_rows(db, query, count)
+    
+    if key:
+        query = query.order_by(*key)
+    
+    if cursor:
+        values = decode_cursor(cursor)
+        if not key or len(values) != len(key):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        try:
+            after = [_coerce(column, value) for column, value in zip(key, values)]
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.where(tuple_(*key) > tuple_(*after))
+    elif offset:
+        query = query.offset(offset)
     
-    # Get data
-    query = text(f"SELECT * FROM {table_name} LIMIT :limit OFFSET :offset")
-    result = db.execute(query, {"limit": limit, "offset": offset})
-    rows = [list(row) for row in result.fetchall()]
+    result = db.execute(query.limit(limit)).all()
+    rows = [list(row[:len(names)]) for row in result]
     
-    # Get total count
-    count_query = text(f"SELECT COUNT(*) FROM {table_name}")
-    total_count = db.execute(count_query).scalar()
+    next_cursor = None
+    if key and len(result) == limit:
+        last = result[-1]._mapping
+        next_cursor = encode_cursor([last[column] for column in key])
     
     return {
-        "columns": columns,
+        "columns": names,
         "rows": rows,
         "total_count": total_count,
         "limit": limit,
-        "offset": offset
+        "offset": offset,
+        "next_cursor": next_cursor
     }
 
 
-@router.post("/query", response_model=QueryResult)
-async def execute_query(
+@router.post("/query")
+def execute_query(
     query_request: QueryRequest,
-    current_admin: User = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    current_admin: User = Depends(get_current_admin)
 ):
     """Execute a SQL query (Admin only, SELECT queries only for safety)"""
-    query = query_request.query.strip()
+    query = prepare_statement(query_request.query)
+    
+    if query_request.explain:
+        return {
+            "plan": explain_query(query, query_request.explain_analyze, settings.SQL_CONSOLE_TIMEOUT_MS)
+        }
     
-    # Only allow SELECT queries for safety
-    if not query.upper().startswith("SELECT"):
-        raise HTTPException(
-            status_code=400,
-            detail="Only SELECT queries are allowed for safety"
+    budget = RowBudget(
+        min(query_request.max_rows or settings.SQL_CONSOLE_MAX_ROWS, settings.SQL_CONSOLE_MAX_ROWS),
+        settings.SQL_CONSOLE_MAX_BYTES
+    )
+    columns, rows = open_query(query, settings.SQL_CONSOLE_TIMEOUT_MS)
+    
+    if query_request.format != "json":
+        return export_response(
+            columns,
+            budget.take(rows),
+            query_request.format,
+            query_request.gzip,
+            "query",
+            headers={"X-Row-Limit": str(budget.max_rows), "X-Byte-Limit": str(budget.max_bytes)}
         )
     
     try:
-        result = db.execute(text(query))
-        rows = result.fetchall()
-        
-        if rows:
-            columns = list(rows[0]._mapping.keys())
-            data = [[getattr(row, col) for col in columns] for row in rows]
-        else:
-            columns = []
-            data = []
-        
-        return QueryResult(
-            columns=columns,
-            rows=data,
-            row_count=len(data)
-        )
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Query error: {str(e)}")
+        data = list(budget.take(rows))
+    except SQLAlchemyError as e:
+        raise query_error(e)
+    
+    return QueryResult(
+        columns=columns,
+        rows=data,
+        row_count=len(data),
+        truncated=budget.truncated
+    )
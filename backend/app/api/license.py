@@ -7,6 +7,7 @@ from app.models.organization import Organization
 from app.models.user import User
 from app.schemas.organization import LicenseStatus
 from app.core.security import verify_token
+from app.core.tracing import span
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 router = APIRouter(prefix="/license", tags=["License"])
@@ -20,7 +21,8 @@ async def check_organization_status(
 ):
     """Check if organization is active and can use MiniBeast"""
     
-    org = db.query(Organization).filter(Organization.id == org_id).first()
+    with span("db.organization"):
+        org = db.query(Organization).filter(Organization.id == org_id).first()
     if not org:
         raise HTTPException(status_code=404, detail="Organization not found")
     
@@ -53,13 +55,15 @@ async def get_current_user(
 ):
     """Get current authenticated user"""
     token = credentials.credentials
-    payload = verify_token(token)
+    with span("verify_token"):
+        payload = verify_token(token)
     
     if not payload:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
     
     user_id = payload.get("user_id")
-    user = db.query(User).filter(User.id == user_id).first()
+    with span("db.user"):
+        user = db.query(User).filter(User.id == user_id).first()
     
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
@@ -74,9 +78,10 @@ async def get_license_status(
 ):
     """Get current organization license status"""
     
-    organization = db.query(Organization).filter(
-        Organization.id == current_user.organization_id
-    ).first()
+    with span("db.organization"):
+        organization = db.query(Organization).filter(
+            Organization.id == current_user.organization_id
+        ).first()
     
     if not organization:
         raise HTTPException(status_code=404, detail="Organization not found")
@@ -88,10 +93,11 @@ async def get_license_status(
     days_remaining = (expiration_date - current_date).days
     
     # Count users
-    user_count = db.query(User).filter(
-        User.organization_id == organization.id,
-        User.is_active == True
-    ).count()
+    with span("db.user_count"):
+        user_count = db.query(User).filter(
+            User.organization_id == organization.id,
+            User.is_active == True
+        ).count()
     
     return LicenseStatus(
         organization_id=organization.id,
@@ -113,7 +119,8 @@ async def check_organization_license(
 ):
     """Check if organization license is valid (for main app periodic checks)"""
     
-    organization = db.query(Organization).filter(Organization.id == organization_id).first()
+    with span("db.organization"):
+        organization = db.query(Organization).filter(Organization.id == organization_id).first()
     
     if not organization:
         return {
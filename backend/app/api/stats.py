@@ -1,71 +1,75 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, select, and_
 from datetime import datetime, timedelta
-from app.db.database import get_db
-from app.models.user import User
-from app.models.organization import Organization
+from app.db.database import get_db, get_redis
+from app.models.user import User, UserRole
+from app.models.organization import Organization, LicenseType
 from app.api.admin import get_current_admin
+from app.core.cache import cached_snapshot
 
 router = APIRouter(prefix="/admin/stats", tags=["Stats"])
 
 
-@router.get("/dashboard")
-async def get_dashboard_stats(
-    current_admin: User = Depends(get_current_admin),
-    db: Session = Depends(get_db)
-):
-    """Get dashboard statistics"""
-    
-    # Total users
-    total_users = db.query(User).filter(User.is_active == True).count()
-    
-    # Total organizations
-    total_organizations = db.query(Organization).filter(Organization.is_active == True).count()
-    
-    # Active licenses (not expired)
-    active_licenses = db.query(Organization).filter(
-        Organization.is_active == True,
-        Organization.license_expires_at > datetime.utcnow()
-    ).count()
-    
-    # Expiring soon (within 30 days)
-    expiring_soon = db.query(Organization).filter(
-        Organization.is_active == True,
-        Organization.license_expires_at > datetime.utcnow(),
-        Organization.license_expires_at <= datetime.utcnow() + timedelta(days=30)
-    ).count()
-    
-    # Users created in last 7 days
-    last_week = datetime.utcnow() - timedelta(days=7)
-    new_users_week = db.query(User).filter(
-        User.created_at >= last_week
-    ).count()
-    
-    # User login activity (last 30 days)
-    last_month = datetime.utcnow() - timedelta(days=30)
-    active_users_month = db.query(User).filter(
-        User.last_login >= last_month
-    ).count()
-    
-    # License type distribution
-    license_distribution = db.query(
-        Organization.license_type,
-        func.count(Organization.id).label('count')
-    ).filter(Organization.is_active == True).group_by(Organization.license_type).all()
-    
-    license_types = {str(lt): count for lt, count in license_distribution}
-    
-    # Users by role
-    role_distribution = db.query(
-        User.role,
-        func.count(User.id).label('count')
-    ).filter(User.is_active == True).group_by(User.role).all()
-    
-    user_roles = {str(role): count for role, count in role_distribution}
-    
+def compute_dashboard_stats(db: Session) -> dict:
+    """Compute dashboard statistics with one aggregate pass per table"""
+
+    now = datetime.utcnow()
+    last_week = now - timedelta(days=7)
+    last_month = now - timedelta(days=30)
+
+    # User counters and role distribution (active users)
+    user_row = db.execute(
+        select(
+            func.count().filter(User.is_active == True).label("total_users"),
+            func.count().filter(User.created_at >= last_week).label("new_users_week"),
+            func.count().filter(User.last_login >= last_month).label("active_users_month"),
+            *[
+                func.count().filter(and_(User.is_active == True, User.role == role)).label(role.name)
+                for role in UserRole
+            ]
+        ).select_from(User)
+    ).one()
+
+    # Organization counters and license type distribution (active organizations)
+    org_row = db.execute(
+        select(
+            func.count().filter(Organization.is_active == True).label("total_organizations"),
+            func.count().filter(
+                Organization.is_active == True,
+                Organization.license_expires_at > now
+            ).label("active_licenses"),
+            func.count().filter(
+                Organization.is_active == True,
+                Organization.license_expires_at > now,
+                Organization.license_expires_at <= now + timedelta(days=30)
+            ).label("expiring_soon"),
+            *[
+                func.count().filter(
+                    and_(Organization.is_active == True, Organization.license_type == license_type)
+                ).label(license_type.name)
+                for license_type in LicenseType
+            ]
+        ).select_from(Organization)
+    ).one()
+
+    user_roles = {
+        str(role): user_row._mapping[role.name]
+        for role in UserRole
+        if user_row._mapping[role.name]
+    }
+    license_types = {
+        str(license_type): org_row._mapping[license_type.name]
+        for license_type in LicenseType
+        if org_row._mapping[license_type.name]
+    }
+
     # Recent users (last 5)
-    recent_users = db.query(User).order_by(User.created_at.desc()).limit(5).all()
+    recent_users = db.execute(
+        select(User.id, User.email, User.full_name, User.role, User.created_at)
+        .order_by(User.created_at.desc())
+        .limit(5)
+    ).all()
     recent_users_list = [{
         "id": str(user.id),
         "email": user.email,
@@ -73,25 +77,40 @@ async def get_dashboard_stats(
         "role": user.role.value,
         "created_at": user.created_at.isoformat()
     } for user in recent_users]
-    
+
     # Recent organizations (last 5)
-    recent_orgs = db.query(Organization).order_by(Organization.created_at.desc()).limit(5).all()
+    recent_orgs = db.execute(
+        select(Organization.id, Organization.name, Organization.license_type, Organization.created_at)
+        .order_by(Organization.created_at.desc())
+        .limit(5)
+    ).all()
     recent_orgs_list = [{
         "id": str(org.id),
         "name": org.name,
         "license_type": org.license_type.value,
         "created_at": org.created_at.isoformat()
     } for org in recent_orgs]
-    
+
     return {
-        "total_users": total_users,
-        "total_organizations": total_organizations,
-        "active_licenses": active_licenses,
-        "expiring_soon": expiring_soon,
-        "new_users_week": new_users_week,
-        "active_users_month": active_users_month,
+        "total_users": user_row.total_users,
+        "total_organizations": org_row.total_organizations,
+        "active_licenses": org_row.active_licenses,
+        "expiring_soon": org_row.expiring_soon,
+        "new_users_week": user_row.new_users_week,
+        "active_users_month": user_row.active_users_month,
         "license_distribution": license_types,
         "user_roles": user_roles,
         "recent_users": recent_users_list,
         "recent_organizations": recent_orgs_list
     }
+
+
+@router.get("/dashboard")
+async def get_dashboard_stats(
+    background_tasks: BackgroundTasks,
+    current_admin: User = Depends(get_current_admin),
+    db: Session = Depends(get_db),
+    redis=Depends(get_redis)
+):
+    """Get dashboard statistics (served from a short-lived shared snapshot)"""
+    return await cached_snapshot(redis, "dashboard", compute_dashboard_stats, db, background_tasks)
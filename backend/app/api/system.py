@@ -1,116 +1,113 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import String, text
+from sqlalchemy import text, func, select
 from datetime import datetime, timedelta
+from typing import Optional
 import time
-from app.db.database import get_db
+from app.db.database import get_db, get_redis
 from app.models.user import User, UserRole
 from app.models.organization import Organization
-from app.models.audit_log import AuditLog, AuditAction
+from app.models.audit_log import AuditReason
 from app.api.admin import get_current_admin
+from app.core.cache import cached_snapshot
+from app.core.counters import read_daily_counters, reason_metric, LOGIN_FAILED
+from app.core.metrics import Histogram, registry as metrics_registry, SLOT_SECONDS, WINDOW_SLOTS
+from app.db.instrumentation import slow_queries
+from app.core.tracing import trace_buffer
+from app.core.profiler import MAX_SECONDS as PROFILE_MAX_SECONDS, ProfilerBusy, profile
+from app.config import settings
 
 router = APIRouter(prefix="/admin", tags=["System"])
 
+# Endpoints reported slow above this p95, failed above this share of 5xx responses
+SLOW_P95_MS = 500
+ERROR_RATE_THRESHOLD = 0.05
+
+# Monitoring traffic that would only measure itself
+HEALTH_IGNORED_ROUTES = {"unmatched", "/metrics", "/health", "/admin/system/api-health", "/admin/system/stats"}
+
+
+def _latency_ms(seconds: float) -> int:
+    return int(round(seconds * 1000))
+
 
 def check_api_health():
-    """Check API health by measuring response time and availability"""
-    start_time = time.time()
-    try:
-        # Simple self-health check - measure time to get database connection
-        response_time = int((time.time() - start_time) * 1000)
-        
-        if response_time > 100:  # If response time > 100ms, consider it slow
-            return {
-                "status": "slow",
-                "response_time": response_time,
-                "message": f"API response slow ({response_time}ms)"
-            }
-        
+    """Overall API latency percentiles over the recent metrics window"""
+    overall = Histogram()
+    errors = 0
+    for (_, route), (histogram, route_errors) in metrics_registry.window().items():
+        if route in HEALTH_IGNORED_ROUTES:
+            continue
+        overall.merge(histogram)
+        errors += route_errors
+    
+    window_minutes = WINDOW_SLOTS * SLOT_SECONDS // 60
+    if not overall.count:
         return {
             "status": "healthy",
-            "response_time": response_time,
-            "message": "API Operational"
-        }
-    except Exception as e:
-        return {
-            "status": "error",
-            "response_time": int((time.time() - start_time) * 1000),
-            "message": f"API health check failed: {str(e)}"
+            "response_time": 0,
+            "message": f"No requests in the last {window_minutes} minutes",
+            "requests": 0
         }
+    
+    p50, p95, p99 = (_latency_ms(overall.quantile(q)) for q in (0.5, 0.95, 0.99))
+    
+    if errors / overall.count > ERROR_RATE_THRESHOLD:
+        status, message = "error", f"{errors} server errors in the last {window_minutes} minutes"
+    elif p95 > SLOW_P95_MS:
+        status, message = "slow", f"API response slow (p95 {p95}ms)"
+    else:
+        status, message = "healthy", "API Operational"
+    
+    return {
+        "status": status,
+        "response_time": p95,
+        "message": message,
+        "requests": overall.count,
+        "p50": p50,
+        "p95": p95,
+        "p99": p99
+    }
 
 
 def check_api_endpoints(db: Session):
-    """Check individual API endpoints for detailed health status"""
+    """Per-endpoint latency percentiles over the recent metrics window"""
     endpoints = []
     
-    # Authentication API
-    try:
-        start = time.time()
-        db.query(User).first()
-        response_time = int((time.time() - start) * 1000)
-        endpoints.append({
-            "name": "Authentication API",
-            "endpoint": "/auth/login",
-            "status": "healthy" if response_time < 100 else "slow",
-            "response_time": response_time,
-            "message": "Operational" if response_time < 100 else f"Slow ({response_time}ms)"
-        })
-    except Exception as e:
-        endpoints.append({
-            "name": "Authentication API",
-            "endpoint": "/auth/login",
-            "status": "failed",
-            "response_time": 0,
-            "message": f"Failed: {str(e)}"
-        })
-    
-    # Admin API
-    try:
-        start = time.time()
-        db.query(Organization).first()
-        response_time = int((time.time() - start) * 1000)
-        endpoints.append({
-            "name": "Admin API",
-            "endpoint": "/admin/users",
-            "status": "healthy" if response_time < 100 else "slow",
-            "response_time": response_time,
-            "message": "Operational" if response_time < 100 else f"Slow ({response_time}ms)"
-        })
-    except Exception as e:
-        endpoints.append({
-            "name": "Admin API",
-            "endpoint": "/admin/users",
-            "status": "failed",
-            "response_time": 0,
-            "message": f"Failed: {str(e)}"
-        })
-    
-    # License API
-    try:
-        start = time.time()
-        db.query(Organization).filter(Organization.license_expires_at != None).first()
-        response_time = int((time.time() - start) * 1000)
-        endpoints.append({
-            "name": "License API",
-            "endpoint": "/license/validate",
-            "status": "healthy" if response_time < 100 else "slow",
-            "response_time": response_time,
-            "message": "Operational" if response_time < 100 else f"Slow ({response_time}ms)"
-        })
-    except Exception as e:
+    for (method, route), (histogram, errors) in sorted(metrics_registry.window().items(), key=lambda item: item[0][1]):
+        if route in HEALTH_IGNORED_ROUTES:
+            continue
+        
+        p50, p95, p99 = (_latency_ms(histogram.quantile(q)) for q in (0.5, 0.95, 0.99))
+        error_rate = errors / histogram.count
+        
+        if error_rate > ERROR_RATE_THRESHOLD:
+            status, message = "failed", f"{errors} of {histogram.count} requests failed"
+        elif p95 > SLOW_P95_MS:
+            status, message = "slow", f"Slow (p95 {p95}ms)"
+        else:
+            status, message = "healthy", "Operational"
+        
         endpoints.append({
-            "name": "License API",
-            "endpoint": "/license/validate",
-            "status": "failed",
-            "response_time": 0,
-            "message": f"Failed: {str(e)}"
+            "name": f"{method} {route}",
+            "endpoint": route,
+            "method": method,
+            "status": status,
+            "response_time": p95,
+            "message": message,
+            "requests": histogram.count,
+            "errors": errors,
+            "p50": p50,
+            "p95": p95,
+            "p99": p99
         })
     
-    # Database API
+    # Database round trip
     try:
-        start = time.time()
+        start = time.perf_counter()
         db.execute(text("SELECT 1"))
-        response_time = int((time.time() - start) * 1000)
+        response_time = _latency_ms(time.perf_counter() - start)
         endpoints.append({
             "name": "Database Connection",
             "endpoint": "/database",
@@ -130,67 +127,66 @@ def check_api_endpoints(db: Session):
     return endpoints
 
 
-@router.get("/system/stats")
-async def get_system_stats(
-    current_admin: User = Depends(get_current_admin),
-    db: Session = Depends(get_db)
-):
-    """Get system statistics for monitoring dashboard (Admin only)"""
-    
-    # Organization stats
-    total_orgs = db.query(Organization).count()
-    active_orgs = db.query(Organization).filter(Organization.is_active == True).count()
-    paused_orgs = total_orgs - active_orgs
+def compute_system_stats(db: Session) -> dict:
+    """Compute monitoring counters with one aggregate pass per table"""
     
-    # User stats (excluding system admins)
-    total_users = db.query(User).filter(User.role != UserRole.ADMIN).count()
-    active_users = db.query(User).filter(
-        User.role != UserRole.ADMIN,
-        User.is_active == True
-    ).count()
-    
-    # License stats
     now = datetime.utcnow()
     thirty_days = now + timedelta(days=30)
     
-    expired_licenses = db.query(Organization).filter(
-        Organization.license_expires_at < now
-    ).count()
+    # Organization and license stats
+    org_row = db.execute(
+        select(
+            func.count().label("total_orgs"),
+            func.count().filter(Organization.is_active == True).label("active_orgs"),
+            func.count().filter(Organization.license_expires_at < now).label("expired_licenses"),
+            func.count().filter(
+                Organization.license_expires_at >= now,
+                Organization.license_expires_at <= thirty_days
+            ).label("expiring_soon")
+        ).select_from(Organization)
+    ).one()
     
-    expiring_soon = db.query(Organization).filter(
-        Organization.license_expires_at >= now,
-        Organization.license_expires_at <= thirty_days
-    ).count()
+    # User stats (excluding system admins)
+    user_row = db.execute(
+        select(
+            func.count().label("total_users"),
+            func.count().filter(User.is_active == True).label("active_users")
+        ).select_from(User).where(User.role != UserRole.ADMIN)
+    ).one()
     
-    # Security stats from audit logs
-    today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    # Security stats from the incrementally maintained login counters
+    security = read_daily_counters(
+        get_redis(), db, now, [LOGIN_FAILED, reason_metric(AuditReason.IP_NOT_WHITELISTED.value)]
+    )
     
-    failed_logins_today = db.query(AuditLog).filter(
-        AuditLog.action == AuditAction.LOGIN_FAILED,
-        AuditLog.timestamp >= today_start
-    ).count()
+    return {
+        "total_organizations": org_row.total_orgs,
+        "active_organizations": org_row.active_orgs,
+        "paused_organizations": org_row.total_orgs - org_row.active_orgs,
+        "total_users": user_row.total_users,
+        "active_users": user_row.active_users,
+        "expired_licenses": org_row.expired_licenses,
+        "expiring_soon": org_row.expiring_soon,
+        "failed_logins_today": security[LOGIN_FAILED],
+        "ip_violations_today": security[reason_metric(AuditReason.IP_NOT_WHITELISTED.value)]
+    }
+
+
+@router.get("/system/stats")
+async def get_system_stats(
+    background_tasks: BackgroundTasks,
+    current_admin: User = Depends(get_current_admin),
+    db: Session = Depends(get_db),
+    redis=Depends(get_redis)
+):
+    """Get system statistics for monitoring dashboard (Admin only)"""
     
-    ip_violations_today = db.query(AuditLog).filter(
-        AuditLog.action == AuditAction.LOGIN_FAILED,
-        AuditLog.timestamp >= today_start,
-        AuditLog.details['reason'].cast(String) == 'ip_not_whitelisted'
-    ).count()
+    stats = await cached_snapshot(redis, "system", compute_system_stats, db, background_tasks)
     
     # API health - use real health check
     api_health = check_api_health()
     
-    return {
-        "total_organizations": total_orgs,
-        "active_organizations": active_orgs,
-        "paused_organizations": paused_orgs,
-        "total_users": total_users,
-        "active_users": active_users,
-        "expired_licenses": expired_licenses,
-        "expiring_soon": expiring_soon,
-        "failed_logins_today": failed_logins_today,
-        "ip_violations_today": ip_violations_today,
-        "api_health": api_health
-    }
+    return {**stats, "api_health": api_health}
 
 
 @router.get("/system/api-health")
@@ -224,3 +220,76 @@ async def get_api_health_details(
         "failed_count": failed_count,
         "endpoints": endpoints
     }
+
+
+@router.get("/system/slow-queries")
+async def get_slow_queries(
+    limit: int = Query(20, ge=1, le=500),
+    order: str = Query("total", pattern="^(total|p99|max|mean|count)$"),
+    current_admin: User = Depends(get_current_admin)
+):
+    """Top statement fingerprints of this worker by total, p99, max or mean time, or count (Admin only)"""
+    return {
+        "threshold_ms": settings.SLOW_QUERY_MS,
+        "order": order,
+        "queries": slow_queries.top(limit, order)
+    }
+
+
+@router.delete("/system/slow-queries")
+async def reset_slow_queries(current_admin: User = Depends(get_current_admin)):
+    """Clear this worker's per-fingerprint statement statistics (Admin only)"""
+    slow_queries.reset()
+    return {"message": "Slow query statistics cleared"}
+
+
+@router.get("/system/traces")
+async def get_traces(
+    limit: int = Query(50, ge=1, le=500),
+    min_duration_ms: float = Query(0, ge=0),
+    name: Optional[str] = Query(None, description="Root span name, e.g. 'POST /auth/login'"),
+    current_admin: User = Depends(get_current_admin)
+):
+    """Most recent sampled traces of this worker, newest first (Admin only)"""
+    return {
+        "sample_rate": settings.TRACE_SAMPLE_RATE,
+        "forced_per_second": settings.TRACE_FORCED_PER_SECOND,
+        "export_dropped": trace_buffer.exporter.dropped if trace_buffer.exporter else 0,
+        "traces": trace_buffer.recent(limit, min_duration_ms, name)
+    }
+
+
+@router.get("/system/traces/{trace_id}")
+async def get_trace(
+    trace_id: str,
+    current_admin: User = Depends(get_current_admin)
+):
+    """One sampled trace with all its spans (Admin only)"""
+    trace = trace_buffer.get(trace_id)
+    if not trace:
+        raise HTTPException(status_code=404, detail="Trace not found in this worker's buffer")
+    return trace
+
+
+@router.post("/system/profile")
+def profile_worker(
+    seconds: float = Query(10, gt=0, le=PROFILE_MAX_SECONDS),
+    interval_ms: float = Query(10, ge=1, le=1000),
+    format: str = Query("collapsed", pattern="^(collapsed|json)$"),
+    include_idle: bool = False,
+    current_admin: User = Depends(get_current_admin)
+):
+    """
+    Sample the stacks of the worker serving this request for N seconds (Admin only).
+    
+    Returns collapsed stacks (flamegraph.pl / speedscope input) or a JSON summary
+    of the hottest functions. Runs in the threadpool, so traffic keeps flowing.
+    """
+    try:
+        result = profile(seconds, interval_ms, include_idle)
+    except ProfilerBusy:
+        raise HTTPException(status_code=409, detail="A profile is already running in this worker")
+    
+    if format == "json":
+        return result.summary()
+    return PlainTextResponse(result.collapsed())
@@ -27,6 +27,10 @@ class Settings(BaseSettings):
         "http://64.227.183.35"
     ]
     
+    # Password hashing cost (2**rounds bcrypt iterations); calibrate with python -m app.core.bcrypt_calibration.
+    # Hashes of any other cost are rehashed on the next successful login.
+    BCRYPT_ROUNDS: int = 12
+    
     # Admin
     ADMIN_EMAIL: str = "admin@example.com"
     ADMIN_PASSWORD: str = "admin123"
@@ -34,6 +38,43 @@ class Settings(BaseSettings):
     # License Check Interval (minutes)
     LICENSE_CHECK_INTERVAL: int = 30
     
+    # Audit log partitions (monthly): created ahead of time, detached or dropped past retention
+    AUDIT_PARTITIONS_AHEAD: int = 3
+    AUDIT_RETENTION_MONTHS: int = 12
+    AUDIT_RETENTION_ACTION: str = "detach"  # detach | drop
+    
+    # Cold audit archive: rows older than this many days move to compressed files
+    AUDIT_ARCHIVE_DIR: str = "archive/audit_logs"
+    AUDIT_ARCHIVE_AFTER_DAYS: int = 90
+    
+    # Log every SQL statement (SQLAlchemy echo); the slow query log covers normal operation
+    SQL_ECHO: bool = False
+    
+    # Statements at least this slow are logged; per-fingerprint stats keep this many fingerprints
+    SLOW_QUERY_MS: int = 200
+    SLOW_QUERY_FINGERPRINTS: int = 500
+    
+    # Debug mode: warn when one statement fingerprint runs more often than this in a request (N+1)
+    QUERY_REPEAT_WARN_THRESHOLD: int = 10
+    
+    # Request tracing: share of requests traced, traces per second honoured from incoming sampled
+    # traceparents (callers cannot force tracing beyond it), traces kept in memory, and an optional
+    # JSON lines file every trace is appended to, rotated to <file>.1 past TRACE_EXPORT_MAX_MB
+    TRACE_SAMPLE_RATE: float = 0.01
+    TRACE_FORCED_PER_SECOND: float = 10
+    TRACE_BUFFER_SIZE: int = 200
+    TRACE_EXPORT_FILE: str = ""
+    TRACE_EXPORT_MAX_MB: int = 100
+    
+    # SQL console limits (per query)
+    SQL_CONSOLE_TIMEOUT_MS: int = 15000
+    SQL_CONSOLE_MAX_ROWS: int = 10000
+    SQL_CONSOLE_MAX_BYTES: int = 10 * 1024 * 1024
+    
+    # Stats snapshots (seconds): served fresh for TTL, then stale while one worker recomputes
+    STATS_SNAPSHOT_TTL: int = 15
+    STATS_SNAPSHOT_STALE_TTL: int = 120
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -0,0 +1,260 @@
+"""
+Cold audit archive
+
+Audit rows older than the hot retention are moved out of audit_logs into
+gzip-compressed JSON Lines files, one per UTC day:
+
+    <AUDIT_ARCHIVE_DIR>/2026/01/audit_logs_2026-01-31.jsonl.gz
+
+Rows inside a file are stored newest first, matching the API's ordering, so
+pages can be streamed without loading a whole file. index.json records the
+archive boundary (every row older than ``archived_before`` lives in the
+archive rather than in audit_logs) and, per file, its row count, time range
+and the organizations and actions it contains, which lets readers skip files
+that cannot match a query.
+"""
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from uuid import UUID
+from app.config import settings
+from app.core.export import plain_value
+from app.models.audit_log import AuditLog, AuditAction
+from app.models.user_agent import UserAgent
+import gzip
+import json
+import os
+
+MANIFEST_NAME = "index.json"
+
+# Columns stored per archived row (user agents are stored as text so files stand alone)
+AUDIT_LOG_COLUMNS = [
+    AuditLog.id,
+    AuditLog.timestamp,
+    AuditLog.action,
+    AuditLog.user_id,
+    AuditLog.user_email,
+    AuditLog.organization_id,
+    AuditLog.target_id,
+    AuditLog.target_type,
+    AuditLog.ip_address,
+    UserAgent.value.label("user_agent"),
+    AuditLog.status,
+    AuditLog.reason,
+    AuditLog.details,
+    AuditLog.error_message,
+]
+
+# Parsed manifest per archive directory, reused while index.json is unchanged
+_manifest_cache: Dict[str, Tuple[int, dict]] = {}
+
+
+def archive_dir() -> str:
+    return settings.AUDIT_ARCHIVE_DIR
+
+
+def day_file_path(day: date) -> str:
+    """Path of a day's archive file, relative to the archive directory"""
+    return f"{day:%Y}/{day:%m}/audit_logs_{day.isoformat()}.jsonl.gz"
+
+
+def _write_atomic(path: str, write):
+    """Write a file through a temporary name so readers never see partial content"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_manifest(directory: Optional[str] = None) -> dict:
+    """Read index.json; an absent archive is an empty manifest"""
+    directory = directory or archive_dir()
+    path = os.path.join(directory, MANIFEST_NAME)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return {"archived_before": None, "files": []}
+
+    cached = _manifest_cache.get(directory)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    with open(path) as f:
+        manifest = json.load(f)
+    _manifest_cache[directory] = (mtime, manifest)
+    return manifest
+
+
+def save_manifest(manifest: dict, directory: Optional[str] = None):
+    directory = directory or archive_dir()
+    path = os.path.join(directory, MANIFEST_NAME)
+    payload = json.dumps(manifest, indent=1, sort_keys=True).encode()
+    _write_atomic(path, lambda f: f.write(payload))
+    _manifest_cache[directory] = (os.stat(path).st_mtime_ns, json.loads(payload))
+
+
+def archived_before(directory: Optional[str] = None) -> Optional[datetime]:
+    """Boundary below which audit rows live in the archive, or None without an archive"""
+    value = load_manifest(directory)["archived_before"]
+    return datetime.fromisoformat(value) if value else None
+
+
+def _records(rows: Iterable[tuple]) -> Iterator[dict]:
+    columns = [column.key for column in AUDIT_LOG_COLUMNS]
+    for row in rows:
+        yield {column: plain_value(value) for column, value in zip(columns, row)}
+
+
+def _write_records(day: date, records: Iterable[dict], directory: str) -> Optional[dict]:
+    entry = {
+        "path": day_file_path(day),
+        "rows": 0,
+        "min_timestamp": None,
+        "max_timestamp": None,
+        "organization_ids": set(),
+        "actions": set(),
+    }
+
+    def write(f):
+        with gzip.GzipFile(fileobj=f, mode="wb") as out:
+            for record in records:
+                out.write(json.dumps(record, default=str).encode())
+                out.write(b"\n")
+
+                if entry["max_timestamp"] is None:
+                    entry["max_timestamp"] = record["timestamp"]
+                entry["min_timestamp"] = record["timestamp"]
+                entry["organization_ids"].add(record["organization_id"])
+                entry["actions"].add(record["action"])
+                entry["rows"] += 1
+
+    path = os.path.join(directory, entry["path"])
+    _write_atomic(path, write)
+
+    if not entry["rows"]:
+        os.remove(path)
+        return None
+
+    entry["organization_ids"] = sorted(entry["organization_ids"], key=lambda value: value or "")
+    entry["actions"] = sorted(entry["actions"])
+    return entry
+
+
+def write_day_file(day: date, rows: Iterable[tuple], directory: Optional[str] = None) -> Optional[dict]:
+    """
+    Write one day's rows (ordered newest first, in AUDIT_LOG_COLUMNS order)
+    to its archive file and return the file's manifest entry, or None when
+    there were no rows.
+    """
+    return _write_records(day, _records(rows), directory or archive_dir())
+
+
+def read_day_file(day: date, directory: Optional[str] = None) -> Iterator[dict]:
+    """Rows of a day's archive file, newest first; none when the day has no file"""
+    path = os.path.join(directory or archive_dir(), day_file_path(day))
+    if not os.path.exists(path):
+        return
+    with gzip.open(path, "rt") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def merge_day_file(day: date, rows: Iterable[tuple], directory: Optional[str] = None) -> Optional[dict]:
+    """
+    Add rows (in AUDIT_LOG_COLUMNS order) to a day's archive file, keeping it
+    ordered newest first, and return the file's new manifest entry. Rows the
+    file already holds are stored once.
+    """
+    directory = directory or archive_dir()
+    records = {record["id"]: record for record in read_day_file(day, directory)}
+    for record in _records(rows):
+        records[record["id"]] = record
+
+    ordered = sorted(
+        records.values(),
+        key=lambda record: (datetime.fromisoformat(record["timestamp"]), UUID(record["id"])),
+        reverse=True
+    )
+    return _write_records(day, ordered, directory)
+
+
+def _candidate_files(
+    manifest: dict,
+    start: datetime,
+    end: datetime,
+    organization_id: Optional[UUID],
+    actions: Optional[List[AuditAction]]
+) -> List[dict]:
+    """Manifest entries whose index says they may hold matching rows, newest first"""
+    start_iso, end_iso = start.isoformat(), end.isoformat()
+    organization = str(organization_id) if organization_id else None
+    action_values = {action.value for action in actions} if actions else None
+
+    files = []
+    for entry in manifest["files"]:
+        if entry["max_timestamp"] < start_iso or entry["min_timestamp"] >= end_iso:
+            continue
+        if organization and organization not in entry["organization_ids"]:
+            continue
+        if action_values and not action_values.intersection(entry["actions"]):
+            continue
+        files.append(entry)
+    return sorted(files, key=lambda entry: entry["max_timestamp"], reverse=True)
+
+
+def iter_archived_rows(
+    start: datetime,
+    end: datetime,
+    organization_id: Optional[UUID] = None,
+    actions: Optional[List[AuditAction]] = None,
+    before: Optional[Tuple[datetime, UUID]] = None,
+    directory: Optional[str] = None
+) -> Iterator[dict]:
+    """
+    Yield archived rows with start <= timestamp < end, newest first.
+
+    ``before`` is a (timestamp, id) keyset position; only rows ordered after
+    it are returned. Rows are dicts of JSON values keyed by column name.
+    """
+    directory = directory or archive_dir()
+    if before and before[0] < end:
+        end = before[0] + timedelta(microseconds=1)
+
+    organization = str(organization_id) if organization_id else None
+    action_values = {action.value for action in actions} if actions else None
+
+    for entry in _candidate_files(load_manifest(directory), start, end, organization_id, actions):
+        with gzip.open(os.path.join(directory, entry["path"]), "rt") as f:
+            for line in f:
+                row = json.loads(line)
+                timestamp = datetime.fromisoformat(row["timestamp"])
+                if timestamp >= end:
+                    continue
+                if timestamp < start:
+                    break
+                if before and (timestamp, UUID(row["id"])) >= before:
+                    continue
+                if organization and row["organization_id"] != organization:
+                    continue
+                if action_values and row["action"] not in action_values:
+                    continue
+                yield row
+
+
+def count_archived_events(
+    start: datetime,
+    end: datetime,
+    by_day: bool = False,
+    organization_id: Optional[UUID] = None,
+    actions: Optional[List[AuditAction]] = None,
+    directory: Optional[str] = None
+) -> Counter:
+    """Count archived events in [start, end) per (day, action, status)"""
+    counts = Counter()
+    for row in iter_archived_rows(start, end, organization_id, actions, directory=directory):
+        day = datetime.fromisoformat(row["timestamp"]).date() if by_day else None
+        counts[(day, AuditAction(row["action"]), row["status"])] += 1
+    return counts
@@ -0,0 +1,118 @@
+"""
+Audit event counts answered from hourly rollups
+
+audit_rollups holds complete hourly buckets up to the rollup watermark. A
+window is answered from the rollups for the whole hours it covers and from
+audit_logs only for the partial hour at its start and the rows newer than
+the watermark, so the cost no longer grows with the window length. Raw
+pieces older than the cold archive boundary are counted from the archive.
+"""
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+from sqlalchemy import Date, cast, func, select
+from sqlalchemy.orm import Session
+from app.models.audit_log import AuditLog, AuditAction
+from app.models.audit_rollup import AuditRollup, RollupWatermark
+from app.core.audit_archive import archived_before, count_archived_events
+
+AUDIT_ROLLUP_WATERMARK = "audit_rollups"
+
+# (day or None, action, status) -> count
+CountKey = Tuple[Optional[date], AuditAction, Optional[str]]
+
+
+def floor_hour(at: datetime) -> datetime:
+    return at.replace(minute=0, second=0, microsecond=0)
+
+
+def ceil_hour(at: datetime) -> datetime:
+    floored = floor_hour(at)
+    return floored if floored == at else floored + timedelta(hours=1)
+
+
+def get_rollup_watermark(db: Session) -> Optional[datetime]:
+    watermark = db.get(RollupWatermark, AUDIT_ROLLUP_WATERMARK)
+    return watermark.processed_until if watermark else None
+
+
+def _count_raw(
+    db: Session,
+    start: datetime,
+    end: datetime,
+    by_day: bool,
+    organization_id: Optional[UUID],
+    actions: Optional[List[AuditAction]]
+) -> Counter:
+    # Rows below the boundary are counted from the archive only, even before the archiver deletes them
+    boundary = archived_before()
+    hot_start = max(start, boundary) if boundary else start
+    day = cast(AuditLog.timestamp, Date) if by_day else None
+    columns = [AuditLog.action, AuditLog.status] + ([day] if by_day else [])
+    query = select(*columns, func.count()).where(
+        AuditLog.timestamp >= hot_start,
+        AuditLog.timestamp < end
+    )
+    if organization_id:
+        query = query.where(AuditLog.organization_id == organization_id)
+    if actions:
+        query = query.where(AuditLog.action.in_(actions))
+
+    counts = Counter()
+    for row in db.execute(query.group_by(*columns)):
+        counts[(row[2] if by_day else None, row[0], row[1])] += row[-1]
+
+    if boundary and start < boundary:
+        counts.update(count_archived_events(start, min(end, boundary), by_day, organization_id, actions))
+    return counts
+
+
+def _count_rollups(
+    db: Session,
+    start: datetime,
+    end: datetime,
+    by_day: bool,
+    organization_id: Optional[UUID],
+    actions: Optional[List[AuditAction]]
+) -> Counter:
+    day = cast(AuditRollup.bucket_start, Date) if by_day else None
+    columns = [AuditRollup.action, AuditRollup.status] + ([day] if by_day else [])
+    query = select(*columns, func.sum(AuditRollup.count)).where(
+        AuditRollup.bucket_start >= start,
+        AuditRollup.bucket_start < end
+    )
+    if organization_id:
+        query = query.where(AuditRollup.organization_id == organization_id)
+    if actions:
+        query = query.where(AuditRollup.action.in_(actions))
+
+    counts = Counter()
+    for row in db.execute(query.group_by(*columns)):
+        counts[(row[2] if by_day else None, row[0], row[1] or None)] += int(row[-1])
+    return counts
+
+
+def count_audit_events(
+    db: Session,
+    start: datetime,
+    end: datetime,
+    by_day: bool = False,
+    organization_id: Optional[UUID] = None,
+    actions: Optional[List[AuditAction]] = None
+) -> Dict[CountKey, int]:
+    """Count audit events in [start, end) per (day, action, status)"""
+    watermark = get_rollup_watermark(db)
+
+    rollup_start = ceil_hour(start)
+    rollup_end = min(watermark, floor_hour(end)) if watermark else None
+
+    if rollup_end is None or rollup_start >= rollup_end:
+        return _count_raw(db, start, end, by_day, organization_id, actions)
+
+    counts = _count_rollups(db, rollup_start, rollup_end, by_day, organization_id, actions)
+    if start < rollup_start:
+        counts.update(_count_raw(db, start, rollup_start, by_day, organization_id, actions))
+    if rollup_end < end:
+        counts.update(_count_raw(db, rollup_end, end, by_day, organization_id, actions))
+    return counts
@@ -0,0 +1,117 @@
+"""
+Pick BCRYPT_ROUNDS for this host.
+
+Times bcrypt hashing at increasing cost factors on the machine it runs on
+and recommends the highest cost whose median hash time stays within
+--target-ms (never below --min-rounds). Every extra round doubles the time,
+so the search stops at the first cost over the target. With --write the
+recommendation is stored as BCRYPT_ROUNDS in the given .env file; existing
+password hashes move to the new cost as their users next log in.
+
+    python -m app.core.bcrypt_calibration --target-ms 250
+    python -m app.core.bcrypt_calibration --target-ms 250 --write .env
+"""
+from typing import Dict, List, Optional
+from passlib.hash import bcrypt
+from app.config import settings
+import argparse
+import logging
+import os
+import statistics
+import time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# OWASP's floor for bcrypt; lower costs are only for tests and benchmarks
+RECOMMENDED_MIN_ROUNDS = 10
+
+MAX_ROUNDS = 31
+
+
+def hash_time_ms(rounds: int, samples: int, password: str = "calibration-password") -> float:
+    """Median milliseconds to hash one password at ``rounds``"""
+    hasher = bcrypt.using(rounds=rounds)
+    hasher.hash(password)  # load the backend outside the timing
+    times = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        hasher.hash(password)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def calibrate(target_ms: float, min_rounds: int = 4, samples: int = 5) -> Dict[int, float]:
+    """Median hash times by cost, from ``min_rounds`` up to the first cost over ``target_ms``"""
+    timings = {}
+    for rounds in range(max(4, min_rounds), MAX_ROUNDS + 1):
+        timings[rounds] = hash_time_ms(rounds, samples)
+        logger.info(f"⏱️ rounds={rounds}: {timings[rounds]:.1f} ms")
+        if timings[rounds] > target_ms:
+            break
+    return timings
+
+
+def recommend(timings: Dict[int, float], target_ms: float, min_rounds: int) -> int:
+    """Highest measured cost within ``target_ms``, but at least ``min_rounds``"""
+    within = [rounds for rounds, ms in timings.items() if ms <= target_ms]
+    return max(within + [min_rounds])
+
+
+def write_env(path: str, rounds: int):
+    """Set BCRYPT_ROUNDS in a .env file, replacing an existing assignment"""
+    lines: List[str] = []
+    if os.path.exists(path):
+        with open(path) as f:
+            lines = f.read().splitlines()
+
+    assignment = f"BCRYPT_ROUNDS={rounds}"
+    for index, line in enumerate(lines):
+        if line.strip().startswith("BCRYPT_ROUNDS="):
+            lines[index] = assignment
+            break
+    else:
+        lines.append(assignment)
+
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure bcrypt on this host and recommend BCRYPT_ROUNDS")
+    parser.add_argument("--target-ms", type=float, default=250, help="Longest acceptable hash time (default 250)")
+    parser.add_argument("--min-rounds", type=int, default=RECOMMENDED_MIN_ROUNDS,
+                        help=f"Never recommend less than this (default {RECOMMENDED_MIN_ROUNDS})")
+    parser.add_argument("--samples", type=int, default=5, help="Hashes timed per cost factor")
+    parser.add_argument("--write", metavar="ENV_FILE", nargs="?", const=".env",
+                        help="Store the recommendation as BCRYPT_ROUNDS in this file (default .env)")
+    args = parser.parse_args(argv)
+
+    if args.min_rounds < RECOMMENDED_MIN_ROUNDS:
+        logger.warning(f"⚠️ --min-rounds {args.min_rounds} is below {RECOMMENDED_MIN_ROUNDS}; use it for tests only")
+
+    # Start a few costs below the floor to show how the time scales
+    timings = calibrate(args.target_ms, min_rounds=args.min_rounds - 2, samples=args.samples)
+    rounds = recommend(timings, args.target_ms, args.min_rounds)
+
+    if rounds not in timings or timings[rounds] > args.target_ms:
+        logger.warning(
+            f"⚠️ rounds={rounds} takes longer than {args.target_ms:g} ms on this host; "
+            f"logins will be slower than the target"
+        )
+    logger.info(
+        f"✅ Recommended BCRYPT_ROUNDS={rounds}"
+        + (f" ({timings[rounds]:.1f} ms per hash)" if rounds in timings else "")
+        + f", currently {settings.BCRYPT_ROUNDS}"
+    )
+
+    if args.write:
+        write_env(args.write, rounds)
+        logger.info(f"✅ Wrote BCRYPT_ROUNDS={rounds} to {args.write}; restart the API to apply it")
+    else:
+        print(rounds)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,138 @@
+"""
+Redis key layout, bulk invalidation and shared snapshot caching helpers
+"""
+from typing import Callable, Iterable, List
+from uuid import UUID
+from fastapi import BackgroundTasks
+from redis.exceptions import RedisError
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.db.database import SessionLocal
+import asyncio
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Number of keys sent per DEL command when purging in bulk
+DELETE_BATCH_SIZE = 500
+
+# Snapshot refresh lock lifetime and how long callers wait for a first snapshot
+SNAPSHOT_LOCK_SECONDS = 30
+SNAPSHOT_WAIT_SECONDS = 5
+SNAPSHOT_POLL_SECONDS = 0.05
+
+
+def refresh_token_key(user_id) -> str:
+    """Redis key holding a user's current refresh token"""
+    return f"refresh_token:{user_id}"
+
+
+def license_cache_key(organization_id) -> str:
+    """Redis key holding an organization's cached license state"""
+    return f"license:{organization_id}"
+
+
+def delete_keys(redis, keys: Iterable[str]) -> int:
+    """
+    Delete keys using batched DEL commands sent in a single pipeline.
+
+    Returns the number of keys that existed and were removed.
+    """
+    pipe = redis.pipeline(transaction=False)
+    batch: List[str] = []
+    for key in keys:
+        batch.append(key)
+        if len(batch) >= DELETE_BATCH_SIZE:
+            pipe.delete(*batch)
+            batch = []
+    if batch:
+        pipe.delete(*batch)
+    return sum(pipe.execute())
+
+
+def invalidate_license_cache(redis, organization_ids: Iterable[UUID]) -> int:
+    """Drop cached license state for the given organizations"""
+    return delete_keys(redis, (license_cache_key(org_id) for org_id in organization_ids))
+
+
+def purge_organization_sessions(redis, organization_id: UUID, user_ids: Iterable[UUID]) -> int:
+    """Revoke refresh tokens of an organization's users and drop its license cache"""
+    keys = [refresh_token_key(user_id) for user_id in user_ids]
+    keys.append(license_cache_key(organization_id))
+    return delete_keys(redis, keys)
+
+
+def snapshot_key(name: str) -> str:
+    """Redis key holding a cached stats snapshot"""
+    return f"snapshot:{name}"
+
+
+def _refresh_snapshot(redis, name: str, compute: Callable[[Session], dict], ttl: int, stale_ttl: int) -> dict:
+    """Compute a snapshot with a dedicated session and store it in Redis"""
+    db = SessionLocal()
+    try:
+        data = compute(db)
+    finally:
+        db.close()
+    _store_snapshot(redis, name, data, ttl, stale_ttl)
+    return data
+
+
+def _store_snapshot(redis, name: str, data: dict, ttl: int, stale_ttl: int):
+    payload = json.dumps({"computed_at": time.time(), "data": data}, default=str)
+    pipe = redis.pipeline(transaction=False)
+    pipe.set(snapshot_key(name), payload, ex=ttl + stale_ttl)
+    pipe.delete(f"{snapshot_key(name)}:lock")
+    pipe.execute()
+
+
+async def cached_snapshot(
+    redis,
+    name: str,
+    compute: Callable[[Session], dict],
+    db: Session,
+    background_tasks: BackgroundTasks,
+    ttl: int = settings.STATS_SNAPSHOT_TTL,
+    stale_ttl: int = settings.STATS_SNAPSHOT_STALE_TTL
+) -> dict:
+    """
+    Serve ``compute(db)`` from a Redis snapshot shared by all workers.
+
+    Snapshots younger than ``ttl`` are returned as-is. Older ones are still
+    returned, and whichever request wins the refresh lock recomputes them in
+    the background. When there is no snapshot at all, the lock winner
+    computes inline while concurrent callers wait for its result instead of
+    running the same queries themselves.
+    """
+    key = snapshot_key(name)
+    lock_key = f"{key}:lock"
+
+    try:
+        deadline = time.monotonic() + SNAPSHOT_WAIT_SECONDS
+        while True:
+            cached = redis.get(key)
+            if cached:
+                snapshot = json.loads(cached)
+                age = time.time() - snapshot["computed_at"]
+                if age > ttl and redis.set(lock_key, "1", nx=True, ex=SNAPSHOT_LOCK_SECONDS):
+                    background_tasks.add_task(_refresh_snapshot, redis, name, compute, ttl, stale_ttl)
+                return snapshot["data"]
+
+            if redis.set(lock_key, "1", nx=True, ex=SNAPSHOT_LOCK_SECONDS):
+                try:
+                    data = compute(db)
+                except Exception:
+                    redis.delete(lock_key)
+                    raise
+                _store_snapshot(redis, name, data, ttl, stale_ttl)
+                return data
+
+            if time.monotonic() >= deadline:
+                break
+            await asyncio.sleep(SNAPSHOT_POLL_SECONDS)
+    except RedisError as e:
+        logger.warning(f"Snapshot cache unavailable for {name}: {e}")
+
+    return compute(db)
@@ -0,0 +1,120 @@
+"""
+Streaming exports
+
+Rows are read through a server-side cursor and encoded as NDJSON or CSV
+chunk by chunk, optionally gzip-compressed on the fly, so an export holds a
+bounded amount of memory regardless of how many rows it returns.
+"""
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Iterable, Iterator, List, Optional, Sequence
+from uuid import UUID
+from fastapi.responses import StreamingResponse
+from sqlalchemy.sql import Select
+from app.db.database import SessionLocal
+import csv
+import io
+import json
+import zlib
+
+EXPORT_FORMATS = ("ndjson", "csv")
+EXPORT_FORMAT_PATTERN = "^(ndjson|csv)$"
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+# Rows fetched per server-side cursor round trip
+FETCH_BATCH_SIZE = 1000
+
+# Encoded bytes buffered before a chunk is handed to the response
+CHUNK_BYTES = 64 * 1024
+
+
+def plain_value(value: Any) -> Any:
+    """Convert a database value into something JSON can represent"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+def _csv_cell(value: Any) -> Any:
+    value = plain_value(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return "" if value is None else value
+
+
+def stream_rows(statement: Select, batch_size: int = FETCH_BATCH_SIZE) -> Iterator[Sequence[Any]]:
+    """Yield rows of a column select from a server-side cursor in a dedicated session"""
+    db = SessionLocal()
+    try:
+        result = db.execute(statement.execution_options(yield_per=batch_size))
+        for row in result:
+            yield row
+    finally:
+        db.close()
+
+
+def encode_rows(columns: List[str], rows: Iterable[Sequence[Any]], fmt: str) -> Iterator[bytes]:
+    """Encode rows as NDJSON lines or CSV records in chunks of about CHUNK_BYTES"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == "csv" else None
+
+    if writer:
+        writer.writerow(columns)
+
+    for row in rows:
+        if writer:
+            writer.writerow([_csv_cell(value) for value in row])
+        else:
+            buffer.write(json.dumps({column: plain_value(value) for column, value in zip(columns, row)}, default=str))
+            buffer.write("\n")
+
+        if buffer.tell() >= CHUNK_BYTES:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Compress a byte stream into a single gzip member as it is produced"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_response(
+    columns: List[str],
+    rows: Iterable[Sequence[Any]],
+    fmt: str,
+    compress: bool,
+    basename: str,
+    headers: Optional[dict] = None
+) -> StreamingResponse:
+    """Build a StreamingResponse downloading ``rows`` as basename.<fmt>[.gz]"""
+    chunks = encode_rows(columns, rows, fmt)
+    filename = f"{basename}_{datetime.utcnow():%Y%m%dT%H%M%S}.{fmt}"
+    media_type = MEDIA_TYPES[fmt]
+
+    if compress:
+        chunks = gzip_chunks(chunks)
+        filename += ".gz"
+        media_type = "application/gzip"
+
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', **(headers or {})}
+    )
@@ -0,0 +1,11 @@
+"""
+Helpers for user-supplied list filters
+"""
+
+# Escape character used with like_pattern(): column.like(pattern, escape=LIKE_ESCAPE)
+LIKE_ESCAPE = "\\"
+
+
+def like_pattern(value: str) -> str:
+    """Escape LIKE wildcards in user input so it matches literally (used with escape=LIKE_ESCAPE)"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
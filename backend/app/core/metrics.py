@@ -0,0 +1,256 @@
+"""
+In-process HTTP metrics
+
+MetricsMiddleware times every request and records it per route template
+(``/admin/users/{user_id}``, never the raw path) in log-linear histograms in
+the style of HdrHistogram: each power-of-two range of microseconds is split
+into SUB_BUCKETS linear buckets, so any quantile is accurate to within
+1/SUB_BUCKETS of its value at a fixed memory cost.
+
+Two views are kept: cumulative series since process start, exported at
+/metrics in the Prometheus text format, and a sliding window of the last
+WINDOW_SLOTS x SLOT_SECONDS used for the API health percentiles. Metrics are
+per process; with several workers, scrape or aggregate each one.
+"""
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+import threading
+import time
+
+# Linear sub-buckets per power of two (12.5% worst-case relative error)
+SUB_BUCKETS = 8
+
+# Highest tracked latency: 2**26 us (~67 s); slower requests land in the last bucket
+MAX_EXPONENT = 26
+
+# Sliding window for health percentiles: 5 one-minute slots
+SLOT_SECONDS = 60
+WINDOW_SLOTS = 5
+
+# Prometheus histogram bounds: every other power of two from ~1 ms to ~67 s
+EXPORT_EXPONENTS = list(range(10, MAX_EXPONENT + 1, 2))
+
+BUCKET_COUNT = (MAX_EXPONENT + 1) * SUB_BUCKETS
+
+
+def bucket_index(micros: int) -> int:
+    """Log-linear bucket of a latency in microseconds"""
+    if micros < SUB_BUCKETS:
+        return max(micros, 0)
+    exponent = micros.bit_length() - 1
+    if exponent > MAX_EXPONENT:
+        return BUCKET_COUNT - 1
+    # Values in [2**e, 2**(e+1)) are split into SUB_BUCKETS equal steps
+    sub = (micros - (1 << exponent)) * SUB_BUCKETS >> exponent
+    return exponent * SUB_BUCKETS + sub
+
+
+def bucket_upper_bound(index: int) -> int:
+    """Exclusive upper bound in microseconds of a bucket"""
+    exponent, sub = divmod(index, SUB_BUCKETS)
+    if exponent == 0:
+        return index + 1
+    step = max((1 << exponent) // SUB_BUCKETS, 1)
+    return (1 << exponent) + (sub + 1) * step
+
+
+class Histogram:
+    """Log-linear latency histogram"""
+
+    __slots__ = ("counts", "count", "total")
+
+    def __init__(self):
+        self.counts = [0] * BUCKET_COUNT
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, seconds: float):
+        self.counts[bucket_index(int(seconds * 1_000_000))] += 1
+        self.count += 1
+        self.total += seconds
+
+    def merge(self, other: "Histogram"):
+        for index, value in enumerate(other.counts):
+            if value:
+                self.counts[index] += value
+        self.count += other.count
+        self.total += other.total
+
+    def quantile(self, q: float) -> float:
+        """Upper bound in seconds of the bucket holding quantile q (0 when empty)"""
+        if not self.count:
+            return 0.0
+        rank = max(1, int(q * self.count + 0.5))
+        seen = 0
+        for index, value in enumerate(self.counts):
+            seen += value
+            if seen >= rank:
+                return bucket_upper_bound(index) / 1_000_000
+        return bucket_upper_bound(BUCKET_COUNT - 1) / 1_000_000
+
+    def cumulative(self, exponents: List[int]) -> List[Tuple[float, int]]:
+        """Counts of observations below 2**e microseconds, for each exponent"""
+        result = []
+        seen = 0
+        index = 0
+        for exponent in exponents:
+            boundary = exponent * SUB_BUCKETS
+            while index < boundary:
+                seen += self.counts[index]
+                index += 1
+            result.append(((1 << exponent) / 1_000_000, seen))
+        return result
+
+
+RouteKey = Tuple[str, str]  # (method, route template)
+
+
+class MetricsRegistry:
+    """Request counters, latency histograms and the in-flight gauge"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.in_flight = 0
+        self.requests: Dict[Tuple[str, str, int], int] = defaultdict(int)
+        self.latency: Dict[RouteKey, Histogram] = defaultdict(Histogram)
+        # route -> [statements, seconds] executed while serving it
+        self.db_usage: Dict[RouteKey, List[float]] = defaultdict(lambda: [0, 0.0])
+        # slot number -> route -> (histogram, errors)
+        self._window: Dict[int, Dict[RouteKey, List]] = {}
+
+    def observe(self, method: str, route: str, status: int, seconds: float):
+        slot = int(time.time() // SLOT_SECONDS)
+        key = (method, route)
+        with self._lock:
+            self.requests[(method, route, status)] += 1
+            self.latency[key].record(seconds)
+
+            routes = self._window.get(slot)
+            if routes is None:
+                routes = self._window[slot] = {}
+                for old in [s for s in self._window if s <= slot - WINDOW_SLOTS]:
+                    del self._window[old]
+            entry = routes.get(key)
+            if entry is None:
+                entry = routes[key] = [Histogram(), 0]
+            entry[0].record(seconds)
+            if status >= 500:
+                entry[1] += 1
+
+    def observe_queries(self, method: str, route: str, queries: int, seconds: float):
+        with self._lock:
+            usage = self.db_usage[(method, route)]
+            usage[0] += queries
+            usage[1] += seconds
+
+    def window(self) -> Dict[RouteKey, Tuple[Histogram, int]]:
+        """Per-route latency histogram and 5xx count over the sliding window"""
+        oldest = int(time.time() // SLOT_SECONDS) - WINDOW_SLOTS + 1
+        merged: Dict[RouteKey, Tuple[Histogram, int]] = {}
+        with self._lock:
+            for slot, routes in self._window.items():
+                if slot < oldest:
+                    continue
+                for key, (histogram, errors) in routes.items():
+                    total, total_errors = merged.get(key, (Histogram(), 0))
+                    total.merge(histogram)
+                    merged[key] = (total, total_errors + errors)
+        return merged
+
+    def render_prometheus(self) -> str:
+        """All series in the Prometheus text exposition format"""
+        lines = [
+            "# HELP http_requests_total HTTP requests by method, route template and status code.",
+            "# TYPE http_requests_total counter",
+        ]
+        with self._lock:
+            requests = sorted(self.requests.items())
+            latency = sorted((key, histogram.counts[:], histogram.count, histogram.total)
+                             for key, histogram in self.latency.items())
+            in_flight = self.in_flight
+            db_usage = sorted((key, usage[:]) for key, usage in self.db_usage.items())
+
+        for (method, route, status), value in requests:
+            lines.append(f'http_requests_total{{method="{method}",route="{_escape(route)}",status="{status}"}} {value}')
+
+        lines += [
+            "# HELP http_request_duration_seconds HTTP request latency by method and route template.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, route), counts, count, total in latency:
+            labels = f'method="{method}",route="{_escape(route)}"'
+            histogram = Histogram()
+            histogram.counts = counts
+            for bound, value in histogram.cumulative(EXPORT_EXPONENTS):
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound!r}"}} {value}')
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {total:.6f}")
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {count}")
+
+        lines += [
+            "# HELP db_queries_total SQL statements executed while serving requests, by route template.",
+            "# TYPE db_queries_total counter",
+        ]
+        for (method, route), (queries, _) in db_usage:
+            lines.append(f'db_queries_total{{method="{method}",route="{_escape(route)}"}} {queries}')
+        lines += [
+            "# HELP db_query_seconds_total Time spent executing SQL statements while serving requests.",
+            "# TYPE db_query_seconds_total counter",
+        ]
+        for (method, route), (_, seconds) in db_usage:
+            lines.append(f'db_query_seconds_total{{method="{method}",route="{_escape(route)}"}} {seconds:.6f}')
+
+        lines += [
+            "# HELP http_requests_in_flight HTTP requests currently being served.",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {in_flight}",
+            "# HELP process_start_time_seconds Start time of the process since the Unix epoch.",
+            "# TYPE process_start_time_seconds gauge",
+            f"process_start_time_seconds {self.started_at:.3f}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+registry = MetricsRegistry()
+
+
+def route_template(scope) -> Optional[str]:
+    """Path template of the route that handled a request, if any"""
+    route = scope.get("route")
+    return getattr(route, "path", None)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and concurrency of HTTP requests"""
+
+    def __init__(self, app, metrics: MetricsRegistry = registry):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        self.metrics.in_flight += 1
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.metrics.in_flight -= 1
+            # Unrouted requests (404s, CORS preflights) share one series to bound cardinality
+            route = route_template(scope) or "unmatched"
+            self.metrics.observe(scope["method"], route, status, time.perf_counter() - start)
@@ -1,5 +1,5 @@
 from fastapi import Request, HTTPException
-from typing import List
+from typing import List, Optional
 import ipaddress
 
 
@@ -47,6 +47,20 @@ def get_client_ip(request: Request) -> str:
     return "0.0.0.0"
 
 
+def normalize_ip(value: Optional[str]) -> Optional[str]:
+    """
+    Canonical form of an IP address for storage in inet columns.
+    Returns None for missing or unparseable values (e.g. spoofed proxy headers).
+    """
+    if not value:
+        return None
+    
+    try:
+        return str(ipaddress.ip_address(value.strip()))
+    except ValueError:
+        return None
+
+
 async def ip_whitelist_middleware(request: Request, allowed_ips: List[str]):
     """Middleware to check IP whitelist"""
     client_ip = get_client_ip(request)
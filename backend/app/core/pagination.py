@@ -0,0 +1,26 @@
+"""
+Opaque cursors for keyset pagination
+"""
+from typing import Any, List
+from fastapi import HTTPException
+import base64
+import json
+
+
+def encode_cursor(values: List[Any]) -> str:
+    """Encode the sort key of the last returned row"""
+    raw = json.dumps(values, default=str, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """Decode a cursor produced by encode_cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if not isinstance(values, list):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
@@ -0,0 +1,130 @@
+"""
+On-demand sampling profiler
+
+A background thread snapshots the stack of every other thread in the worker
+(``sys._current_frames``) at a fixed interval and counts identical stacks.
+Sampling only reads frames, so traffic keeps being served while it runs; the
+cost is one short GIL hold per interval. Results are in the collapsed-stack
+format (``root;caller;callee count`` per line) understood by flamegraph.pl,
+speedscope and inferno.
+
+Only one profile runs per worker at a time.
+"""
+from collections import Counter
+from typing import Dict
+import os
+import sys
+import threading
+import time
+
+MAX_SECONDS = 60
+MIN_INTERVAL_MS = 1
+
+# Leaf frames of threads parked waiting for work: the event loop's selector and idle threadpool workers
+IDLE_LEAVES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+    ("threading.py", "_wait_for_tstate_lock"),
+}
+
+_lock = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    """A profile is already running in this worker"""
+
+
+def _label(code) -> str:
+    filename = code.co_filename
+    for path in sorted(sys.path, key=len, reverse=True):
+        if path and filename.startswith(path + os.sep):
+            filename = filename[len(path) + 1:]
+            break
+    return f"{getattr(code, 'co_qualname', code.co_name)} ({filename}:{code.co_firstlineno})"
+
+
+def _is_idle(frame) -> bool:
+    code = frame.f_code
+    return (os.path.basename(code.co_filename), code.co_name) in IDLE_LEAVES
+
+
+class Profile:
+    """Stack samples collected over one profiling run"""
+
+    def __init__(self, seconds: float, interval: float, include_idle: bool):
+        self.seconds = seconds
+        self.interval = interval
+        self.include_idle = include_idle
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        self._labels: Dict[object, str] = {}
+
+    def _stack(self, frame) -> str:
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            label = self._labels.get(code)
+            if label is None:
+                label = self._labels[code] = _label(code)
+            names.append(label)
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def run(self):
+        me = threading.get_ident()
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        deadline = time.perf_counter() + self.seconds
+        next_tick = time.perf_counter()
+
+        while next_tick < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident == me or (not self.include_idle and _is_idle(frame)):
+                    continue
+                name = thread_names.get(ident)
+                if name is None:
+                    thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+                    name = thread_names.get(ident, str(ident))
+                self.stacks[f"{name};{self._stack(frame)}"] += 1
+            self.samples += 1
+
+            next_tick += self.interval
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self, limit: int = 30) -> dict:
+        """Sample counts plus the functions most often on top of a stack (self) or anywhere in it (total)"""
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")[1:]
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        return {
+            "seconds": self.seconds,
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "stack_samples": sum(self.stacks.values()),
+            "top_self": [{"frame": frame, "samples": count} for frame, count in own.most_common(limit)],
+            "top_total": [{"frame": frame, "samples": count} for frame, count in total.most_common(limit)],
+        }
+
+
+def profile(seconds: float, interval_ms: float = 10, include_idle: bool = False) -> Profile:
+    """Sample every thread of this process for ``seconds``; raises ProfilerBusy if one is already running"""
+    if not _lock.acquire(blocking=False):
+        raise ProfilerBusy()
+    try:
+        result = Profile(seconds, max(interval_ms, MIN_INTERVAL_MS) / 1000, include_idle)
+        sampler = threading.Thread(target=result.run, name="profiler", daemon=True)
+        sampler.start()
+        sampler.join()
+        return result
+    finally:
+        _lock.release()
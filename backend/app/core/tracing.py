@@ -0,0 +1,291 @@
+"""
+Lightweight request tracing
+
+TracingMiddleware gives every HTTP request a trace id, continuing the one of
+an incoming W3C ``traceparent`` header when present, and returns a
+``traceparent`` for the request's root span. A trace is recorded with
+probability TRACE_SAMPLE_RATE, or when the caller marked it sampled, up to
+TRACE_FORCED_PER_SECOND such traces (anyone can send the header); for
+unsampled requests ``span()`` does nothing but read a context variable.
+
+Recorded traces (root span plus the phase spans opened with ``span()``) go to
+an in-memory ring buffer of the last TRACE_BUFFER_SIZE traces, read by the
+admin traces endpoint, and, if TRACE_EXPORT_FILE is set, are queued for a
+writer thread that appends them as JSON lines, so requests never wait on
+file I/O. Like the metrics, the buffer is per worker process.
+"""
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+from app.config import settings
+from app.core.metrics import route_template
+import json
+import logging
+import os
+import queue
+import random
+import re
+import secrets
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+class Span:
+    """One timed phase of a trace"""
+
+    __slots__ = ("span_id", "parent_id", "name", "start", "end", "attributes", "error")
+
+    def __init__(self, name: str, parent_id: Optional[str], start: float, attributes: dict):
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.start = start
+        self.end: Optional[float] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+
+class Trace:
+    """Spans recorded while serving one request"""
+
+    __slots__ = ("trace_id", "parent_id", "sampled", "started_at", "origin", "spans", "root")
+
+    def __init__(self, trace_id: str, parent_id: Optional[str], sampled: bool):
+        self.trace_id = trace_id
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.started_at = time.time()
+        self.origin = time.perf_counter()
+        self.spans: List[Span] = []
+        self.root = Span("request", parent_id, 0.0, {})
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.root.span_id}-{'01' if self.sampled else '00'}"
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.root.name,
+            "started_at": datetime.utcfromtimestamp(self.started_at).isoformat(),
+            "duration_ms": _ms(self.root.end - self.root.start),
+            "attributes": self.root.attributes,
+            "spans": [
+                {
+                    "span_id": span.span_id,
+                    "parent_id": span.parent_id,
+                    "name": span.name,
+                    "start_ms": _ms(span.start),
+                    "duration_ms": _ms(span.end - span.start) if span.end is not None else None,
+                    "attributes": span.attributes,
+                    "error": span.error,
+                }
+                for span in [self.root] + self.spans
+            ],
+        }
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 3)
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("span", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Optional[Span]]:
+    """Time the enclosed block as a child of the current span, if the request is sampled"""
+    trace = _current_trace.get()
+    if trace is None or not trace.sampled:
+        yield None
+        return
+
+    parent = _current_span.get() or trace.root
+    current = Span(name, parent.span_id, time.perf_counter() - trace.origin, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = type(e).__name__
+        raise
+    finally:
+        current.end = time.perf_counter() - trace.origin
+        _current_span.reset(token)
+        trace.spans.append(current)
+
+
+class RateLimiter:
+    """Token bucket allowing ``rate`` events per second with bursts of up to one second's worth"""
+
+    def __init__(self, rate: float):
+        self._lock = threading.Lock()
+        self.rate = rate
+        self._tokens = rate
+        self._updated = time.monotonic()
+
+    def allow(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class TraceExporter:
+    """Appends trace records to a JSON lines file from a background thread"""
+
+    def __init__(self, path: str, max_bytes: int, queue_size: int = 1000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, record: dict):
+        """Queue a record without blocking; dropped (and counted) when the writer falls behind"""
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                    self._thread.start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            records = [self._queue.get()]
+            while len(records) < 100:
+                try:
+                    records.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with open(self.path, "a") as f:
+                    f.write("".join(json.dumps(record) + "\n" for record in records))
+                    size = f.tell()
+                # One previous file is kept, so the export stays below twice the limit
+                if size > self.max_bytes:
+                    os.replace(self.path, self.path + ".1")
+            except OSError as e:
+                logger.warning(f"⚠️ Trace export to {self.path} failed: {e}")
+
+
+class TraceBuffer:
+    """Ring buffer of the most recently finished traces, optionally mirrored to an exporter"""
+
+    def __init__(self, size: int, exporter: Optional[TraceExporter] = None):
+        self._lock = threading.Lock()
+        self._traces: deque = deque(maxlen=size)
+        self.exporter = exporter
+
+    def add(self, trace: Trace):
+        record = trace.to_dict()
+        with self._lock:
+            self._traces.append(record)
+        if self.exporter:
+            self.exporter.submit(record)
+
+    def recent(self, limit: int = 50, min_duration_ms: float = 0, name: Optional[str] = None) -> List[dict]:
+        """Newest first, optionally only traces at least this slow or with this root name"""
+        with self._lock:
+            traces = list(self._traces)
+        result = []
+        for record in reversed(traces):
+            if record["duration_ms"] < min_duration_ms or (name and record["name"] != name):
+                continue
+            result.append(record)
+            if len(result) >= limit:
+                break
+        return result
+
+    def get(self, trace_id: str) -> Optional[dict]:
+        with self._lock:
+            return next((record for record in self._traces if record["trace_id"] == trace_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._traces.clear()
+
+
+trace_buffer = TraceBuffer(
+    settings.TRACE_BUFFER_SIZE,
+    TraceExporter(settings.TRACE_EXPORT_FILE, settings.TRACE_EXPORT_MAX_MB * 1024 * 1024)
+    if settings.TRACE_EXPORT_FILE else None
+)
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """Trace id, parent span id and sampled flag of a version 00 traceparent header"""
+    if not value:
+        return None
+    match = _TRACEPARENT.match(value.strip().lower())
+    if not match or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+        return None
+    return match.group(1), match.group(2), bool(int(match.group(3), 16) & 1)
+
+
+class TracingMiddleware:
+    """ASGI middleware starting a trace per HTTP request and propagating traceparent"""
+
+    def __init__(self, app, buffer: TraceBuffer = trace_buffer):
+        self.app = app
+        self.buffer = buffer
+        self.forced = RateLimiter(settings.TRACE_FORCED_PER_SECOND)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = None
+        for key, value in scope.get("headers", []):
+            if key == b"traceparent":
+                incoming = parse_traceparent(value.decode("latin-1"))
+                break
+
+        if incoming:
+            trace_id, parent_id, requested = incoming
+            # The caller's sampled flag is honoured only within the forced-trace budget
+            sampled = random.random() < settings.TRACE_SAMPLE_RATE or (requested and self.forced.allow())
+        else:
+            trace_id, parent_id = secrets.token_hex(16), None
+            sampled = random.random() < settings.TRACE_SAMPLE_RATE
+
+        trace = Trace(trace_id, parent_id, sampled)
+        token = _current_trace.set(trace)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"traceparent", trace.traceparent().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_trace.reset(token)
+            if sampled:
+                trace.root.end = time.perf_counter() - trace.origin
+                trace.root.name = f"{scope['method']} {route_template(scope) or 'unmatched'}"
+                trace.root.attributes = {"path": scope["path"], "status": status}
+                self.buffer.add(trace)
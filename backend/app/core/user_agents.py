@@ -0,0 +1,59 @@
+"""
+User-Agent interning for audit logs
+
+Audit rows reference a user_agents row by id instead of repeating the full
+header. Lookups go through a small per-process LRU so the hot path does not
+touch the database for agents it has already seen.
+"""
+from collections import OrderedDict
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from app.db.database import engine
+from app.models.user_agent import UserAgent
+import hashlib
+import threading
+
+# Longest User-Agent stored; anything beyond is noise
+MAX_USER_AGENT_LENGTH = 1024
+
+CACHE_SIZE = 1024
+
+_cache: "OrderedDict[str, int]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _insert(dialect_name: str):
+    return sqlite.insert if dialect_name == "sqlite" else postgresql.insert
+
+
+def intern_user_agent(value: Optional[str]) -> Optional[int]:
+    """Return the user_agents id for a header value, creating the row if needed"""
+    if not value:
+        return None
+
+    value = value[:MAX_USER_AGENT_LENGTH]
+    digest = hashlib.md5(value.encode("utf-8", "replace")).hexdigest()
+
+    with _cache_lock:
+        user_agent_id = _cache.get(digest)
+        if user_agent_id is not None:
+            _cache.move_to_end(digest)
+            return user_agent_id
+
+    # Own short transaction, so a cached id always refers to a committed row
+    with engine.begin() as conn:
+        stmt = _insert(engine.dialect.name)(UserAgent).values(value_hash=digest, value=value)
+        stmt = stmt.on_conflict_do_nothing(index_elements=["value_hash"]).returning(UserAgent.id)
+        user_agent_id = conn.execute(stmt).scalar()
+        if user_agent_id is None:
+            user_agent_id = conn.execute(
+                select(UserAgent.id).where(UserAgent.value_hash == digest)
+            ).scalar_one()
+
+    with _cache_lock:
+        _cache[digest] = user_agent_id
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+    return user_agent_id
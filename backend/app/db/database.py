@@ -2,15 +2,19 @@ from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
+from app.db.instrumentation import install_query_hooks
 import redis
 
 # PostgreSQL
 engine = create_engine(
     settings.DATABASE_URL,
     pool_pre_ping=True,
-    echo=settings.DEBUG
+    echo=settings.SQL_ECHO
 )
 
+# Per-request statement counts and timings (X-DB-Queries / X-DB-Time)
+install_query_hooks(engine)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
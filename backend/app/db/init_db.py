@@ -1,5 +1,7 @@
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 from app.db.database import engine, Base, SessionLocal
+from app.db.partitions import DEFAULT_PARTITION, is_partitioned, ensure_default_partition, ensure_partitions
 from app.models.user import User, UserRole
 from app.models.organization import Organization, LicenseType
 from app.core.security import get_password_hash
@@ -14,11 +16,25 @@ logger = logging.getLogger(__name__)
 def init_db():
     """Initialize database with tables and default data"""
     
+    # Trigram search indexes need pg_trgm
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    
     # Create all tables
     logger.info("Creating database tables...")
     Base.metadata.create_all(bind=engine)
     logger.info("✅ Tables created successfully")
     
+    # audit_logs is range partitioned on PostgreSQL and needs partitions before the first insert
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            if is_partitioned(conn):
+                if ensure_default_partition(conn):
+                    logger.info(f"✅ Created partition {DEFAULT_PARTITION}")
+                for name in ensure_partitions(conn):
+                    logger.info(f"✅ Created partition {name}")
+    
     # Create default organization and admin user
     db = SessionLocal()
     try:
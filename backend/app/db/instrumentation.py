@@ -0,0 +1,214 @@
+"""
+SQL statistics
+
+Engine hooks count every statement and its execution time into the stats
+object of the request being served (a context variable, so it follows the
+request into threadpool endpoints and dependencies). QueryStatsMiddleware
+reports the totals as X-DB-Queries / X-DB-Time response headers and as
+metrics, and in debug mode warns when one statement fingerprint runs more
+than QUERY_REPEAT_WARN_THRESHOLD times in a request, the usual sign of an
+N+1 loop.
+
+Independently of requests, every statement is aggregated per fingerprint
+into a bounded in-memory table (count, total, max, p99), and statements
+slower than SLOW_QUERY_MS are logged.
+"""
+from collections import Counter, OrderedDict
+from contextvars import ContextVar
+from datetime import datetime
+from functools import lru_cache
+from typing import List, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.config import settings
+from app.core.metrics import Histogram, registry as metrics_registry, route_template
+import logging
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_COMMENT = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|(?<!:):\w+|\$\d+")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.I)
+_VALUES_LIST = re.compile(r"\bVALUES\s*(\([^()]*\))(?:\s*,\s*\([^()]*\))+", re.I)
+_SPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(statement: str) -> str:
+    """Normalize a statement so that executions differing only in values compare equal"""
+    statement = _COMMENT.sub(" ", statement)
+    statement = _STRING.sub("?", statement)
+    statement = _PLACEHOLDER.sub("?", statement)
+    statement = _NUMBER.sub("?", statement)
+    statement = _IN_LIST.sub("IN (...)", statement)
+    statement = _VALUES_LIST.sub(r"VALUES \1, ...", statement)
+    return _SPACE.sub(" ", statement).strip()
+
+
+class QueryStats:
+    """Statements executed while serving one request"""
+
+    __slots__ = ("queries", "seconds", "fingerprints")
+
+    def __init__(self, track_fingerprints: bool = False):
+        self.queries = 0
+        self.seconds = 0.0
+        self.fingerprints: Optional[Counter] = Counter() if track_fingerprints else None
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    return _current_stats.get()
+
+
+class FingerprintStats:
+    """Aggregated executions of one statement fingerprint"""
+
+    __slots__ = ("count", "total", "max", "slow", "histogram", "last_seen")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.slow = 0
+        self.histogram = Histogram()
+        self.last_seen = 0.0
+
+
+class SlowQueryRecorder:
+    """Per-fingerprint statement timings, keeping the most recently seen fingerprints"""
+
+    def __init__(self, capacity: int, threshold_ms: int):
+        self.capacity = capacity
+        self.threshold = threshold_ms / 1000
+        self._lock = threading.Lock()
+        self._stats: "OrderedDict[str, FingerprintStats]" = OrderedDict()
+
+    def record(self, statement: str, seconds: float):
+        key = fingerprint(statement)
+        slow = seconds >= self.threshold
+
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = FingerprintStats()
+                if len(self._stats) > self.capacity:
+                    self._stats.popitem(last=False)
+            else:
+                self._stats.move_to_end(key)
+            stats.count += 1
+            stats.total += seconds
+            stats.max = max(stats.max, seconds)
+            stats.histogram.record(seconds)
+            stats.last_seen = time.time()
+            if slow:
+                stats.slow += 1
+
+        if slow:
+            logger.warning(
+                f"🐢 Slow query ({seconds * 1000:.0f}ms): {statement[:500]}",
+                extra={"duration_ms": round(seconds * 1000, 1), "fingerprint": key}
+            )
+
+    def top(self, limit: int = 20, order: str = "total") -> List[dict]:
+        """Fingerprints ranked by total, p99, max, mean or count"""
+        with self._lock:
+            rows = [
+                {
+                    "fingerprint": key,
+                    "count": stats.count,
+                    "slow_count": stats.slow,
+                    "total_ms": round(stats.total * 1000, 1),
+                    "mean_ms": round(stats.total / stats.count * 1000, 2),
+                    "max_ms": round(stats.max * 1000, 1),
+                    "p99_ms": round(stats.histogram.quantile(0.99) * 1000, 1),
+                    "last_seen": datetime.utcfromtimestamp(stats.last_seen).isoformat(),
+                }
+                for key, stats in self._stats.items()
+            ]
+        key = "count" if order == "count" else f"{order}_ms"
+        return sorted(rows, key=lambda row: row[key], reverse=True)[:limit]
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+slow_queries = SlowQueryRecorder(settings.SLOW_QUERY_FINGERPRINTS, settings.SLOW_QUERY_MS)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    slow_queries.record(statement, elapsed)
+
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.seconds += elapsed
+        if stats.fingerprints is not None:
+            stats.fingerprints[fingerprint(statement)] += 1
+
+
+def _handle_error(context):
+    # Failed statements never reach after_cursor_execute
+    starts = context.connection.info.get("query_start") if context.connection is not None else None
+    if starts:
+        starts.pop()
+
+
+def install_query_hooks(engine: Engine):
+    """Time and count every statement executed through the engine"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+class QueryStatsMiddleware:
+    """ASGI middleware collecting the SQL statistics of each HTTP request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats(track_fingerprints=settings.DEBUG)
+        token = _current_stats.set(stats)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                # Statements run while streaming the body are not in the headers
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-queries", str(stats.queries).encode()))
+                headers.append((b"x-db-time", f"{stats.seconds * 1000:.1f}".encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_stats.reset(token)
+            route = route_template(scope) or "unmatched"
+            metrics_registry.observe_queries(scope["method"], route, stats.queries, stats.seconds)
+            if stats.fingerprints:
+                _warn_repeated(scope["method"], route, stats.fingerprints)
+
+
+def _warn_repeated(method: str, route: str, fingerprints: Counter):
+    for statement, count in fingerprints.most_common():
+        if count <= settings.QUERY_REPEAT_WARN_THRESHOLD:
+            break
+        logger.warning(f"⚠️ Possible N+1 in {method} {route}: statement ran {count} times: {statement[:300]}")
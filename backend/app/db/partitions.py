@@ -0,0 +1,220 @@
+"""
+Monthly range partitions for audit_logs
+
+Creates the partitions for the coming months ahead of time and detaches or
+drops the ones older than the configured retention. Rows whose month has no
+partition (the job fell behind) land in the DEFAULT partition instead of
+failing the insert; maintenance warns about them and moves them into their
+monthly partitions. Run it daily:
+
+    python -m app.db.partitions
+    python -m app.db.partitions --ahead 6 --retention-months 24 --action drop
+"""
+from datetime import date, datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from app.db.database import engine
+from app.config import settings
+import argparse
+import logging
+import re
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "audit_logs"
+PARTITION_PATTERN = re.compile(r"^audit_logs_y(\d{4})m(\d{2})$")
+DEFAULT_PARTITION = "audit_logs_default"
+
+
+def month_start(value) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(value: date, months: int) -> date:
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT_TABLE}_y{month.year:04d}m{month.month:02d}"
+
+
+def is_partitioned(conn: Connection) -> bool:
+    relkind = conn.execute(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:table)"),
+        {"table": PARENT_TABLE}
+    ).scalar()
+    return relkind == "p"
+
+
+def list_partitions(conn: Connection) -> List[Tuple[str, date]]:
+    """Attached monthly partitions as (name, month) sorted by month"""
+    names = conn.execute(text("""
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.oid = to_regclass(:table)
+    """), {"table": PARENT_TABLE}).scalars()
+
+    partitions = []
+    for name in names:
+        match = PARTITION_PATTERN.match(name)
+        if match:
+            partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(partitions, key=lambda item: item[1])
+
+
+def has_default_partition(conn: Connection) -> bool:
+    return bool(conn.execute(
+        text("SELECT partdefid <> 0 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"),
+        {"table": PARENT_TABLE}
+    ).scalar())
+
+
+def ensure_default_partition(conn: Connection) -> bool:
+    """Create the DEFAULT partition catching rows of months without a partition; True if created"""
+    if has_default_partition(conn):
+        return False
+    conn.execute(text(f'CREATE TABLE "{DEFAULT_PARTITION}" PARTITION OF {PARENT_TABLE} DEFAULT'))
+    return True
+
+
+def default_partition_months(conn: Connection) -> List[Tuple[date, int]]:
+    """(month, row count) of the rows waiting in the DEFAULT partition"""
+    rows = conn.execute(text(
+        f"SELECT date_trunc('month', timestamp)::date AS month, count(*) "
+        f'FROM "{DEFAULT_PARTITION}" GROUP BY 1 ORDER BY 1'
+    ))
+    return [(month, count) for month, count in rows]
+
+
+def create_partition(conn: Connection, month: date):
+    """Create the partition for ``month``, moving its rows out of the DEFAULT partition"""
+    name = partition_name(month)
+    bounds = f"FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    in_range = f"timestamp >= '{month.isoformat()}' AND timestamp < '{add_months(month, 1).isoformat()}'"
+
+    waiting = has_default_partition(conn) and conn.execute(
+        text(f'SELECT EXISTS (SELECT 1 FROM "{DEFAULT_PARTITION}" WHERE {in_range})')
+    ).scalar()
+    if not waiting:
+        conn.execute(text(f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF {PARENT_TABLE} FOR VALUES {bounds}'))
+        return
+
+    # PostgreSQL refuses a new partition whose range still has rows in the DEFAULT partition
+    conn.execute(text(f'CREATE TABLE "{name}" (LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'))
+    conn.execute(text(f'INSERT INTO "{name}" SELECT * FROM "{DEFAULT_PARTITION}" WHERE {in_range}'))
+    conn.execute(text(f'DELETE FROM "{DEFAULT_PARTITION}" WHERE {in_range}'))
+    conn.execute(text(f'ALTER TABLE {PARENT_TABLE} ATTACH PARTITION "{name}" FOR VALUES {bounds}'))
+
+
+def ensure_partitions(conn: Connection, ahead: int = settings.AUDIT_PARTITIONS_AHEAD,
+                      start: Optional[date] = None) -> List[str]:
+    """Create partitions from ``start`` (default: this month) through ``ahead`` months later"""
+    first = month_start(start or datetime.utcnow())
+    existing = {name for name, _ in list_partitions(conn)}
+
+    created = []
+    for offset in range(ahead + 1):
+        month = add_months(first, offset)
+        name = partition_name(month)
+        if name in existing:
+            continue
+        create_partition(conn, month)
+        created.append(name)
+    return created
+
+
+def drain_default_partition(conn: Connection) -> List[Tuple[str, int]]:
+    """Move rows out of the DEFAULT partition into their monthly partitions; returns (partition, rows)"""
+    if not has_default_partition(conn):
+        return []
+
+    moved = []
+    for month, count in default_partition_months(conn):
+        create_partition(conn, month)
+        moved.append((partition_name(month), count))
+    return moved
+
+
+def detached_name(conn: Connection, name: str, suffix: str = "detached") -> str:
+    """Free table name for a detached partition, e.g. audit_logs_y2026m01_detached"""
+    candidate, number = f"{name}_{suffix}", 1
+    while conn.execute(text("SELECT to_regclass(:table) IS NOT NULL"), {"table": candidate}).scalar():
+        number += 1
+        candidate = f"{name}_{suffix}{number}"
+    return candidate
+
+
+def remove_partitions_before(conn: Connection, before: date,
+                             action: str = settings.AUDIT_RETENTION_ACTION,
+                             suffix: str = "detached") -> List[str]:
+    """
+    Detach or drop partitions whose whole month lies before ``before``.
+
+    Detached partitions are renamed with ``suffix`` so the month's name is
+    free again should rows for it arrive later and need a new partition.
+    """
+    if action not in ("detach", "drop"):
+        raise ValueError(f"Unknown retention action: {action}")
+
+    removed = []
+    for name, month in list_partitions(conn):
+        if add_months(month, 1) > before:
+            break
+        if action == "drop":
+            conn.execute(text(f'DROP TABLE "{name}"'))
+            removed.append(name)
+        else:
+            conn.execute(text(f'ALTER TABLE {PARENT_TABLE} DETACH PARTITION "{name}"'))
+            new_name = detached_name(conn, name, suffix)
+            conn.execute(text(f'ALTER TABLE "{name}" RENAME TO "{new_name}"'))
+            removed.append(new_name)
+    return removed
+
+
+def apply_retention(conn: Connection, retention_months: int = settings.AUDIT_RETENTION_MONTHS,
+                    action: str = settings.AUDIT_RETENTION_ACTION) -> List[str]:
+    """Detach or drop partitions whose whole month is older than the retention"""
+    oldest_kept = add_months(month_start(datetime.utcnow()), -retention_months)
+    return remove_partitions_before(conn, oldest_kept, action)
+
+
+def maintain_partitions(ahead: int = settings.AUDIT_PARTITIONS_AHEAD,
+                        retention_months: int = settings.AUDIT_RETENTION_MONTHS,
+                        action: str = settings.AUDIT_RETENTION_ACTION):
+    with engine.begin() as conn:
+        if not is_partitioned(conn):
+            logger.warning(f"⚠️ {PARENT_TABLE} is not partitioned, run the Alembic migrations first")
+            return
+
+        if ensure_default_partition(conn):
+            logger.info(f"✅ Created partition {DEFAULT_PARTITION}")
+
+        for name, count in drain_default_partition(conn):
+            logger.warning(
+                f"⚠️ {count} audit rows were in {DEFAULT_PARTITION}; the partition job fell behind. "
+                f"Moved them to {name}"
+            )
+
+        for name in ensure_partitions(conn, ahead):
+            logger.info(f"✅ Created partition {name}")
+
+        for name in apply_retention(conn, retention_months, action):
+            logger.info(f"✅ {'Dropped partition' if action == 'drop' else 'Detached partition as'} {name}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain audit_logs monthly partitions")
+    parser.add_argument("--ahead", type=int, default=settings.AUDIT_PARTITIONS_AHEAD,
+                        help="Months of future partitions to keep created")
+    parser.add_argument("--retention-months", type=int, default=settings.AUDIT_RETENTION_MONTHS,
+                        help="Months of audit history to keep attached")
+    parser.add_argument("--action", choices=["detach", "drop"], default=settings.AUDIT_RETENTION_ACTION,
+                        help="What to do with partitions past retention")
+    args = parser.parse_args()
+
+    maintain_partitions(args.ahead, args.retention_months, args.action)
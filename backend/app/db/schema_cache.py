@@ -0,0 +1,134 @@
+"""
+Reflected schema metadata for the database explorer
+
+Reflection costs several catalog queries per table, so results are kept per
+process and reused until the schema version changes. The version is the
+current Alembic revision plus a generation counter in Redis that the refresh
+endpoint bumps for every worker. It is re-read at most every
+SCHEMA_CHECK_SECONDS, and entries older than SCHEMA_MAX_AGE_SECONDS are
+dropped anyway to pick up changes made outside migrations, such as new
+audit_logs partitions.
+"""
+from typing import Dict, List, Optional, Tuple
+from redis.exceptions import RedisError
+from sqlalchemy import MetaData, Table, inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+from app.db.database import get_redis
+import threading
+import time
+
+SCHEMA_CHECK_SECONDS = 30
+SCHEMA_MAX_AGE_SECONDS = 3600
+
+SCHEMA_GENERATION_KEY = "schema_cache:generation"
+
+
+class SchemaCache:
+    """Lazily reflected table names, table descriptions and Table objects"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version: Optional[Tuple[Optional[str], Optional[str]]] = None
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+        self._table_names: Optional[List[str]] = None
+        self._descriptions: Dict[str, dict] = {}
+        self._metadata = MetaData()
+
+    def _read_version(self, bind: Engine) -> Tuple[Optional[str], Optional[str]]:
+        revision = None
+        try:
+            with bind.connect() as conn:
+                revision = conn.execute(text("SELECT version_num FROM alembic_version")).scalar()
+        except DBAPIError:
+            # Schema created without Alembic (init_db)
+            pass
+
+        try:
+            generation = get_redis().get(SCHEMA_GENERATION_KEY)
+        except RedisError:
+            generation = None
+        return revision, generation
+
+    def _clear(self):
+        self._table_names = None
+        self._descriptions = {}
+        self._metadata = MetaData()
+        self._loaded_at = time.monotonic()
+
+    def _check(self, bind: Engine):
+        now = time.monotonic()
+        if now - self._checked_at < SCHEMA_CHECK_SECONDS:
+            return
+
+        version = self._read_version(bind)
+        with self._lock:
+            if version != self._version or now - self._loaded_at > SCHEMA_MAX_AGE_SECONDS:
+                self._version = version
+                self._clear()
+            self._checked_at = now
+
+    def invalidate(self):
+        """Drop everything cached in this process"""
+        with self._lock:
+            self._clear()
+            self._checked_at = 0.0
+
+    def table_names(self, bind: Engine) -> List[str]:
+        self._check(bind)
+        names = self._table_names
+        if names is None:
+            names = inspect(bind).get_table_names()
+            with self._lock:
+                self._table_names = names
+        return names
+
+    def has_table(self, bind: Engine, table_name: str) -> bool:
+        return table_name in self.table_names(bind)
+
+    def describe(self, bind: Engine, table_name: str) -> Optional[dict]:
+        """Columns, primary key, foreign keys and indexes of a table, or None if it does not exist"""
+        if not self.has_table(bind, table_name):
+            return None
+
+        description = self._descriptions.get(table_name)
+        if description is None:
+            inspector = inspect(bind)
+            description = {
+                "columns": inspector.get_columns(table_name),
+                "primary_keys": inspector.get_pk_constraint(table_name),
+                "foreign_keys": inspector.get_foreign_keys(table_name),
+                "indexes": inspector.get_indexes(table_name),
+            }
+            with self._lock:
+                self._descriptions[table_name] = description
+        return description
+
+    def column_names(self, bind: Engine, table_name: str) -> Optional[List[str]]:
+        description = self.describe(bind, table_name)
+        return [column["name"] for column in description["columns"]] if description else None
+
+    def table(self, bind: Engine, table_name: str) -> Optional[Table]:
+        """SQLAlchemy Table for building queries against a reflected table"""
+        if not self.has_table(bind, table_name):
+            return None
+
+        # MetaData is not safe for concurrent reflection
+        with self._lock:
+            table = self._metadata.tables.get(table_name)
+            if table is None:
+                table = Table(table_name, self._metadata, autoload_with=bind)
+        return table
+
+
+schema_cache = SchemaCache()
+
+
+def refresh_schema_cache() -> Optional[int]:
+    """Invalidate this process's cache and make every other worker reload on its next check"""
+    schema_cache.invalidate()
+    try:
+        return get_redis().incr(SCHEMA_GENERATION_KEY)
+    except RedisError:
+        return None
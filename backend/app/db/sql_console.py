@@ -0,0 +1,161 @@
+"""
+Resource-bounded execution of admin SQL console queries
+
+Each query runs on its own session inside a read-only transaction with a
+per-statement timeout (PostgreSQL), and rows are pulled from a server-side
+cursor only as fast as they are consumed. Consumers stop after a row cap
+and a byte cap, so a careless SELECT * cannot exhaust the worker's memory.
+"""
+from typing import Any, Iterator, List, Optional, Sequence, Tuple
+from fastapi import HTTPException
+from sqlalchemy.engine import CursorResult
+from sqlalchemy.exc import DBAPIError, SQLAlchemyError
+from sqlalchemy.orm import Session
+from app.db.database import SessionLocal
+from app.core.export import plain_value
+import json
+import sqlparse
+
+# Statement types the console accepts; the read-only transaction is the real guard
+ALLOWED_PREFIXES = ("SELECT", "WITH")
+
+# Rows fetched per server-side cursor round trip
+FETCH_BATCH_SIZE = 500
+
+
+class RowBudget:
+    """Row and byte caps for one console result, recording whether they cut it short"""
+
+    def __init__(self, max_rows: int, max_bytes: int):
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.rows = 0
+        self.bytes = 0
+        self.truncated = False
+
+    def take(self, rows: "QueryRows") -> Iterator[List[Any]]:
+        try:
+            for row in rows:
+                values = [plain_value(value) for value in row]
+                size = len(json.dumps(values, default=str))
+                if self.rows >= self.max_rows or self.bytes + size > self.max_bytes:
+                    self.truncated = True
+                    return
+                self.rows += 1
+                self.bytes += size
+                yield values
+        finally:
+            # Releases the query's session as soon as the caps are hit
+            rows.close()
+
+
+class QueryRows:
+    """Rows of a running console query; owns its session until exhausted or closed"""
+
+    def __init__(self, db: Session, result: CursorResult, first: Optional[Sequence[Any]]):
+        self._db = db
+        self._result = result
+        self._first = first
+
+    def __iter__(self) -> Iterator[Sequence[Any]]:
+        try:
+            if self._first is not None:
+                yield self._first
+                for row in self._result:
+                    yield row
+        finally:
+            self.close()
+
+    def close(self):
+        if self._db is not None:
+            self._result.close()
+            _close(self._db)
+            self._db = None
+
+
+def prepare_statement(sql: str) -> str:
+    """Validate a console query and strip its trailing semicolon"""
+    statement = sql.strip().rstrip(";").strip()
+
+    if not statement.upper().startswith(ALLOWED_PREFIXES):
+        raise HTTPException(status_code=400, detail="Only SELECT queries are allowed for safety")
+
+    # A second statement could COMMIT the read-only transaction and run outside it;
+    # semicolons inside string literals and comments do not split statements
+    if len(sqlparse.split(statement)) > 1:
+        raise HTTPException(
+            status_code=400,
+            detail="Only a single statement is allowed (queries run in a read-only transaction)"
+        )
+
+    return statement
+
+
+def _open_readonly_session(timeout_ms: int) -> Session:
+    db = SessionLocal()
+    if db.bind.dialect.name == "postgresql":
+        db.connection().exec_driver_sql("SET TRANSACTION READ ONLY")
+        db.connection().exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+    else:
+        db.connection().exec_driver_sql("PRAGMA query_only = ON")
+    return db
+
+
+def _close(db: Session):
+    try:
+        if db.bind.dialect.name != "postgresql":
+            # Reset on the connection that was made read-only, before rollback returns it to the pool
+            connection = db.connection()
+            try:
+                connection.exec_driver_sql("PRAGMA query_only = OFF")
+            except SQLAlchemyError:
+                connection.invalidate()
+                raise
+        db.rollback()
+    finally:
+        db.close()
+
+
+def query_error(e: Exception) -> HTTPException:
+    detail = str(e.orig) if isinstance(e, DBAPIError) else str(e)
+    return HTTPException(status_code=400, detail=f"Query error: {detail.strip()}")
+
+
+def open_query(sql: str, timeout_ms: int) -> Tuple[List[str], QueryRows]:
+    """
+    Start a console query and return its column names and rows.
+
+    The rows own the session, so they can outlive the request handler when
+    they are streamed. Errors raised before the first row become HTTP 400.
+    """
+    db = _open_readonly_session(timeout_ms)
+    try:
+        result: CursorResult = db.connection().exec_driver_sql(
+            sql,
+            execution_options={"no_parameters": True, "stream_results": True, "max_row_buffer": FETCH_BATCH_SIZE}
+        )
+        columns = list(result.keys()) if result.returns_rows else []
+        # The server-side cursor runs the query on its first fetch
+        first = result.fetchone() if result.returns_rows else None
+    except SQLAlchemyError as e:
+        _close(db)
+        raise query_error(e)
+
+    return columns, QueryRows(db, result, first)
+
+
+def explain_query(sql: str, analyze: bool, timeout_ms: int) -> Any:
+    """Planner output for a console query; ANALYZE executes it under the same limits"""
+    db = _open_readonly_session(timeout_ms)
+    try:
+        connection = db.connection().execution_options(no_parameters=True)
+        if db.bind.dialect.name == "postgresql":
+            options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+            plan = connection.exec_driver_sql(f"EXPLAIN ({options}) {sql}").scalar()
+            return json.loads(plan) if isinstance(plan, str) else plan
+
+        return [dict(row._mapping) for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+    except SQLAlchemyError as e:
+        raise query_error(e)
+    finally:
+        _close(db)
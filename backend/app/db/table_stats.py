@@ -0,0 +1,242 @@
+"""
+Table row counts and sizes for the database explorer
+
+Listings use the planner's statistics (pg_class.reltuples, kept current by
+autovacuum/ANALYZE) and catalog sizes, so they cost one catalog query no
+matter how large the tables are. Partitioned tables are reported once, with
+the estimates and sizes of their partitions summed. Counts of filtered
+selects are estimated from the planner's EXPLAIN output the same way.
+
+Exact counts are opt-in: they run as a background job whose state (status,
+backend pid, result) lives in Redis, so any worker can report or cancel it
+and finished counts are reused until they expire.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional
+from redis.exceptions import RedisError
+from sqlalchemy import func, select, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from app.db.database import SessionLocal
+from app.db.schema_cache import schema_cache
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# How long a finished exact count is served from cache (seconds)
+EXACT_COUNT_TTL = 3600
+
+COUNT_MODE_PATTERN = "^(none|estimate|exact)$"
+
+TABLE_ESTIMATES_SQL = text("""
+    SELECT
+        c.relname AS name,
+        (
+            SELECT count(*) FROM pg_attribute a
+            WHERE a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+        ) AS columns,
+        CASE WHEN c.relkind = 'p' THEN (
+            SELECT coalesce(sum(greatest(p.reltuples, 0)), 0)
+            FROM pg_inherits i JOIN pg_class p ON p.oid = i.inhrelid
+            WHERE i.inhparent = c.oid
+        ) ELSE greatest(c.reltuples, 0) END AS rows,
+        CASE WHEN c.relkind = 'p' THEN (
+            SELECT coalesce(sum(pg_total_relation_size(i.inhrelid)), 0)
+            FROM pg_inherits i
+            WHERE i.inhparent = c.oid
+        ) ELSE pg_total_relation_size(c.oid) END AS size_bytes,
+        c.relkind = 'p' AS partitioned
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = current_schema()
+      AND c.relkind IN ('r', 'p')
+      AND NOT c.relispartition
+    ORDER BY c.relname
+""")
+
+
+def exact_count_key(table_name: str) -> str:
+    """Redis key holding the state of a table's exact count job"""
+    return f"table_count:{table_name}"
+
+
+def exact_count_claim_key(table_name: str) -> str:
+    """Redis key held while a table's exact count job is pending or running"""
+    return f"table_count:{table_name}:claim"
+
+
+def _count_sql(table_name: str) -> str:
+    return f'SELECT COUNT(*) FROM "{table_name}"'
+
+
+def table_estimates(db: Session) -> List[dict]:
+    """Estimated row counts, column counts and sizes of the user tables"""
+    if db.bind.dialect.name == "postgresql":
+        return [
+            {
+                "name": row.name,
+                "columns": row.columns,
+                "rows": int(row.rows),
+                "size_bytes": row.size_bytes,
+                "partitioned": row.partitioned,
+            }
+            for row in db.execute(TABLE_ESTIMATES_SQL)
+        ]
+
+    # SQLite: statistics exist only after ANALYZE; small dev databases count quickly otherwise
+    stats = {}
+    if db.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")).first():
+        for table_name, stat in db.execute(text("SELECT tbl, stat FROM sqlite_stat1 WHERE idx IS NULL")):
+            stats[table_name] = int(stat.split()[0])
+
+    tables = []
+    for table_name in schema_cache.table_names(db.bind):
+        rows = stats.get(table_name)
+        if rows is None:
+            rows = db.execute(text(_count_sql(table_name))).scalar()
+        tables.append({
+            "name": table_name,
+            "columns": len(schema_cache.column_names(db.bind, table_name)),
+            "rows": rows,
+            "size_bytes": None,
+            "partitioned": False,
+        })
+    return tables
+
+
+class _ExplainJson(Executable, ClauseElement):
+    """EXPLAIN (FORMAT JSON) of a statement, keeping its bound parameters"""
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(_ExplainJson, "postgresql")
+def _compile_explain_json(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+def estimate_rows(db: Session, statement: Select) -> int:
+    """Row count the planner expects ``statement`` to return (PostgreSQL)"""
+    plan = db.execute(_ExplainJson(statement)).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def count_rows(db: Session, statement: Select, mode: str) -> Optional[int]:
+    """
+    Count the rows of a select according to ``mode``: none skips counting,
+    estimate asks the planner (exact on other databases), exact runs COUNT(*).
+    """
+    if mode == "none":
+        return None
+    if mode == "estimate" and db.bind.dialect.name == "postgresql":
+        return estimate_rows(db, statement)
+    return db.execute(select(func.count()).select_from(statement.subquery())).scalar()
+
+
+def get_exact_count(redis, table_name: str) -> Optional[dict]:
+    """State of the table's exact count job, or None if none ran recently"""
+    try:
+        state = redis.get(exact_count_key(table_name))
+    except RedisError as e:
+        logger.warning(f"Exact count state unavailable for {table_name}: {e}")
+        return None
+    return json.loads(state) if state else None
+
+
+def get_exact_counts(redis, table_names: List[str]) -> Dict[str, dict]:
+    """Exact count states of several tables in one round trip"""
+    if not table_names:
+        return {}
+    try:
+        states = redis.mget([exact_count_key(name) for name in table_names])
+    except RedisError as e:
+        logger.warning(f"Exact count states unavailable: {e}")
+        return {}
+    return {name: json.loads(state) for name, state in zip(table_names, states) if state}
+
+
+def _set_state(redis, table_name: str, state: dict):
+    redis.set(exact_count_key(table_name), json.dumps(state), ex=EXACT_COUNT_TTL)
+
+
+def claim_exact_count(redis, table_name: str) -> Optional[dict]:
+    """
+    Register a new exact count job for the table.
+
+    Returns the pending state to hand to ``run_exact_count``, or None when a
+    job for the table is already pending or running. The claim is a SET NX,
+    so concurrent requests cannot both start a COUNT(*); it expires with the
+    state if a worker dies mid-count.
+    """
+    if not redis.set(exact_count_claim_key(table_name), "1", nx=True, ex=EXACT_COUNT_TTL):
+        return None
+
+    state = {
+        "status": "pending",
+        "pid": None,
+        "count": None,
+        "error": None,
+        "started_at": datetime.utcnow().isoformat(),
+        "finished_at": None,
+    }
+    _set_state(redis, table_name, state)
+    return state
+
+
+def run_exact_count(redis, table_name: str, state: dict):
+    """Background job: COUNT(*) the table on a dedicated connection, recording progress in Redis"""
+    db = None
+    try:
+        db = SessionLocal()
+        if db.bind.dialect.name == "postgresql":
+            state["pid"] = db.execute(text("SELECT pg_backend_pid()")).scalar()
+        state["status"] = "running"
+        _set_state(redis, table_name, state)
+
+        state["count"] = db.execute(text(_count_sql(table_name))).scalar()
+        state["status"] = "done"
+    except DBAPIError as e:
+        db.rollback()
+        cancelled = "canceling statement due to user request" in str(e.orig)
+        state["status"] = "cancelled" if cancelled else "failed"
+        state["error"] = None if cancelled else str(e.orig)
+    except Exception as e:
+        # Pool timeouts, Redis errors...: the job must not stay pending/running until the claim expires
+        logger.error(f"❌ Exact count of {table_name} failed: {e}")
+        state["status"] = "failed"
+        state["error"] = str(e)
+    finally:
+        if db is not None:
+            db.close()
+
+    state["pid"] = None
+    state["finished_at"] = datetime.utcnow().isoformat()
+    try:
+        _set_state(redis, table_name, state)
+    finally:
+        redis.delete(exact_count_claim_key(table_name))
+
+
+def cancel_exact_count(db: Session, redis, table_name: str) -> bool:
+    """Cancel a running exact count; returns whether a running query was signalled"""
+    state = get_exact_count(redis, table_name)
+    if not state or state["status"] != "running" or not state["pid"]:
+        return False
+
+    # The pid in Redis may be stale (the count finished, the connection went back to the pool
+    # and serves other requests), so only signal the backend while it still runs this count
+    return bool(db.execute(
+        text("""
+            SELECT pg_cancel_backend(pid) FROM pg_stat_activity
+            WHERE pid = :pid AND state = 'active' AND query = :query
+        """),
+        {"pid": state["pid"], "query": _count_sql(table_name)}
+    ).scalar())
@@ -0,0 +1,25 @@
+# Background jobs
+from typing import Callable, List, Optional
+import argparse
+import time
+
+
+def run_periodically(run_once: Callable[[], None], description: str, argv: Optional[List[str]] = None):
+    """
+    Command line entry point of a job: run ``run_once`` once, or every
+    --interval seconds. A single run raises its errors; a periodic run
+    keeps going after a failed iteration (jobs log their own errors).
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--interval", type=int, default=0, help="Repeat every N seconds (0 = run once)")
+    args = parser.parse_args(argv)
+
+    while True:
+        try:
+            run_once()
+        except Exception:
+            if not args.interval:
+                raise
+        if not args.interval:
+            break
+        time.sleep(args.interval)
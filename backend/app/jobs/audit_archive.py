@@ -0,0 +1,223 @@
+"""
+Move audit_logs rows older than AUDIT_ARCHIVE_AFTER_DAYS into the cold archive.
+
+Each UTC day is written to its archive file and recorded in the manifest
+together with the advanced archive boundary before it leaves audit_logs;
+reads serve rows below the boundary from the archive only. Only rows whose
+ids are in their day file are ever removed: rows that reach a day after it
+was archived (late or backfilled inserts, the DEFAULT partition, an
+interrupted run) are merged into the day file first. On a partitioned
+audit_logs, months that are archived as a whole leave by detaching or
+dropping their partition (AUDIT_RETENTION_ACTION) instead of row by row
+DELETEs, which would bloat the partitions and keep vacuum busy; only days
+of a partial month are deleted. Run it daily from cron:
+
+    python -m app.jobs.audit_archive
+"""
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, Optional, Set
+from uuid import UUID
+from sqlalchemy import delete, desc, func, select, text
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.db.database import SessionLocal
+from app.db.partitions import add_months, is_partitioned, list_partitions, month_start, remove_partitions_before
+from app.models.audit_log import AuditLog
+from app.models.user_agent import UserAgent
+from app.core.audit_archive import (
+    AUDIT_LOG_COLUMNS,
+    archive_dir,
+    archived_before,
+    load_manifest,
+    merge_day_file,
+    read_day_file,
+    save_manifest,
+    write_day_file,
+)
+from app.jobs import run_periodically
+import fcntl
+import logging
+import os
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Rows fetched per server-side cursor round trip while writing a day file
+FETCH_BATCH_SIZE = 1000
+
+# Ids per DELETE statement when removing archived rows
+DELETE_BATCH_SIZE = 1000
+
+
+def _floor_day(at: datetime) -> datetime:
+    return at.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _day_rows(day: datetime):
+    """A day's rows in archive column order, newest first"""
+    return (
+        select(*AUDIT_LOG_COLUMNS)
+        .outerjoin(UserAgent, UserAgent.id == AuditLog.user_agent_id)
+        .where(AuditLog.timestamp >= day, AuditLog.timestamp < day + timedelta(days=1))
+        .order_by(desc(AuditLog.timestamp), desc(AuditLog.id))
+        .execution_options(yield_per=FETCH_BATCH_SIZE)
+    )
+
+
+def _collect_ids(rows: Iterable, ids: Set[UUID]) -> Iterator:
+    for row in rows:
+        ids.add(row.id)
+        yield row
+
+
+def _record_file(manifest: dict, entry: Optional[dict]):
+    if entry:
+        manifest["files"] = [f for f in manifest["files"] if f["path"] != entry["path"]] + [entry]
+
+
+def _days_with_rows(db: Session, start: Optional[datetime], end: datetime) -> Iterator[datetime]:
+    """UTC days before ``end`` (from ``start``) that still have rows in audit_logs, oldest first"""
+    while True:
+        conditions = [AuditLog.timestamp < end] + ([AuditLog.timestamp >= start] if start else [])
+        oldest = db.execute(select(func.min(AuditLog.timestamp)).where(*conditions)).scalar()
+        if oldest is None:
+            return
+        day = _floor_day(oldest)
+        yield day
+        start = day + timedelta(days=1)
+
+
+def _delete_ids(db: Session, day: datetime, ids: Set[UUID]) -> int:
+    ids = list(ids)
+    deleted = 0
+    for start in range(0, len(ids), DELETE_BATCH_SIZE):
+        deleted += db.execute(
+            delete(AuditLog).where(
+                AuditLog.timestamp >= day,
+                AuditLog.timestamp < day + timedelta(days=1),
+                AuditLog.id.in_(ids[start:start + DELETE_BATCH_SIZE])
+            )
+        ).rowcount
+    return deleted
+
+
+def archive_audit_logs(
+    db: Session,
+    after_days: int = settings.AUDIT_ARCHIVE_AFTER_DAYS,
+    directory: Optional[str] = None
+) -> Optional[datetime]:
+    """Archive whole days older than ``after_days``; returns the new archive boundary"""
+    directory = directory or archive_dir()
+    cutoff = _floor_day(datetime.utcnow() - timedelta(days=after_days))
+
+    manifest = dict(load_manifest(directory))
+    boundary = archived_before(directory)
+    partitioned = db.bind.dialect.name == "postgresql" and is_partitioned(db.connection())
+
+    # Skip straight to the next day that has rows; days below the boundary are already archived
+    for day in _days_with_rows(db, boundary, cutoff):
+        next_day = day + timedelta(days=1)
+        # Rows of a month archived as a whole leave with its partition
+        month_end = datetime.combine(add_months(month_start(day), 1), datetime.min.time())
+        whole_month = partitioned and month_end <= cutoff
+
+        written: Set[UUID] = set()
+        entry = write_day_file(day.date(), _collect_ids(db.execute(_day_rows(day)), written), directory)
+
+        _record_file(manifest, entry)
+        boundary = max(boundary, next_day) if boundary else next_day
+        manifest["archived_before"] = boundary.isoformat()
+        save_manifest(manifest, directory)
+
+        if whole_month:
+            db.commit()
+            logger.info(f"Archived {len(written)} audit rows for {day.date()}")
+            continue
+
+        deleted = _delete_ids(db, day, written)
+        db.commit()
+        logger.info(f"Archived {len(written)} audit rows for {day.date()} ({deleted} deleted)")
+
+    if boundary:
+        # Nothing older than the cutoff is left unarchived, so whole months up to it are complete
+        if boundary < cutoff:
+            boundary = cutoff
+            manifest["archived_before"] = boundary.isoformat()
+            save_manifest(manifest, directory)
+        _remove_archived(db, boundary, partitioned, manifest, directory)
+
+    return archived_before(directory)
+
+
+def _archive_missing(db: Session, day: datetime, manifest: dict, directory: str) -> Set[UUID]:
+    """
+    Merge the day's rows that are missing from its archive file into the
+    file; returns the ids of the day's rows, all of which are now archived.
+    """
+    stored = set(db.execute(
+        select(AuditLog.id).where(AuditLog.timestamp >= day, AuditLog.timestamp < day + timedelta(days=1))
+    ).scalars())
+    archived = {UUID(record["id"]) for record in read_day_file(day.date(), directory)}
+
+    missing = stored - archived
+    if missing:
+        rows = (row for row in db.execute(_day_rows(day)) if row.id not in archived)
+        _record_file(manifest, merge_day_file(day.date(), rows, directory))
+        save_manifest(manifest, directory)
+        logger.warning(f"⚠️ Archived {len(missing)} audit rows for {day.date()} that arrived after the day was archived")
+    return stored
+
+
+def _remove_archived(db: Session, boundary: datetime, partitioned: bool, manifest: dict, directory: str):
+    """Remove the rows below the boundary: whole archived months by partition, the rest by id"""
+    if partitioned:
+        for name, month in list_partitions(db.connection()):
+            month_end = add_months(month, 1)
+            if month_end > boundary.date():
+                break
+
+            # Hold off inserts into the month until its partition is gone
+            db.connection().execute(text(f'LOCK TABLE "{name}" IN SHARE MODE'))
+            start = datetime.combine(month, datetime.min.time())
+            for day in _days_with_rows(db, start, datetime.combine(month_end, datetime.min.time())):
+                _archive_missing(db, day, manifest, directory)
+            for removed in remove_partitions_before(db.connection(), month_end, suffix="archived"):
+                logger.info(f"✅ Removed archived partition {removed}")
+            db.commit()
+
+    # Rows of partial months, interrupted runs and the DEFAULT partition
+    leftover = 0
+    for day in _days_with_rows(db, None, boundary):
+        leftover += _delete_ids(db, day, _archive_missing(db, day, manifest, directory))
+        db.commit()
+    if leftover:
+        logger.info(f"✅ Removed {leftover} audit rows below the archive boundary")
+
+
+def run_once():
+    directory = archive_dir()
+    os.makedirs(directory, exist_ok=True)
+
+    # One archiver per archive directory
+    with open(os.path.join(directory, ".lock"), "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            logger.warning("⚠️ Audit archiver already running, skipping")
+            return
+
+        db = SessionLocal()
+        try:
+            boundary = archive_audit_logs(db, directory=directory)
+            if boundary:
+                logger.info(f"✅ Audit archive covers rows before {boundary.isoformat()}")
+        except Exception as e:
+            logger.error(f"❌ Audit archive failed: {e}")
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+if __name__ == "__main__":
+    run_periodically(run_once, "Move old audit logs into the cold archive")
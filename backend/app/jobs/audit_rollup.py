@@ -0,0 +1,104 @@
+"""
+Roll new audit_logs rows up into hourly audit_rollups counts.
+
+Only rows between the stored watermark and now minus a small lag are read,
+one chunk at a time; each chunk is aggregated and merged into the rollups
+with a single INSERT ... SELECT ... ON CONFLICT statement and commits
+together with the advanced watermark. Run it from cron, or loop it:
+
+    python -m app.jobs.audit_rollup --interval 60
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from app.db.database import SessionLocal
+from app.models.audit_log import AuditLog
+from app.models.audit_rollup import AuditRollup, RollupWatermark, NO_ORGANIZATION
+from app.core.audit_rollups import AUDIT_ROLLUP_WATERMARK, floor_hour
+from app.jobs import run_periodically
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Rows younger than this may still belong to uncommitted transactions
+ROLLUP_LAG = timedelta(minutes=2)
+
+# Source window aggregated per statement/commit
+ROLLUP_CHUNK = timedelta(days=1)
+
+
+def rollup_audit_logs(db: Session) -> datetime:
+    """Advance the audit rollups to now minus ROLLUP_LAG; returns the new watermark"""
+    cutoff = datetime.utcnow() - ROLLUP_LAG
+
+    # Row lock keeps concurrent runs from double counting
+    watermark = db.query(RollupWatermark).filter(
+        RollupWatermark.name == AUDIT_ROLLUP_WATERMARK
+    ).with_for_update().first()
+
+    if watermark is None:
+        oldest = db.execute(select(func.min(AuditLog.timestamp))).scalar()
+        watermark = RollupWatermark(
+            name=AUDIT_ROLLUP_WATERMARK,
+            processed_until=floor_hour(oldest) if oldest else cutoff
+        )
+        db.add(watermark)
+        db.flush()
+
+    bucket = func.date_trunc("hour", AuditLog.timestamp)
+    organization = func.coalesce(AuditLog.organization_id, NO_ORGANIZATION)
+    status = func.coalesce(AuditLog.status, "")
+
+    while watermark.processed_until < cutoff:
+        start = watermark.processed_until
+        end = min(start + ROLLUP_CHUNK, cutoff)
+
+        aggregated = select(bucket, AuditLog.action, organization, status, func.count()).where(
+            AuditLog.timestamp >= start,
+            AuditLog.timestamp < end
+        ).group_by(bucket, AuditLog.action, organization, status)
+
+        stmt = insert(AuditRollup).from_select(
+            ["bucket_start", "action", "organization_id", "status", "count"],
+            aggregated
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[
+                AuditRollup.bucket_start,
+                AuditRollup.action,
+                AuditRollup.organization_id,
+                AuditRollup.status
+            ],
+            set_={"count": AuditRollup.count + stmt.excluded.count}
+        )
+        db.execute(stmt)
+
+        watermark.processed_until = end
+        db.commit()
+        logger.info(f"Rolled up audit logs through {end.isoformat()}")
+
+        # Re-acquire the lock for the next chunk
+        watermark = db.query(RollupWatermark).filter(
+            RollupWatermark.name == AUDIT_ROLLUP_WATERMARK
+        ).with_for_update().first()
+
+    db.commit()
+    return watermark.processed_until
+
+
+def run_once():
+    db = SessionLocal()
+    try:
+        rollup_audit_logs(db)
+    except Exception as e:
+        logger.error(f"❌ Audit rollup failed: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    run_periodically(run_once, "Maintain hourly audit rollups")
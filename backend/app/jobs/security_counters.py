@@ -0,0 +1,61 @@
+"""
+Flush hourly security counters from Redis into the security_counters table.
+
+Redis holds running totals per hour bucket, so each flush upserts absolute
+values and is safe to repeat. Run it from cron, or with --interval to keep
+it looping:
+
+    python -m app.jobs.security_counters --interval 300
+"""
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from app.db.database import SessionLocal, get_redis
+from app.models.security_counter import SecurityCounter
+from app.core.counters import HOUR_KEY_PREFIX, parse_hour_key
+from app.jobs import run_periodically
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Rows per INSERT ... ON CONFLICT statement
+FLUSH_BATCH_SIZE = 1000
+
+
+def flush_security_counters(db: Session, redis) -> int:
+    """Upsert every hourly counter still present in Redis; returns rows written"""
+    rows = []
+    for key in redis.scan_iter(match=f"{HOUR_KEY_PREFIX}*", count=500):
+        bucket_start = parse_hour_key(key)
+        for metric, value in redis.hgetall(key).items():
+            rows.append({"bucket_start": bucket_start, "metric": metric, "count": int(value)})
+
+    if not rows:
+        return 0
+
+    for start in range(0, len(rows), FLUSH_BATCH_SIZE):
+        stmt = insert(SecurityCounter).values(rows[start:start + FLUSH_BATCH_SIZE])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[SecurityCounter.bucket_start, SecurityCounter.metric],
+            set_={"count": stmt.excluded.count}
+        )
+        db.execute(stmt)
+    db.commit()
+    return len(rows)
+
+
+def run_once():
+    db = SessionLocal()
+    try:
+        written = flush_security_counters(db, get_redis())
+        logger.info(f"Flushed {written} security counter rows")
+    except Exception as e:
+        logger.error(f"❌ Security counter flush failed: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    run_periodically(run_once, "Flush Redis security counters to Postgres")
@@ -1,4 +1,8 @@
 from .user import User
 from .organization import Organization
+from .audit_log import AuditLog
+from .audit_rollup import AuditRollup, RollupWatermark
+from .security_counter import SecurityCounter
+from .user_agent import UserAgent
 
-__all__ = ["User", "Organization"]
+__all__ = ["User", "Organization", "AuditLog", "AuditRollup", "RollupWatermark", "SecurityCounter", "UserAgent"]
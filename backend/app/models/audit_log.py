@@ -1,5 +1,5 @@
-from sqlalchemy import Column, String, DateTime, Text, JSON, Enum
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, Integer, DateTime, Text, JSON, Enum, Index, ForeignKey, func
+from sqlalchemy.dialects.postgresql import INET, UUID
 from datetime import datetime
 import uuid
 import enum
@@ -24,19 +24,70 @@ class AuditAction(enum.Enum):
     API_KEY_REVOKED = "api_key_revoked"
 
 
+class AuditReason(enum.Enum):
+    INVALID_CREDENTIALS = "invalid_credentials"
+    USER_INACTIVE = "user_inactive"
+    ORGANIZATION_INACTIVE = "organization_inactive"
+    LICENSE_EXPIRED = "license_expired"
+    IP_NOT_WHITELISTED = "ip_not_whitelisted"
+
+
 class AuditLog(Base):
     __tablename__ = "audit_logs"
+    # Monthly range partitions are managed by app.db.partitions
+    __table_args__ = {"postgresql_partition_by": "RANGE (timestamp)"}
 
+    # The partition key must be part of the primary key
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    timestamp = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
-    action = Column(Enum(AuditAction), nullable=False, index=True)
-    user_id = Column(UUID(as_uuid=True), nullable=True, index=True)
+    timestamp = Column(DateTime, default=datetime.utcnow, nullable=False, primary_key=True)
+    action = Column(Enum(AuditAction), nullable=False)
+    user_id = Column(UUID(as_uuid=True), nullable=True)
     user_email = Column(String, nullable=True)
-    organization_id = Column(UUID(as_uuid=True), nullable=True, index=True)
+    organization_id = Column(UUID(as_uuid=True), nullable=True)
     target_id = Column(UUID(as_uuid=True), nullable=True)  # ID of affected resource
     target_type = Column(String, nullable=True)  # user, organization, license, etc.
-    ip_address = Column(String, nullable=True)
-    user_agent = Column(String, nullable=True)
+    ip_address = Column(String(45).with_variant(INET(), "postgresql"), nullable=True)  # Normalized, see normalize_ip
+    user_agent_id = Column(Integer, ForeignKey("user_agents.id"), nullable=True)  # Interned User-Agent
     details = Column(JSON, nullable=True)  # Additional context
     status = Column(String, nullable=True)  # success, failed, etc.
+    reason = Column(Enum(AuditReason), nullable=True)  # Why a failed action failed
     error_message = Column(Text, nullable=True)
+
+
+# Keyset pagination walks (timestamp, id) newest first, optionally behind an equality filter
+Index("ix_audit_logs_timestamp_id", AuditLog.timestamp.desc(), AuditLog.id.desc())
+Index("ix_audit_logs_organization_id_timestamp", AuditLog.organization_id, AuditLog.timestamp.desc(), AuditLog.id.desc())
+Index("ix_audit_logs_action_timestamp", AuditLog.action, AuditLog.timestamp.desc(), AuditLog.id.desc())
+Index("ix_audit_logs_user_id_timestamp", AuditLog.user_id, AuditLog.timestamp.desc(), AuditLog.id.desc())
+Index(
+    "ix_audit_logs_reason_timestamp",
+    AuditLog.reason,
+    AuditLog.timestamp.desc(),
+    postgresql_where=AuditLog.reason.isnot(None)
+)
+
+# Search: case-insensitive email prefixes, CIDR containment and substring (trigram) matches
+Index(
+    "ix_audit_logs_user_email_prefix",
+    func.lower(AuditLog.user_email).label("user_email_lower"),
+    postgresql_ops={"user_email_lower": "text_pattern_ops"}
+)
+Index(
+    "ix_audit_logs_user_email_trgm",
+    AuditLog.user_email,
+    postgresql_using="gin",
+    postgresql_ops={"user_email": "gin_trgm_ops"}
+)
+Index(
+    "ix_audit_logs_error_message_trgm",
+    AuditLog.error_message,
+    postgresql_using="gin",
+    postgresql_ops={"error_message": "gin_trgm_ops"}
+)
+Index(
+    "ix_audit_logs_ip_address",
+    AuditLog.ip_address,
+    postgresql_using="gist",
+    postgresql_ops={"ip_address": "inet_ops"}
+)
+Index("ix_audit_logs_user_agent_id_timestamp", AuditLog.user_agent_id, AuditLog.timestamp.desc())
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, String, Integer, DateTime, Enum
+from sqlalchemy.dialects.postgresql import UUID
+import uuid
+from app.db.database import Base
+from app.models.audit_log import AuditAction
+
+# Stored in place of NULL organization_id so the rollup key can be a primary key
+NO_ORGANIZATION = uuid.UUID(int=0)
+
+
+class AuditRollup(Base):
+    """Hourly audit_logs counts per (action, organization, status)"""
+    __tablename__ = "audit_rollups"
+
+    bucket_start = Column(DateTime, primary_key=True)  # Start of the hour (UTC)
+    action = Column(Enum(AuditAction), primary_key=True)
+    organization_id = Column(UUID(as_uuid=True), primary_key=True, default=NO_ORGANIZATION)
+    status = Column(String(32), primary_key=True, default="")  # '' when the log had no status
+    count = Column(Integer, nullable=False, default=0)
+
+
+class RollupWatermark(Base):
+    """How far a rollup job has processed its source table"""
+    __tablename__ = "rollup_watermarks"
+
+    name = Column(String(64), primary_key=True)
+    processed_until = Column(DateTime, nullable=False)  # Source rows before this are rolled up
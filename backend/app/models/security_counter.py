@@ -0,0 +1,11 @@
+from sqlalchemy import Column, String, Integer, DateTime
+from app.db.database import Base
+
+
+class SecurityCounter(Base):
+    """Durable hourly rollup of the Redis security counters"""
+    __tablename__ = "security_counters"
+
+    bucket_start = Column(DateTime, primary_key=True)  # Start of the hour (UTC)
+    metric = Column(String(128), primary_key=True)  # e.g. login_failed:reason:ip_not_whitelisted
+    count = Column(Integer, nullable=False, default=0)
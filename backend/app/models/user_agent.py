@@ -0,0 +1,20 @@
+from sqlalchemy import Column, String, Integer, Text, Index
+from app.db.database import Base
+
+
+class UserAgent(Base):
+    """Interned User-Agent strings referenced by audit_logs.user_agent_id"""
+    __tablename__ = "user_agents"
+
+    id = Column(Integer, primary_key=True)
+    value_hash = Column(String(32), nullable=False, unique=True)  # md5 of value, keeps the unique index small
+    value = Column(Text, nullable=False)
+
+
+# Substring search over user agents (pg_trgm)
+Index(
+    "ix_user_agents_value_trgm",
+    UserAgent.value,
+    postgresql_using="gin",
+    postgresql_ops={"value": "gin_trgm_ops"}
+)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 from datetime import datetime
 
 
@@ -38,4 +38,4 @@ class ValidateTokenResponse(BaseModel):
     valid: bool
     license_status: str
     expires_at: Optional[datetime]
-    permissions: List[str]
+    permissions: Dict[str, Any]
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 from datetime import datetime
 from uuid import UUID
@@ -27,6 +27,31 @@ class OrganizationUpdate(BaseModel):
     is_active: Optional[bool] = None
 
 
+class BulkLicenseUpdate(BaseModel):
+    # Filters selecting the organizations to update
+    organization_ids: Optional[List[UUID]] = None
+    license_type: Optional[str] = None
+    expires_before: Optional[datetime] = None
+    is_active: Optional[bool] = None
+
+    # Changes applied to every matching organization
+    extend_days: Optional[int] = Field(None, ge=1, le=3650)
+    set_expires_at: Optional[datetime] = None
+    new_license_type: Optional[str] = None
+
+
+class BulkLicenseItem(BaseModel):
+    id: UUID
+    name: str
+    license_type: str
+    license_expires_at: datetime
+
+
+class BulkLicenseResult(BaseModel):
+    updated_count: int
+    organizations: List[BulkLicenseItem]
+
+
 class OrganizationResponse(OrganizationBase):
     id: UUID
     is_active: bool
@@ -0,0 +1,11 @@
+"""
+Performance tooling
+
+Runs against the app in-process with local stand-ins (see environment.py),
+from the backend directory:
+
+    python -m perf.soak     memory growth over long runs
+    python -m perf.load     throughput and latency percentiles, compared to a baseline
+    python -m perf.micro    per-call cost of the app.core primitives
+    python -m perf.seed     large deterministic data sets for benchmarking
+"""
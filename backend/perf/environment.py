@@ -0,0 +1,351 @@
+"""
+Local stand-ins for running the app in-process
+
+``configure()`` points the settings at a local database (a SQLite file by
+default, or any PostgreSQL URL) and must run before anything imports
+``app``. ``load()`` then imports the app, installs the SQLite type shims for
+the PostgreSQL-only column types and swaps Redis for an in-process fake
+unless a real Redis URL was given.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import fnmatch
+import os
+import threading
+import time
+import uuid
+
+DEFAULT_DATABASE_URL = "sqlite:///perf.db"
+
+# Expired keys are purged every this many writes, so long runs keep a bounded keyspace
+PURGE_EVERY = 10000
+
+
+def _seconds(value) -> float:
+    return value.total_seconds() if isinstance(value, timedelta) else float(value)
+
+
+class FakeRedis:
+    """Thread-safe in-memory subset of the redis-py client (decode_responses=True) used by the app"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._data: Dict[str, object] = {}
+        self._expires: Dict[str, float] = {}
+        self._writes = 0
+
+    def _live(self, key: str):
+        expires = self._expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self._data.pop(key, None)
+            del self._expires[key]
+        return self._data.get(key)
+
+    def _write(self, key: str, value, ttl: Optional[float] = None):
+        self._data[key] = value
+        if ttl is None:
+            self._expires.pop(key, None)
+        else:
+            self._expires[key] = time.monotonic() + ttl
+        self._writes += 1
+        if self._writes % PURGE_EVERY == 0:
+            for expired in [k for k, at in self._expires.items() if at <= time.monotonic()]:
+                self._live(expired)
+
+    def get(self, name: str) -> Optional[str]:
+        with self._lock:
+            value = self._live(name)
+            return value if isinstance(value, str) else None
+
+    def mget(self, keys: List[str]) -> List[Optional[str]]:
+        return [self.get(key) for key in keys]
+
+    def set(self, name: str, value, ex=None, px=None, nx: bool = False) -> Optional[bool]:
+        with self._lock:
+            if nx and self._live(name) is not None:
+                return None
+            ttl = _seconds(ex) if ex is not None else (px / 1000 if px is not None else None)
+            self._write(name, str(value), ttl)
+            return True
+
+    def setex(self, name: str, time_, value) -> bool:
+        return self.set(name, value, ex=time_)
+
+    def incr(self, name: str, amount: int = 1) -> int:
+        with self._lock:
+            value = int(self._live(name) or 0) + amount
+            ttl = self._expires.get(name)
+            self._write(name, str(value), ttl - time.monotonic() if ttl else None)
+            return value
+
+    def delete(self, *names: str) -> int:
+        with self._lock:
+            deleted = 0
+            for name in names:
+                if self._live(name) is not None:
+                    del self._data[name]
+                    self._expires.pop(name, None)
+                    deleted += 1
+            return deleted
+
+    def exists(self, *names: str) -> int:
+        with self._lock:
+            return sum(1 for name in names if self._live(name) is not None)
+
+    def expire(self, name: str, time_) -> bool:
+        with self._lock:
+            if self._live(name) is None:
+                return False
+            self._expires[name] = time.monotonic() + _seconds(time_)
+            return True
+
+    def hincrby(self, name: str, key: str, amount: int = 1) -> int:
+        with self._lock:
+            fields = self._live(name)
+            if not isinstance(fields, dict):
+                fields = {}
+                ttl = None
+            else:
+                ttl = self._expires.get(name)
+                ttl = ttl - time.monotonic() if ttl else None
+            fields[key] = str(int(fields.get(key, 0)) + amount)
+            self._write(name, fields, ttl)
+            return int(fields[key])
+
+    def hgetall(self, name: str) -> Dict[str, str]:
+        with self._lock:
+            fields = self._live(name)
+            return dict(fields) if isinstance(fields, dict) else {}
+
+    def hget(self, name: str, key: str) -> Optional[str]:
+        return self.hgetall(name).get(key)
+
+    def hmget(self, name: str, keys: List[str]) -> List[Optional[str]]:
+        fields = self.hgetall(name)
+        return [fields.get(key) for key in keys]
+
+    def scan_iter(self, match: Optional[str] = None, count: Optional[int] = None):
+        with self._lock:
+            keys = [key for key in list(self._data) if self._live(key) is not None]
+        return iter([key for key in keys if match is None or fnmatch.fnmatchcase(key, match)])
+
+    def dbsize(self) -> int:
+        with self._lock:
+            return sum(1 for key in list(self._data) if self._live(key) is not None)
+
+    def flushall(self):
+        with self._lock:
+            self._data.clear()
+            self._expires.clear()
+
+    def ping(self) -> bool:
+        return True
+
+    def pipeline(self, transaction: bool = True) -> "FakePipeline":
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    """Buffers commands and runs them under the client's lock on execute()"""
+
+    def __init__(self, client: FakeRedis):
+        self._client = client
+        self._commands = []
+
+    def __getattr__(self, name: str):
+        method = getattr(self._client, name)
+
+        def queue(*args, **kwargs):
+            self._commands.append((method, args, kwargs))
+            return self
+        return queue
+
+    def execute(self) -> list:
+        with self._client._lock:
+            results = [method(*args, **kwargs) for method, args, kwargs in self._commands]
+        self._commands = []
+        return results
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._commands = []
+
+
+def configure(database_url: Optional[str] = None, debug: bool = False, bcrypt_rounds: Optional[int] = None):
+    """Select the database, debug mode and bcrypt cost; call before importing anything from ``app``"""
+    os.environ["DATABASE_URL"] = database_url or os.environ.get("PERF_DATABASE_URL", DEFAULT_DATABASE_URL)
+    os.environ["DEBUG"] = "true" if debug else "false"
+    if bcrypt_rounds:
+        os.environ["BCRYPT_ROUNDS"] = str(bcrypt_rounds)
+
+
+_shims_installed = False
+
+
+def _install_sqlite_shims():
+    """Map the PostgreSQL UUID/INET columns onto SQLite types and accept string ids like psycopg2 does"""
+    global _shims_installed
+    if _shims_installed:
+        return
+    _shims_installed = True
+
+    from sqlalchemy.dialects.postgresql import INET, UUID
+    from sqlalchemy.ext.compiler import compiles
+    from sqlalchemy.sql import sqltypes
+
+    compiles(UUID, "sqlite")(lambda element, compiler, **kw: "CHAR(32)")
+    compiles(INET, "sqlite")(lambda element, compiler, **kw: "VARCHAR(45)")
+
+    bind_processor = sqltypes.Uuid.bind_processor
+
+    def string_tolerant_bind_processor(self, dialect):
+        process = bind_processor(self, dialect)
+        if process is None or dialect.name != "sqlite":
+            return process
+
+        def convert(value):
+            return process(uuid.UUID(value) if isinstance(value, str) else value)
+        return convert
+
+    sqltypes.Uuid.bind_processor = string_tolerant_bind_processor
+
+
+class Environment:
+    """The imported app wired to the configured database and Redis"""
+
+    def __init__(self, redis_url: Optional[str] = None):
+        from app.config import settings
+
+        if settings.DATABASE_URL.startswith("sqlite"):
+            _install_sqlite_shims()
+
+        import app.db.database as database
+        import app.models  # noqa: F401  (registers every table on Base.metadata)
+        from app.main import app as application
+
+        if redis_url:
+            import redis
+            self.redis = redis.from_url(redis_url, decode_responses=True)
+        else:
+            self.redis = FakeRedis()
+        # Dependency for endpoints, module global for code calling get_redis() directly
+        database.redis_client = self.redis
+        application.dependency_overrides[database.get_redis] = lambda: self.redis
+
+        self.app = application
+        self.engine = database.engine
+        self.Base = database.Base
+        self.SessionLocal = database.SessionLocal
+
+    @property
+    def dialect(self) -> str:
+        return self.engine.dialect.name
+
+    def create_schema(self, drop: bool = False):
+        """Create the tables the way init_db does, optionally dropping them first"""
+        from sqlalchemy import text
+        from app.db.partitions import ensure_partitions, is_partitioned
+
+        if self.dialect == "postgresql":
+            with self.engine.begin() as conn:
+                conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        if drop:
+            self.Base.metadata.drop_all(self.engine)
+        self.Base.metadata.create_all(self.engine)
+        if self.dialect == "postgresql":
+            with self.engine.begin() as conn:
+                if is_partitioned(conn):
+                    ensure_partitions(conn)
+
+
+def load(redis_url: Optional[str] = None) -> Environment:
+    return Environment(redis_url)
+
+
+class Fixture:
+    """Credentials and ids of the accounts created by ``seed_fixture``"""
+
+    def __init__(self, password: str, admin: dict, users: List[dict], organization_ids: List[str]):
+        self.password = password
+        self.admin = admin
+        self.users = users
+        self.organization_ids = organization_ids
+
+
+def seed_fixture(
+    env: Environment,
+    organizations: int = 10,
+    users_per_organization: int = 20,
+    password: str = "perf-password"
+) -> Fixture:
+    """
+    Replace the database contents with a small, login-ready data set.
+
+    Every account shares one password hash, computed once at the app's
+    configured cost (see ``configure()``), so logins never rehash it. Every
+    fourth organization restricts logins to 127.0.0.0/8 so the allow-list
+    path is exercised too.
+    """
+    from app.core.security import pwd_context
+    from app.models.organization import LicenseType, Organization
+    from app.models.user import User, UserRole
+
+    env.create_schema(drop=True)
+    password_hash = pwd_context.hash(password)
+    expires = datetime.utcnow() + timedelta(days=365)
+
+    db = env.SessionLocal()
+    try:
+        orgs = [
+            Organization(
+                name=f"Perf Org {index:04d}",
+                license_type=LicenseType.STANDARD,
+                license_expires_at=expires,
+                max_users=users_per_organization + 1,
+                features_enabled=["validator", "migrator"],
+                allowed_ips=["127.0.0.0/8"] if index % 4 == 3 else []
+            )
+            for index in range(organizations)
+        ]
+        db.add_all(orgs)
+        db.flush()
+
+        admin = User(
+            email="perf-admin@example.com",
+            password_hash=password_hash,
+            full_name="Perf Admin",
+            role=UserRole.ADMIN,
+            organization_id=orgs[0].id
+        )
+        db.add(admin)
+        db.flush()
+
+        roles = [UserRole.DEVELOPER, UserRole.DEVELOPER, UserRole.TESTER, UserRole.OPS]
+        users = [
+            User(
+                email=f"perf-user-{org_index:04d}-{index:04d}@example.com",
+                password_hash=password_hash,
+                full_name=f"Perf User {org_index}-{index}",
+                role=roles[index % len(roles)],
+                organization_id=org.id,
+                created_by=admin.id
+            )
+            for org_index, org in enumerate(orgs)
+            for index in range(users_per_organization)
+        ]
+        db.add_all(users)
+        db.commit()
+
+        return Fixture(
+            password=password,
+            admin={"id": str(admin.id), "email": admin.email, "organization_id": str(admin.organization_id)},
+            users=[
+                {"id": str(user.id), "email": user.email, "organization_id": str(user.organization_id)}
+                for user in users
+            ],
+            organization_ids=[str(org.id) for org in orgs]
+        )
+    finally:
+        db.close()
@@ -0,0 +1,278 @@
+"""
+End-to-end load benchmark for the auth and license hot paths
+
+Boots ``app.main:app`` under uvicorn in a background thread (or, with
+``--transport asgi``, calls it in-process without the HTTP stack) against
+the local stand-ins and seeded data of perf/environment.py. Concurrent
+clients then drive the request mix for --duration seconds. Requests during
+the warm-up are not measured.
+
+The report (JSON) has throughput, error counts and rates, and latency
+percentiles per operation and overall. Throughput and latencies count
+successful (2xx) responses only, so fast failures cannot make a run look
+better. ``--save-baseline`` stores it; ``--baseline`` compares the run
+against a stored report and exits 1 when throughput drops, a p50/p99
+latency grows or the error rate grows by more than --tolerance. Baselines
+are machine specific, so keep them next to the host that produced them.
+
+    python -m perf.load --duration 60 --concurrency 32 --save-baseline baseline.json
+    python -m perf.load --duration 60 --concurrency 32 --baseline baseline.json
+"""
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import sys
+import threading
+import time
+import httpx
+from perf import environment
+from perf.workload import DEFAULT_MIX, Workload, build_workloads, parse_mix
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PERCENTILES = (50, 90, 95, 99)
+
+# Settings that must match for a baseline comparison to mean anything
+COMPARABLE_KEYS = ("transport", "database", "concurrency", "mix", "bcrypt_rounds")
+
+# Error rates up to this are noise (a stray timeout) rather than a regression
+ERROR_RATE_FLOOR = 0.001
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(p / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies: List[float], errors: int, seconds: float) -> dict:
+    """Stats of one operation from the latencies of its successful requests and its error count"""
+    values = sorted(latencies)
+    requests = len(values) + errors
+    summary = {
+        "requests": requests,
+        "errors": errors,
+        "error_rate": round(errors / requests, 4) if requests else 0.0,
+        "throughput_rps": round(len(values) / seconds, 2) if seconds else 0.0,
+        "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        "max_ms": round(values[-1] * 1000, 3) if values else 0.0,
+    }
+    for p in PERCENTILES:
+        summary[f"p{p}_ms"] = round(percentile(values, p) * 1000, 3)
+    return summary
+
+
+class UvicornThread:
+    """uvicorn serving the app on a free local port from a daemon thread"""
+
+    def __init__(self, app):
+        import uvicorn
+
+        config = uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning", access_log=False)
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, name="uvicorn", daemon=True)
+
+    def start(self, timeout: float = 30) -> str:
+        self.thread.start()
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if not self.thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError("uvicorn did not start")
+            time.sleep(0.05)
+        port = self.server.servers[0].sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}"
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+
+class LoadRun:
+    def __init__(self, args, fixture: environment.Fixture):
+        self.args = args
+        self.fixture = fixture
+        self.measuring = False
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.statuses: Dict[int, int] = {}
+
+    async def client_loop(self, workload: Workload, deadline: float):
+        while time.monotonic() < deadline:
+            name = workload.choose()
+            start = time.perf_counter()
+            try:
+                status = await workload.run(name)
+            except httpx.HTTPError:
+                status = 0
+            elapsed = time.perf_counter() - start
+            if not self.measuring:
+                continue
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            latencies = self.latencies.setdefault(name, [])
+            if 200 <= status < 300:
+                latencies.append(elapsed)
+            else:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+    async def run(self, client: httpx.AsyncClient) -> float:
+        """Drive the mix; returns the measured seconds"""
+        mix = parse_mix(self.args.mix)
+        workloads = build_workloads(client, self.fixture, mix, self.args.concurrency, self.args.seed)
+        for workload in workloads:
+            await workload.setup(sessions=5)
+
+        started = time.monotonic()
+        deadline = started + self.args.warmup + self.args.duration
+        clients = asyncio.gather(*(self.client_loop(workload, deadline) for workload in workloads))
+
+        await asyncio.sleep(self.args.warmup)
+        self.measuring = True
+        measured_from = time.monotonic()
+        await clients
+        return time.monotonic() - measured_from
+
+    def report(self, seconds: float, dialect: str) -> dict:
+        operations = {
+            name: summarize(self.latencies[name], self.errors.get(name, 0), seconds)
+            for name in sorted(self.latencies)
+        }
+        everything = [latency for values in self.latencies.values() for latency in values]
+        return {
+            "settings": {
+                "transport": self.args.transport,
+                "database": dialect,
+                "concurrency": self.args.concurrency,
+                "mix": self.args.mix,
+                "bcrypt_rounds": self.args.bcrypt_rounds,
+                "duration_s": self.args.duration,
+                "warmup_s": self.args.warmup,
+                "organizations": self.args.organizations,
+                "users_per_organization": self.args.users_per_organization,
+                "seed": self.args.seed,
+            },
+            "host": {
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "system": platform.system(),
+            },
+            "overall": summarize(everything, sum(self.errors.values()), seconds),
+            "operations": operations,
+            "statuses": {str(status): count for status, count in sorted(self.statuses.items())},
+        }
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Regressions of ``report`` against ``baseline`` beyond the relative tolerance"""
+    regressions = []
+    for key in COMPARABLE_KEYS:
+        if report["settings"].get(key) != baseline["settings"].get(key):
+            logger.warning(
+                f"⚠️ Baseline was recorded with {key}={baseline['settings'].get(key)!r}, "
+                f"this run used {report['settings'].get(key)!r}"
+            )
+
+    sections = [("overall", report["overall"], baseline["overall"])] + [
+        (name, stats, baseline["operations"][name])
+        for name, stats in report["operations"].items()
+        if name in baseline["operations"]
+    ]
+    for name, current, previous in sections:
+        if previous["throughput_rps"] and current["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {current['throughput_rps']} rps vs baseline {previous['throughput_rps']} rps"
+            )
+        for metric in ("p50_ms", "p99_ms"):
+            if previous[metric] and current[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {current[metric]} vs baseline {previous[metric]}")
+        previous_rate = previous.get("error_rate", 0.0)
+        if current["error_rate"] > max(previous_rate * (1 + tolerance), ERROR_RATE_FLOOR):
+            regressions.append(f"{name}: error rate {current['error_rate']} vs baseline {previous_rate}")
+    return regressions
+
+
+async def drive(args, env: environment.Environment, fixture: environment.Fixture) -> dict:
+    run = LoadRun(args, fixture)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    if args.transport == "asgi":
+        transport = httpx.ASGITransport(app=env.app, raise_app_exceptions=False, client=("127.0.0.1", 50000))
+        async with httpx.AsyncClient(transport=transport, base_url="http://load") as client:
+            seconds = await run.run(client)
+    else:
+        server = UvicornThread(env.app)
+        base_url = server.start()
+        try:
+            async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+                seconds = await run.run(client)
+        finally:
+            server.stop()
+
+    return run.report(seconds, env.dialect)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the auth and license endpoints under concurrent load")
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds (default 30)")
+    parser.add_argument("--warmup", type=float, default=5, help="Unmeasured seconds before measuring")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Operation weights (default {DEFAULT_MIX})")
+    parser.add_argument("--transport", choices=["uvicorn", "asgi"], default="uvicorn",
+                        help="Real HTTP through uvicorn, or in-process ASGI calls")
+    parser.add_argument("--timeout", type=float, default=30, help="Per-request timeout in seconds")
+    parser.add_argument("--database-url", help="Database to run against (default: SQLite file perf.db)")
+    parser.add_argument("--redis-url", help="Real Redis to use instead of the in-process fake")
+    parser.add_argument("--organizations", type=int, default=10)
+    parser.add_argument("--users-per-organization", type=int, default=20)
+    parser.add_argument("--bcrypt-rounds", type=int, help="bcrypt cost for the run (default: BCRYPT_ROUNDS)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    parser.add_argument("--save-baseline", metavar="PATH", help="Store this run's report as the baseline")
+    parser.add_argument("--baseline", metavar="PATH", help="Compare against a stored baseline report")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="Allowed relative regression against the baseline (default 0.15)")
+    args = parser.parse_args(argv)
+
+    environment.configure(args.database_url, bcrypt_rounds=args.bcrypt_rounds)
+    env = environment.load(args.redis_url)
+    fixture = environment.seed_fixture(env, args.organizations, args.users_per_organization)
+
+    report = asyncio.run(drive(args, env, fixture))
+
+    regressions: Optional[List[str]] = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        report["baseline"] = {"path": args.baseline, "tolerance": args.tolerance, "regressions": regressions}
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            f.write(output + "\n")
+        logger.info(f"✅ Baseline saved to {args.save_baseline}")
+
+    overall = report["overall"]
+    logger.info(
+        f"✅ {overall['requests']} requests, {overall['throughput_rps']} rps, "
+        f"p50 {overall['p50_ms']} ms, p99 {overall['p99_ms']} ms, {overall['errors']} errors"
+    )
+    if regressions:
+        for regression in regressions:
+            logger.error(f"❌ {regression}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,232 @@
+"""
+Microbenchmarks for the per-request building blocks in app.core
+
+Covers password hashing and verification across bcrypt cost factors, JWT
+creation and decoding across token sizes, the IP allow-list check across
+list lengths, client IP extraction and the role permission lookups.
+
+Each benchmark is warmed up, then timed in rounds; the number of calls per
+round is calibrated so a round lasts at least --min-round-ms, and rounds
+continue until --max-time or --max-rounds. Per-call statistics (min,
+median, mean, stdev, p95) and calls per second are printed as JSON.
+
+    python -m perf.micro --output micro.json
+    python -m perf.micro --filter ip_whitelist --max-time 1
+"""
+from typing import Callable, List
+import argparse
+import json
+import logging
+import platform
+import statistics
+import sys
+import time
+from perf import environment
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_BCRYPT_ROUNDS = "4,8,10,12"
+
+# Extra claims per token size; "small" is a real access token payload
+TOKEN_SIZES = {"small": 0, "medium": 20, "large": 200}
+
+ALLOW_LIST_LENGTHS = (1, 10, 100, 1000)
+
+FORWARDED_HOPS = (0, 1, 5)
+
+
+class Benchmark:
+    def __init__(self, name: str, params: dict, func: Callable[[], object]):
+        self.name = name
+        self.params = params
+        self.func = func
+
+    @property
+    def label(self) -> str:
+        return self.name + "".join(f" {key}={value}" for key, value in self.params.items())
+
+
+def _calibrate(func: Callable[[], object], min_round: float) -> int:
+    """Calls per round so that one round takes at least ``min_round`` seconds"""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_round:
+            return number
+        number = number * 10 if elapsed < min_round / 10 else max(number + 1, int(number * min_round / elapsed * 1.2))
+
+
+def measure(benchmark: Benchmark, warmup: float, min_round: float, max_time: float, min_rounds: int, max_rounds: int) -> dict:
+    func = benchmark.func
+
+    # Warm-up: fill caches and let lazily initialized backends (bcrypt, crypto) load
+    deadline = time.perf_counter() + warmup
+    func()
+    while time.perf_counter() < deadline:
+        func()
+
+    number = _calibrate(func, min_round)
+    per_call: List[float] = []
+    deadline = time.perf_counter() + max_time
+    while len(per_call) < max_rounds and (len(per_call) < min_rounds or time.perf_counter() < deadline):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        per_call.append((time.perf_counter() - start) / number)
+
+    ordered = sorted(per_call)
+    median = statistics.median(ordered)
+    return {
+        "name": benchmark.name,
+        "params": benchmark.params,
+        "rounds": len(ordered),
+        "calls_per_round": number,
+        "min_us": round(ordered[0] * 1e6, 3),
+        "median_us": round(median * 1e6, 3),
+        "mean_us": round(statistics.fmean(ordered) * 1e6, 3),
+        "stdev_us": round(statistics.stdev(ordered) * 1e6, 3) if len(ordered) > 1 else 0.0,
+        "p95_us": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] * 1e6, 3),
+        "ops_per_s": round(1 / median, 1) if median else None,
+    }
+
+
+def _request(client_ip: str, forwarded: List[str]):
+    from starlette.requests import Request
+
+    headers = [(b"user-agent", b"perf")]
+    if forwarded:
+        headers.append((b"x-forwarded-for", ", ".join(forwarded).encode()))
+    return Request({
+        "type": "http",
+        "method": "POST",
+        "path": "/auth/login",
+        "headers": headers,
+        "client": (client_ip, 50000),
+    })
+
+
+def benchmarks(bcrypt_rounds: List[int]) -> List[Benchmark]:
+    from app.core.middleware import check_ip_whitelist, get_client_ip, normalize_ip
+    from app.core.permissions import can_access_module, get_user_permissions
+    from app.core.security import (
+        create_access_token, decode_token, get_password_hash, pwd_context, verify_password
+    )
+    from app.models.user import UserRole
+
+    password = "correct horse battery staple"
+    result = [Benchmark("get_password_hash", {"rounds": "default"}, lambda: get_password_hash(password))]
+
+    bcrypt = pwd_context.handler()
+    for rounds in bcrypt_rounds:
+        hasher = bcrypt.using(rounds=rounds)
+        stored = hasher.hash(password)
+        result.append(Benchmark("bcrypt_hash", {"rounds": rounds}, lambda hasher=hasher: hasher.hash(password)))
+        result.append(Benchmark(
+            "verify_password", {"rounds": rounds}, lambda stored=stored: verify_password(password, stored)
+        ))
+
+    base_claims = {
+        "user_id": "0b8a1f6e-3c1d-4a7e-9c59-2f1d7f3b4a10",
+        "email": "someone@example.com",
+        "role": UserRole.DEVELOPER.value,
+        "organization_id": "5d2c9e0a-8b4f-4f6e-a1d3-7c9b2e6f8a01",
+        "permissions": get_user_permissions(UserRole.DEVELOPER),
+    }
+    for size, extra in TOKEN_SIZES.items():
+        claims = {**base_claims, **{f"claim_{index}": f"value-{index:04d}" for index in range(extra)}}
+        token = create_access_token(claims)
+        params = {"size": size, "token_bytes": len(token)}
+        result.append(Benchmark("create_access_token", params, lambda claims=claims: create_access_token(claims)))
+        result.append(Benchmark("decode_token", params, lambda token=token: decode_token(token)))
+
+    client_ip = "203.0.113.77"
+    for length in ALLOW_LIST_LENGTHS:
+        # Half single addresses, half CIDR ranges; the client matches only the last entry (worst case)
+        entries = [f"198.51.{index // 256 % 256}.{index % 256}" if index % 2 else f"10.{index % 256}.0.0/16"
+                   for index in range(length - 1)]
+        allowed = entries + [f"{client_ip}/32"]
+        result.append(Benchmark(
+            "check_ip_whitelist", {"entries": length, "match": "last"},
+            lambda allowed=allowed: check_ip_whitelist(client_ip, allowed)
+        ))
+        result.append(Benchmark(
+            "check_ip_whitelist", {"entries": length, "match": "none"},
+            lambda entries=entries: check_ip_whitelist(client_ip, entries or ["192.0.2.1"])
+        ))
+    result.append(Benchmark("check_ip_whitelist", {"entries": 0, "match": "unrestricted"},
+                            lambda: check_ip_whitelist(client_ip, [])))
+    result.append(Benchmark("normalize_ip", {"family": "ipv4"}, lambda: normalize_ip(client_ip)))
+    result.append(Benchmark("normalize_ip", {"family": "ipv6"}, lambda: normalize_ip("2001:db8::8a2e:370:7334")))
+
+    # Includes building the Starlette Request, as every endpoint does
+    for hops in FORWARDED_HOPS:
+        forwarded = [f"192.0.2.{index + 1}" for index in range(hops)]
+        result.append(Benchmark(
+            "get_client_ip", {"forwarded_hops": hops},
+            lambda forwarded=forwarded: get_client_ip(_request("127.0.0.1", forwarded))
+        ))
+
+    for role in (UserRole.DEVELOPER, UserRole.OPS):
+        result.append(Benchmark("get_user_permissions", {"role": role.value},
+                                lambda role=role: get_user_permissions(role)))
+        result.append(Benchmark("can_access_module", {"role": role.value, "module": "migrator"},
+                                lambda role=role: can_access_module(role, "migrator")))
+    return result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Microbenchmark the app.core security, IP and permission primitives")
+    parser.add_argument("--filter", help="Only run benchmarks whose name contains this text")
+    parser.add_argument("--bcrypt-rounds", default=DEFAULT_BCRYPT_ROUNDS,
+                        help=f"Comma separated bcrypt cost factors (default {DEFAULT_BCRYPT_ROUNDS})")
+    parser.add_argument("--warmup", type=float, default=0.2, help="Warm-up seconds per benchmark")
+    parser.add_argument("--min-round-ms", type=float, default=20, help="Minimum duration of a timed round")
+    parser.add_argument("--max-time", type=float, default=2, help="Seconds of timed rounds per benchmark")
+    parser.add_argument("--min-rounds", type=int, default=5)
+    parser.add_argument("--max-rounds", type=int, default=1000)
+    parser.add_argument("--output", help="Write the JSON results to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    # Importing app models creates the engine; no database is touched
+    environment.configure()
+
+    rounds = [int(value) for value in args.bcrypt_rounds.split(",") if value.strip()]
+    selected = [b for b in benchmarks(rounds) if not args.filter or args.filter in b.name]
+
+    results = []
+    for benchmark in selected:
+        stats = measure(benchmark, args.warmup, args.min_round_ms / 1000, args.max_time, args.min_rounds, args.max_rounds)
+        logger.info(f"⏱️ {benchmark.label}: median {stats['median_us']} us, stdev {stats['stdev_us']} us")
+        results.append(stats)
+
+    from app.core.security import pwd_context
+
+    report = {
+        "host": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "system": platform.system(),
+            "bcrypt_backend": pwd_context.handler().get_backend(),
+        },
+        "settings": {
+            "warmup_s": args.warmup,
+            "min_round_ms": args.min_round_ms,
+            "max_time_s": args.max_time,
+        },
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,512 @@
+"""
+Synthetic data at production-like volumes
+
+Generates organizations with Zipf-skewed sizes, their users and a year (by
+default) of audit logs with a realistic action mix, weekday/diurnal timing,
+per-user home addresses plus roaming and IPv6 traffic, and popular-skewed
+user agents. Everything derives from --seed and --end: the same seed,
+sizes and end give the same rows, so benchmark runs against seeded
+databases are comparable.
+
+Every user shares one bcrypt hash of --password, computed once; with a
+--bcrypt-rounds other than the app's, users are rehashed on first login. PostgreSQL
+is loaded with COPY in batches (audit_logs secondary indexes are dropped
+during the load and rebuilt afterwards unless --keep-indexes); other
+databases fall back to executemany inserts.
+
+    python -m perf.seed --database-url postgresql://... --drop
+    python -m perf.seed --organizations 50 --users 2000 --audit-rows 200000   # SQLite perf.db
+"""
+from array import array
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+import argparse
+import csv
+import enum
+import hashlib
+import io
+import json
+import logging
+import random
+import sys
+import time
+import uuid
+from perf import environment
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ADMIN_EMAIL = "perf-admin@example.com"
+
+# Zipf exponent of organization sizes and user agent popularity
+ORGANIZATION_SKEW = 1.1
+USER_AGENT_SKEW = 1.3
+
+# Relative audit volume per weekday (Monday first) and per UTC hour
+WEEKDAY_WEIGHTS = (1.0, 1.05, 1.05, 1.0, 0.9, 0.35, 0.3)
+HOUR_WEIGHTS = (
+    0.2, 0.15, 0.1, 0.1, 0.15, 0.3, 0.6, 1.0, 1.6, 2.0, 2.1, 2.0,
+    1.7, 1.9, 2.0, 1.9, 1.7, 1.3, 0.9, 0.7, 0.5, 0.4, 0.3, 0.25,
+)
+
+# Share of audit rows per action name
+ACTION_MIX = (
+    ("LOGIN", 70.0),
+    ("LOGIN_FAILED", 12.0),
+    ("LOGOUT", 10.0),
+    ("USER_UPDATED", 2.0),
+    ("PASSWORD_CHANGED", 1.5),
+    ("USER_CREATED", 1.5),
+    ("ORG_UPDATED", 0.8),
+    ("PERMISSION_CHANGED", 0.7),
+    ("LICENSE_EXTENDED", 0.5),
+    ("USER_DELETED", 0.3),
+    ("API_KEY_CREATED", 0.25),
+    ("API_KEY_REVOKED", 0.25),
+    ("ORG_CREATED", 0.2),
+)
+
+# Failed login reasons with the messages auth.py writes
+FAILURE_MIX = (
+    ("INVALID_CREDENTIALS", 80.0, "Invalid email or password"),
+    ("IP_NOT_WHITELISTED", 8.0, None),
+    ("LICENSE_EXPIRED", 6.0, "Organization license has expired"),
+    ("USER_INACTIVE", 4.0, "User account is disabled"),
+    ("ORGANIZATION_INACTIVE", 2.0, "Organization is disabled"),
+)
+
+# Share of events from the user's home address, a roaming IPv4 address, and IPv6
+HOME_IP_SHARE = 0.85
+IPV6_SHARE = 0.05
+ROAMING_POOL_SIZE = 50000
+
+# Share of invalid-credential attempts against emails that do not exist
+UNKNOWN_EMAIL_SHARE = 0.3
+
+ROLES = (("DEVELOPER", 40.0), ("TESTER", 30.0), ("OPS", 30.0))
+LICENSE_TYPES = (("TRIAL", 30.0), ("STANDARD", 50.0), ("ENTERPRISE", 20.0))
+FEATURES = ("validator", "migrator", "reconciliator")
+
+USER_AGENT_TEMPLATES = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/{major}.0.{build}.{patch} Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/{major}.0.{build}.{patch} Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/{minor}.{patch} Safari/605.1.15",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:{major}.0) Gecko/20100101 Firefox/{major}.0",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/{major}.0.{build}.{patch} Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/{major}.0.{build}.{patch} Safari/537.36 Edg/{major}.0.{build}.{patch}",
+    "MiniBeast/{minor}.{patch}.{build} (python-httpx/0.26.0)",
+    "python-requests/2.{minor}.{patch}",
+)
+
+ORGANIZATION_COLUMNS = ("id", "name", "license_type", "license_expires_at", "max_users", "features_enabled",
+                        "allowed_ips", "is_active", "created_at", "updated_at")
+USER_COLUMNS = ("id", "email", "password_hash", "full_name", "role", "organization_id", "created_by",
+                "last_login", "last_ip", "is_active", "created_at", "updated_at")
+USER_AGENT_COLUMNS = ("id", "value_hash", "value")
+AUDIT_COLUMNS = ("id", "timestamp", "action", "user_id", "user_email", "organization_id", "target_id",
+                 "target_type", "ip_address", "user_agent_id", "details", "status", "reason", "error_message")
+
+
+def _rng(seed: int, *scope) -> random.Random:
+    """Independent generator per table/day, so batch sizes never change the data"""
+    return random.Random(":".join(str(part) for part in (seed,) + scope))
+
+
+def _uuid(rng: random.Random) -> uuid.UUID:
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+
+def _cumulative(weights: Sequence[float]) -> List[float]:
+    return list(accumulate(weights))
+
+
+def zipf_sizes(total: int, buckets: int, skew: float) -> List[int]:
+    """Split ``total`` into ``buckets`` Zipf-distributed sizes of at least 1"""
+    weights = [1 / (rank + 1) ** skew for rank in range(buckets)]
+    scale = (total - buckets) / sum(weights)
+    sizes = [1 + int(weight * scale) for weight in weights]
+    for index in range(total - sum(sizes)):
+        sizes[index % buckets] += 1
+    return sizes
+
+
+def user_email(user_index: int, organization_index: int) -> str:
+    return f"user{user_index:07d}@org{organization_index:05d}.example.com"
+
+
+def home_ip(user_index: int, organization_index: int) -> str:
+    """Stable address of a user: their organization's office network, or a residential-looking one"""
+    if user_index % 3:
+        return f"10.{organization_index // 256 % 256}.{organization_index % 256}.{user_index % 250 + 2}"
+    spread = user_index * 2654435761 % (1 << 32)
+    return f"{(spread >> 24) % 200 + 24}.{(spread >> 16) & 255}.{(spread >> 8) & 255}.{(spread & 255) or 1}"
+
+
+class Dataset:
+    """Deterministic generator of all seeded rows"""
+
+    def __init__(self, seed: int, organizations: int, users: int, audit_rows: int, days: int,
+                 user_agents: int, password_hash: str, now: datetime):
+        if users < organizations:
+            raise ValueError("Need at least one user per organization")
+        self.seed = seed
+        self.organization_count = organizations
+        self.user_count = users
+        self.audit_rows = audit_rows
+        self.days = days
+        self.user_agent_count = user_agents
+        self.password_hash = password_hash
+        self.end = now.replace(second=0, microsecond=0)
+        self.start = self.end - timedelta(days=days)
+
+        rng = _rng(seed, "layout")
+        sizes = zipf_sizes(users, organizations, ORGANIZATION_SKEW)
+        rng.shuffle(sizes)
+        self.organization_sizes = sizes
+
+        self.organization_ids = [_uuid(rng) for _ in range(organizations)]
+        self.organization_active = array("b", (rng.random() < 0.95 for _ in range(organizations)))
+        self.admin_id = _uuid(rng)
+        self.user_ids = [_uuid(rng) for _ in range(users)]
+        self.user_organizations = array("I", (
+            organization for organization, size in enumerate(sizes) for _ in range(size)
+        ))
+        role_cumulative = _cumulative([weight for _, weight in ROLES])
+        self.user_roles = array("b", (
+            bisect_right(role_cumulative, rng.random() * role_cumulative[-1]) for _ in range(users)
+        ))
+
+        self.roaming_pool = [
+            f"{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+            for _ in range(ROAMING_POOL_SIZE)
+        ]
+
+    # Organizations, users and user agents
+
+    def organizations(self) -> Iterator[tuple]:
+        rng = _rng(self.seed, "organizations")
+        license_cumulative = _cumulative([weight for _, weight in LICENSE_TYPES])
+        for index, organization_id in enumerate(self.organization_ids):
+            created_at = self.start + timedelta(seconds=rng.random() * self.days * 86400 * 0.5)
+            expired = rng.random() < 0.15
+            expires_at = self.end + timedelta(days=-rng.randint(1, 180) if expired else rng.randint(1, 730))
+            allowed_ips = []
+            if rng.random() < 0.2:
+                allowed_ips = [f"10.{index // 256 % 256}.{index % 256}.0/24"] + [
+                    rng.choice(self.roaming_pool) for _ in range(rng.randint(0, 4))
+                ]
+            yield (
+                organization_id,
+                f"Org {index:05d}",
+                LICENSE_TYPES[bisect_right(license_cumulative, rng.random() * license_cumulative[-1])][0],
+                expires_at,
+                self.organization_sizes[index] + rng.randint(0, 20),
+                [feature for feature in FEATURES if rng.random() < 0.7] or [FEATURES[0]],
+                allowed_ips,
+                bool(self.organization_active[index]),
+                created_at,
+                created_at,
+            )
+
+    def users(self) -> Iterator[tuple]:
+        rng = _rng(self.seed, "users")
+        yield (self.admin_id, ADMIN_EMAIL, self.password_hash, "Perf Admin", "ADMIN",
+               self.organization_ids[0], None, None, None, True, self.start, self.start)
+        for index, user_id in enumerate(self.user_ids):
+            organization = self.user_organizations[index]
+            created_at = self.start + timedelta(seconds=rng.random() * self.days * 86400 * 0.8)
+            last_login = self.end - timedelta(seconds=rng.random() * 30 * 86400) if rng.random() < 0.8 else None
+            yield (
+                user_id,
+                user_email(index, organization),
+                self.password_hash,
+                f"User {index:07d}",
+                ROLES[self.user_roles[index]][0],
+                self.organization_ids[organization],
+                self.admin_id,
+                last_login,
+                home_ip(index, organization) if last_login else None,
+                rng.random() < 0.97,
+                created_at,
+                created_at,
+            )
+
+    def user_agents(self) -> Iterator[tuple]:
+        rng = _rng(self.seed, "user_agents")
+        seen = set()
+        while len(seen) < self.user_agent_count:
+            value = rng.choice(USER_AGENT_TEMPLATES).format(
+                major=rng.randint(100, 130), minor=rng.randint(1, 17),
+                build=rng.randint(1000, 6999), patch=rng.randint(0, 250)
+            )
+            if value in seen:
+                continue
+            seen.add(value)
+            yield (len(seen), hashlib.md5(value.encode()).hexdigest(), value)
+
+    # Audit logs
+
+    def daily_rows(self) -> List[int]:
+        """Audit rows per day, following the weekday pattern and summing to audit_rows"""
+        weights = [WEEKDAY_WEIGHTS[(self.start + timedelta(days=day)).weekday()] for day in range(self.days)]
+        scale = self.audit_rows / sum(weights)
+        counts = [int(weight * scale) for weight in weights]
+        for day in range(self.audit_rows - sum(counts)):
+            counts[day % self.days] += 1
+        return counts
+
+    def audit_logs(self) -> Iterator[tuple]:
+        action_cumulative = _cumulative([weight for _, weight in ACTION_MIX])
+        failure_cumulative = _cumulative([weight for _, weight, _ in FAILURE_MIX])
+        hour_cumulative = _cumulative(HOUR_WEIGHTS)
+        agent_cumulative = _cumulative([1 / (rank + 1) ** USER_AGENT_SKEW for rank in range(self.user_agent_count)])
+        role_names = [name.lower() for name, _ in ROLES]
+
+        for day, count in enumerate(self.daily_rows()):
+            rng = _rng(self.seed, "audit", day)
+            day_start = self.start + timedelta(days=day)
+            rows = []
+            for _ in range(count):
+                hour = bisect_right(hour_cumulative, rng.random() * hour_cumulative[-1])
+                timestamp = day_start + timedelta(seconds=hour * 3600 + rng.random() * 3600)
+                if timestamp >= self.end:
+                    timestamp = self.end - timedelta(seconds=rng.random() * 3600)
+
+                action = ACTION_MIX[bisect_right(action_cumulative, rng.random() * action_cumulative[-1])][0]
+                user = rng.randrange(self.user_count)
+                organization = self.user_organizations[user]
+                user_id = self.user_ids[user]
+                email = user_email(user, organization)
+
+                roll = rng.random()
+                if roll < IPV6_SHARE:
+                    ip_address = f"2001:db8:{organization:x}:{rng.getrandbits(16):x}::{rng.getrandbits(16):x}"
+                elif roll < IPV6_SHARE + HOME_IP_SHARE:
+                    ip_address = home_ip(user, organization)
+                else:
+                    ip_address = rng.choice(self.roaming_pool)
+
+                user_agent_id = 1 + bisect_right(agent_cumulative, rng.random() * agent_cumulative[-1])
+                user_agent_id = min(user_agent_id, self.user_agent_count)
+
+                status, reason, error_message, details = "success", None, None, None
+                target_id, target_type = None, None
+                if action == "LOGIN":
+                    details = {"role": role_names[self.user_roles[user]]}
+                elif action == "LOGIN_FAILED":
+                    status = "failed"
+                    reason, _, error_message = FAILURE_MIX[
+                        bisect_right(failure_cumulative, rng.random() * failure_cumulative[-1])
+                    ]
+                    if reason == "IP_NOT_WHITELISTED":
+                        ip_address = rng.choice(self.roaming_pool)
+                        error_message = f"IP address {ip_address} is not whitelisted"
+                    elif reason == "INVALID_CREDENTIALS" and rng.random() < UNKNOWN_EMAIL_SHARE:
+                        user_id = None
+                        email = f"unknown{rng.randrange(10 ** 6):06d}@example.com"
+                elif action in ("USER_CREATED", "USER_UPDATED", "USER_DELETED", "PASSWORD_CHANGED", "PERMISSION_CHANGED"):
+                    target_id, target_type = self.user_ids[rng.randrange(self.user_count)], "user"
+                elif action in ("ORG_CREATED", "ORG_UPDATED", "LICENSE_EXTENDED"):
+                    target_id, target_type = self.organization_ids[organization], "organization"
+                elif action in ("API_KEY_CREATED", "API_KEY_REVOKED"):
+                    target_id, target_type = _uuid(rng), "api_key"
+
+                rows.append((
+                    _uuid(rng), timestamp, action, user_id, email, self.organization_ids[organization],
+                    target_id, target_type, ip_address, user_agent_id, details, status, reason, error_message,
+                ))
+
+            # Rows arrive in time order in production, which shapes the heap and index locality
+            rows.sort(key=lambda row: row[1])
+            yield from rows
+
+
+def _csv_value(value):
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    if isinstance(value, enum.Enum):
+        return value.name
+    return str(value)
+
+
+def _batches(rows: Iterable[tuple], size: int) -> Iterator[List[tuple]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Loader:
+    """Bulk loads generated rows: COPY on PostgreSQL, executemany elsewhere"""
+
+    def __init__(self, env: environment.Environment, batch_size: int):
+        self.env = env
+        self.batch_size = batch_size
+
+    def load(self, table_name: str, columns: Tuple[str, ...], rows: Iterable[tuple], total: Optional[int] = None) -> int:
+        loaded = 0
+        started = time.monotonic()
+        for batch in _batches(rows, self.batch_size):
+            if self.env.dialect == "postgresql":
+                self._copy(table_name, columns, batch)
+            else:
+                self._insert(table_name, columns, batch)
+            loaded += len(batch)
+            elapsed = time.monotonic() - started
+            progress = f"{loaded}/{total}" if total else str(loaded)
+            logger.info(f"⏳ {table_name}: {progress} rows ({loaded / elapsed if elapsed else 0:.0f} rows/s)")
+        logger.info(f"✅ {table_name}: {loaded} rows in {time.monotonic() - started:.1f}s")
+        return loaded
+
+    def _copy(self, table_name: str, columns: Tuple[str, ...], batch: List[tuple]):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in batch:
+            writer.writerow([_csv_value(value) for value in row])
+        buffer.seek(0)
+
+        connection = self.env.engine.raw_connection()
+        try:
+            with connection.cursor() as cursor:
+                cursor.copy_expert(
+                    f"COPY {table_name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+                )
+            connection.commit()
+        finally:
+            connection.close()
+
+    def _insert(self, table_name: str, columns: Tuple[str, ...], batch: List[tuple]):
+        table = self.env.Base.metadata.tables[table_name]
+        enum_columns = {name: table.c[name].type.enum_class for name in columns
+                        if getattr(table.c[name].type, "enum_class", None)}
+        records = []
+        for row in batch:
+            record = dict(zip(columns, row))
+            for name, enum_class in enum_columns.items():
+                if record[name] is not None:
+                    record[name] = enum_class[record[name]]
+            records.append(record)
+        with self.env.engine.begin() as conn:
+            conn.execute(table.insert(), records)
+
+
+def _audit_indexes(env: environment.Environment):
+    return list(env.Base.metadata.tables["audit_logs"].indexes)
+
+
+def seed(env: environment.Environment, dataset: Dataset, batch_size: int, keep_indexes: bool) -> dict:
+    from sqlalchemy import text
+    from app.db.partitions import add_months, ensure_partitions, is_partitioned, month_start
+
+    loader = Loader(env, batch_size)
+    counts = {
+        "organizations": loader.load("organizations", ORGANIZATION_COLUMNS, dataset.organizations(),
+                                     dataset.organization_count),
+        "users": loader.load("users", USER_COLUMNS, dataset.users(), dataset.user_count + 1),
+        "user_agents": loader.load("user_agents", USER_AGENT_COLUMNS, dataset.user_agents(),
+                                   dataset.user_agent_count),
+    }
+
+    postgres = env.dialect == "postgresql"
+    if postgres:
+        with env.engine.begin() as conn:
+            conn.execute(text(
+                "SELECT setval(pg_get_serial_sequence('user_agents', 'id'), (SELECT max(id) FROM user_agents))"
+            ))
+            if is_partitioned(conn):
+                first = month_start(dataset.start)
+                months = 0
+                while add_months(first, months) < month_start(dataset.end):
+                    months += 1
+                ensure_partitions(conn, ahead=months, start=first)
+                ensure_partitions(conn)
+
+    deferred = postgres and not keep_indexes
+    if deferred:
+        with env.engine.begin() as conn:
+            for index in _audit_indexes(env):
+                index.drop(conn, checkfirst=True)
+
+    counts["audit_logs"] = loader.load("audit_logs", AUDIT_COLUMNS, dataset.audit_logs(), dataset.audit_rows)
+
+    if deferred:
+        for index in _audit_indexes(env):
+            started = time.monotonic()
+            with env.engine.begin() as conn:
+                index.create(conn)
+            logger.info(f"✅ Rebuilt {index.name} in {time.monotonic() - started:.1f}s")
+    if postgres:
+        with env.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("ANALYZE"))
+    return counts
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Seed a database with large, deterministic synthetic data")
+    parser.add_argument("--organizations", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=500000)
+    parser.add_argument("--audit-rows", type=int, default=50000000)
+    parser.add_argument("--days", type=int, default=365, help="Days of audit history before --end")
+    parser.add_argument("--end", type=datetime.fromisoformat,
+                        help="End of the audit history, e.g. 2026-01-01 (default: today 00:00 UTC)")
+    parser.add_argument("--user-agents", type=int, default=300, help="Distinct User-Agent strings")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--password", default="perf-password", help="Password of every seeded account")
+    parser.add_argument("--bcrypt-rounds", type=int, help="Cost of the shared password hash (default: the app's)")
+    parser.add_argument("--batch-size", type=int, default=50000, help="Rows per COPY / executemany batch")
+    parser.add_argument("--keep-indexes", action="store_true",
+                        help="Keep audit_logs indexes during the load instead of rebuilding them after")
+    parser.add_argument("--drop", action="store_true", help="Drop and recreate all tables first")
+    parser.add_argument("--database-url", help="Database to seed (default: SQLite file perf.db)")
+    args = parser.parse_args(argv)
+
+    environment.configure(args.database_url)
+    env = environment.load()
+
+    from sqlalchemy import text
+    from app.core.security import pwd_context
+
+    env.create_schema(drop=args.drop)
+    with env.engine.connect() as conn:
+        if conn.execute(text("SELECT 1 FROM organizations LIMIT 1")).first():
+            logger.error("❌ The database already has organizations; pass --drop to replace them")
+            return 1
+
+    hasher = pwd_context.handler().using(rounds=args.bcrypt_rounds) if args.bcrypt_rounds else pwd_context
+    dataset = Dataset(
+        seed=args.seed,
+        organizations=args.organizations,
+        users=args.users,
+        audit_rows=args.audit_rows,
+        days=args.days,
+        user_agents=args.user_agents,
+        password_hash=hasher.hash(args.password),
+        now=args.end or datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0),
+    )
+
+    started = time.monotonic()
+    counts = seed(env, dataset, args.batch_size, args.keep_indexes)
+    print(json.dumps({
+        "seed": args.seed,
+        "database": env.dialect,
+        "rows": counts,
+        "seconds": round(time.monotonic() - started, 1),
+        "admin": {"email": ADMIN_EMAIL, "password": args.password},
+    }, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+"""
+Memory growth soak test
+
+Drives the request mix against the app in-process for a long time and
+watches memory. Growth during the warm-up (caches, interned user agents,
+lazily imported modules) is ignored; after it, RSS and the memory traced by
+tracemalloc (less the harness's own allocations) are sampled every
+--snapshot-interval seconds and their growth rate is fitted by least
+squares. Samples are taken in a worker thread so the clients keep running,
+and the clients stop at --duration even if a request is still in flight. The run fails (exit code 1) when either slope
+exceeds its limit, and reports the allocation sites that grew most since
+the end of the warm-up, grouped by traceback.
+
+    python -m perf.soak --duration 14400 --concurrency 16 --output soak.json
+"""
+from typing import List, Optional, Tuple
+import argparse
+import asyncio
+import gc
+import json
+import linecache
+import logging
+import os
+import resource
+import sys
+import time
+import tracemalloc
+import httpx
+from perf import environment
+from perf.workload import DEFAULT_MIX, build_workloads, parse_mix
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+# Allocations of tracemalloc itself, of the source lines read to format its tracebacks,
+# of module loading and of this harness (samples, reports) are not growth of the app
+IGNORED_FILES = [
+    "<frozen importlib._bootstrap>",
+    "<frozen importlib._bootstrap_external>",
+    tracemalloc.__file__,
+    linecache.__file__,
+    __file__,
+]
+
+
+def rss_bytes() -> int:
+    """Current resident set size (Linux), or the peak RSS elsewhere"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def slope_per_hour(points: List[Tuple[float, float]]) -> Optional[float]:
+    """Least-squares slope of (seconds, value) points, in value units per hour"""
+    if len(points) < 3:
+        return None
+    n = len(points)
+    mean_x = sum(x for x, _ in points) / n
+    mean_y = sum(y for _, y in points) / n
+    variance = sum((x - mean_x) ** 2 for x, _ in points)
+    if not variance:
+        return None
+    covariance = sum((x - mean_x) * (y - mean_y) for x, y in points)
+    return covariance / variance * 3600
+
+
+def take_snapshot() -> tracemalloc.Snapshot:
+    gc.collect()
+    return tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(False, filename) for filename in IGNORED_FILES]
+    )
+
+
+def top_growth(baseline: tracemalloc.Snapshot, snapshot: tracemalloc.Snapshot, limit: int) -> List[dict]:
+    growth = []
+    for stat in snapshot.compare_to(baseline, "traceback")[:limit]:
+        if stat.size_diff <= 0:
+            break
+        growth.append({
+            "size_diff_kb": round(stat.size_diff / 1024, 1),
+            "count_diff": stat.count_diff,
+            "size_kb": round(stat.size / 1024, 1),
+            "traceback": stat.traceback.format(most_recent_first=True),
+        })
+    return growth
+
+
+class Soak:
+    def __init__(self, args, env: environment.Environment, fixture: environment.Fixture):
+        self.args = args
+        self.env = env
+        self.fixture = fixture
+        self.requests = 0
+        self.statuses = {}
+        self.samples: List[dict] = []
+        self.baseline: Optional[tracemalloc.Snapshot] = None
+        self.growth: List[dict] = []
+
+    async def worker(self, workload, deadline: float):
+        while time.monotonic() < deadline:
+            status = await workload.run(workload.choose())
+            self.requests += 1
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def sample(self, started: float):
+        snapshot = take_snapshot()
+        traced = sum(stat.size for stat in snapshot.statistics("filename"))
+        elapsed = time.monotonic() - started
+        sample = {
+            "elapsed_s": round(elapsed, 1),
+            "requests": self.requests,
+            "rss_mb": round(rss_bytes() / MB, 2),
+            "traced_mb": round(traced / MB, 2),
+            "warmup": elapsed < self.args.warmup,
+        }
+        self.samples.append(sample)
+
+        if not sample["warmup"]:
+            if self.baseline is None:
+                self.baseline = snapshot
+            else:
+                self.growth = top_growth(self.baseline, snapshot, self.args.top)
+        logger.info(
+            f"⏱️ {sample['elapsed_s']:.0f}s: {self.requests} requests, "
+            f"RSS {sample['rss_mb']:.1f} MB, traced {sample['traced_mb']:.1f} MB"
+            + (" (warm-up)" if sample["warmup"] else "")
+        )
+        for entry in self.growth[:3]:
+            logger.info(f"   +{entry['size_diff_kb']} KB ({entry['count_diff']:+d} blocks) at {entry['traceback'][0].strip()}")
+
+    async def sampler(self, started: float, deadline: float):
+        while True:
+            # gc.collect and the snapshot take seconds on a large heap; keep them off the event loop
+            await asyncio.to_thread(self.sample, started)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(min(self.args.snapshot_interval, remaining))
+
+    async def run(self) -> dict:
+        mix = parse_mix(self.args.mix)
+        # Server errors are counted like a real server would return them, not raised
+        transport = httpx.ASGITransport(app=self.env.app, raise_app_exceptions=False, client=("127.0.0.1", 50000))
+        async with httpx.AsyncClient(transport=transport, base_url="http://soak") as client:
+            workloads = build_workloads(client, self.fixture, mix, self.args.concurrency, self.args.seed)
+            for workload in workloads:
+                await workload.setup(sessions=5)
+
+            started = time.monotonic()
+            deadline = started + self.args.duration
+            workers = [asyncio.create_task(self.worker(workload, deadline)) for workload in workloads]
+            await self.sampler(started, deadline)
+            # The last sample is taken at the deadline; don't wait for requests still in flight
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        return self.report()
+
+    def report(self) -> dict:
+        steady = [sample for sample in self.samples if not sample["warmup"]]
+        rss_slope = slope_per_hour([(s["elapsed_s"], s["rss_mb"]) for s in steady])
+        traced_slope = slope_per_hour([(s["elapsed_s"], s["traced_mb"]) for s in steady])
+
+        failures = []
+        if rss_slope is not None and rss_slope > self.args.max_rss_slope:
+            failures.append(f"RSS grows {rss_slope:.1f} MB/h (limit {self.args.max_rss_slope})")
+        if traced_slope is not None and traced_slope > self.args.max_traced_slope:
+            failures.append(f"traced allocations grow {traced_slope:.1f} MB/h (limit {self.args.max_traced_slope})")
+
+        return {
+            "duration_s": self.args.duration,
+            "warmup_s": self.args.warmup,
+            "concurrency": self.args.concurrency,
+            "mix": self.args.mix,
+            "database": self.env.dialect,
+            "requests": self.requests,
+            "statuses": {str(status): count for status, count in sorted(self.statuses.items())},
+            "rss_slope_mb_per_hour": rss_slope,
+            "traced_slope_mb_per_hour": traced_slope,
+            "samples": self.samples,
+            "top_growth": self.growth,
+            "passed": not failures,
+            "failures": failures,
+        }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run the app in-process under load and check memory growth")
+    parser.add_argument("--duration", type=float, default=3600, help="Seconds to run (default 3600)")
+    parser.add_argument("--warmup", type=float, default=300, help="Seconds of growth to ignore at the start")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent simulated clients")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Operation weights (default {DEFAULT_MIX})")
+    parser.add_argument("--snapshot-interval", type=float, default=60, help="Seconds between memory samples")
+    parser.add_argument("--max-rss-slope", type=float, default=20, help="Allowed RSS growth in MB/hour")
+    parser.add_argument("--max-traced-slope", type=float, default=5, help="Allowed traced allocation growth in MB/hour")
+    parser.add_argument("--frames", type=int, default=10, help="Traceback depth recorded by tracemalloc")
+    parser.add_argument("--top", type=int, default=15, help="Allocation sites reported")
+    parser.add_argument("--database-url", help="Database to run against (default: SQLite file perf.db)")
+    parser.add_argument("--redis-url", help="Real Redis to use instead of the in-process fake")
+    parser.add_argument("--organizations", type=int, default=10)
+    parser.add_argument("--users-per-organization", type=int, default=20)
+    parser.add_argument("--bcrypt-rounds", type=int, default=4, help="bcrypt cost for the run")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    environment.configure(args.database_url, bcrypt_rounds=args.bcrypt_rounds)
+    env = environment.load(args.redis_url)
+    fixture = environment.seed_fixture(env, args.organizations, args.users_per_organization)
+
+    # Started after seeding so the baseline holds only what serving requests allocates
+    tracemalloc.start(args.frames)
+    report = asyncio.run(Soak(args, env, fixture).run())
+    tracemalloc.stop()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if report["passed"]:
+        logger.info(f"✅ No memory growth beyond limits over {report['requests']} requests")
+        return 0
+    for failure in report["failures"]:
+        logger.error(f"❌ {failure}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""
+Request mix shared by the soak and load runners
+
+Each operation issues one request of a hot path through an httpx
+AsyncClient (in-process ASGI transport or a real server) and returns the
+response status. Tokens from logins are kept per fixture user, so refreshes
+use the most recent refresh token the server handed out. A login rotates
+the user's refresh token, so concurrent clients log in disjoint sets of
+fixture users (see build_workloads) and never revoke each other's tokens.
+"""
+from typing import Dict, List, Optional, Tuple
+import random
+import httpx
+from perf.environment import Fixture
+
+OPERATIONS = ("login", "refresh", "validate", "license_check", "admin_users")
+
+DEFAULT_MIX = "login=1,refresh=2,validate=10,license_check=10,admin_users=1"
+
+
+def parse_mix(text: str) -> List[Tuple[str, float]]:
+    """``name=weight,...`` into (operation, weight) pairs"""
+    mix = []
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation '{name}', expected one of {', '.join(OPERATIONS)}")
+        mix.append((name, float(weight or 1)))
+    return mix
+
+
+class Workload:
+    """The request mix against one seeded fixture, logging in only ``users`` (default: all fixture users)"""
+
+    def __init__(self, client: httpx.AsyncClient, fixture: Fixture, mix: List[Tuple[str, float]], rng: random.Random,
+                 users: Optional[List[dict]] = None):
+        self.client = client
+        self.fixture = fixture
+        self.rng = rng
+        self.users = users if users is not None else fixture.users
+        self.operations = [name for name, _ in mix]
+        self.weights = [weight for _, weight in mix]
+        # index into self.users -> latest token pair
+        self.sessions: Dict[int, dict] = {}
+        self.admin_token = None
+
+    def choose(self) -> str:
+        return self.rng.choices(self.operations, self.weights)[0]
+
+    async def run(self, name: str) -> int:
+        return await getattr(self, name)()
+
+    async def _login(self, email: str) -> httpx.Response:
+        return await self.client.post("/auth/login", json={"email": email, "password": self.fixture.password})
+
+    async def setup(self, sessions: int = 20):
+        """Log the admin and a few users in so token-based operations can start right away"""
+        response = await self._login(self.fixture.admin["email"])
+        response.raise_for_status()
+        self.admin_token = response.json()["access_token"]
+        for _ in range(min(sessions, len(self.users))):
+            await self.login()
+
+    async def login(self) -> int:
+        index = self.rng.randrange(len(self.users))
+        response = await self._login(self.users[index]["email"])
+        if response.status_code == 200:
+            body = response.json()
+            self.sessions[index] = {"access": body["access_token"], "refresh": body["refresh_token"]}
+        return response.status_code
+
+    async def refresh(self) -> int:
+        if not self.sessions:
+            return await self.login()
+        index = self.rng.choice(list(self.sessions))
+        response = await self.client.post("/auth/refresh", json={"refresh_token": self.sessions[index]["refresh"]})
+        if response.status_code == 200:
+            self.sessions[index]["access"] = response.json()["access_token"]
+        return response.status_code
+
+    async def validate(self) -> int:
+        user = self.rng.choice(self.fixture.users)
+        response = await self.client.post(
+            "/auth/validate",
+            json={"user_id": user["id"], "organization_id": user["organization_id"]}
+        )
+        return response.status_code
+
+    async def license_check(self) -> int:
+        organization_id = self.rng.choice(self.fixture.organization_ids)
+        response = await self.client.get(f"/license/check/{organization_id}")
+        return response.status_code
+
+    async def admin_users(self) -> int:
+        organization_id = self.rng.choice(self.fixture.organization_ids)
+        response = await self.client.get(
+            "/admin/users",
+            params={"organization_id": organization_id},
+            headers={"Authorization": f"Bearer {self.admin_token}"}
+        )
+        if response.status_code == 401:
+            # Access tokens expire during long runs
+            login = await self._login(self.fixture.admin["email"])
+            if login.status_code == 200:
+                self.admin_token = login.json()["access_token"]
+        return response.status_code
+
+
+def build_workloads(client: httpx.AsyncClient, fixture: Fixture, mix: List[Tuple[str, float]],
+                    count: int, seed: int) -> List[Workload]:
+    """``count`` workloads, each logging in its own slice of the fixture users"""
+    if count > len(fixture.users):
+        raise ValueError(f"{count} clients need at least as many fixture users, the fixture has {len(fixture.users)}")
+    return [
+        Workload(client, fixture, mix, random.Random(seed + index), users=fixture.users[index::count])
+        for index in range(count)
+    ]